@@ -1,67 +1,394 @@
 # agente.py
 
-import google.generativeai as genai
-import os
+import re
+import threading
+from cache import impressao_digital
+from cliente_modelo import ClienteModelo, ErroModelo
+from exemplos import EXEMPLOS_PADRAO, formatar_exemplos, termos
+from metricas import METRICAS, cronometrado
 
-class AgenteDeDados:
-    """Gerencia a comunicação com o modelo Gemma."""
+ESQUEMA_CABECALHO = """
+        Instruções Detalhadas sobre o Banco de Dados:
+        A tabela principal que você deve usar é 'clientes'.
+        - colunas:
+"""
 
-    def __init__(self, api_key, model_name='gemini-1.5-flash'):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)
+# Uma seção do esquema por coluna, para que o prompt leve apenas as colunas relevantes.
+COLUNAS_CLIENTES = {
+    "id": "          - id (INT): identificador único\n",
+    "nome": "          - nome (VARCHAR(255)): nome completo do cliente\n",
+    "renda": "          - renda (FLOAT): renda mensal em reais\n",
+    "status": "          - status (VARCHAR(50)): status do cliente. Os valores possíveis são 'ativo' ou 'nome sujo'.\n",
+    "genero": "          - genero (VARCHAR(50)): o sexo do cliente. Os valores possíveis são 'masculino' ou 'feminino'.\n",
+}
 
-    def traduzir_para_sql(self, pergunta_usuario):
-        """Usa o Gemma para traduzir a pergunta para SQL com RAG."""
-        prompt = f"""
-        Você é um tradutor de perguntas em linguagem natural para consultas SQL. Sua única e estrita tarefa é converter a pergunta do usuário em uma consulta SQL válida, sem adicionar nenhum outro texto.
+# Termos (já normalizados, sem plural) que indicam que a pergunta envolve cada coluna.
+TERMOS_COLUNAS = {
+    "id": {"id", "identificador", "codigo"},
+    "nome": {"nome", "chamado", "chamada"},
+    "renda": {"renda", "salario", "ganha", "ganham", "media", "soma", "rica", "rico", "pobre"},
+    "status": {"status", "sujo", "ativo", "ativa", "negativado", "negativada", "inadimplente"},
+    "genero": {"genero", "sexo", "masculino", "feminino", "homen", "homem", "mulher", "mulhere"},
+}
 
-        Regras e Formato da Resposta:
-        1. A resposta deve conter SOMENTE a consulta SQL, sem aspas, blocos de código ou explicações.
-        2. A consulta deve ser completa e válida para o MySQL.
+def montar_esquema(colunas):
+    """Monta a seção do esquema com as colunas indicadas, na ordem da tabela."""
+    return ESQUEMA_CABECALHO + "".join(linha for coluna, linha in COLUNAS_CLIENTES.items() if coluna in colunas)
 
-        Instruções Detalhadas sobre o Banco de Dados:
-        A tabela principal que você deve usar é 'clientes'.
-        - colunas:
-          - id (INT): identificador único
-          - nome (VARCHAR(255)): nome completo do cliente
-          - renda (FLOAT): renda mensal em reais
-          - status (VARCHAR(50)): status do cliente. Os valores possíveis são 'ativo' ou 'nome sujo'.
-          - genero (VARCHAR(50)): o sexo do cliente. Os valores possíveis são 'masculino' ou 'feminino'.
+def colunas_referenciadas(pergunta, exemplos):
+    """Colunas citadas pela pergunta ou pelo SQL dos exemplos escolhidos."""
+    palavras = set(termos(pergunta))
+    colunas = {coluna for coluna, gatilhos in TERMOS_COLUNAS.items() if palavras & gatilhos}
+    for _, sql in exemplos:
+        # Literais são removidos para que 'nome sujo' não conte como a coluna nome.
+        sem_literais = re.sub(r"'[^']*'", "", sql)
+        colunas.update(re.findall(r"\b(" + "|".join(COLUNAS_CLIENTES) + r")\b", sem_literais))
+    return colunas
+
+def estimar_tokens(texto):
+    """Estimativa local do número de tokens (palavras e sinais de pontuação)."""
+    return len(re.findall(r"\w+|[^\w\s]", texto))
+
+# Início de instrução SQL: distingue uma cerca de código que fecha o SQL de uma que o abre.
+PADRAO_INICIO_SQL = re.compile(r"\s*(?:select|with|insert|update|delete|replace|create|drop|alter|explain|show)\b", re.I)
+
+def cortar_sql(texto, final=True):
+    """Extrai a primeira instrução SQL da resposta do modelo.
 
-        Exemplos de Tradução:
-        - Pergunta: Qual o número de clientes com nome sujo?
-        - SQL: SELECT COUNT(*) FROM clientes WHERE status = 'nome sujo';
+    Descarta a cerca de código (```sql ... ```) e o que vier antes dela, e corta no fim da
+    primeira instrução: o ';' fora de literais (mantido), o fechamento da cerca ou, fora de
+    cercas, uma linha em branco depois do SQL (parágrafos antes do SQL são ignorados). Com `final=False` (resposta ainda chegando),
+    retorna None enquanto a instrução não terminou.
+    """
+    inicio, cerca, conteudo, aspas = 0, False, False, None
+    i, n = 0, len(texto)
+    while i < n:
+        c = texto[i]
+        if aspas:
+            if c == "\\":
+                i += 1
+            elif c == aspas:
+                aspas = None
+        elif texto.startswith("```", i):
+            if cerca or PADRAO_INICIO_SQL.match(texto, inicio):
+                return texto[inicio:i].strip()
+            fim_linha = texto.find("\n", i)
+            if fim_linha < 0:
+                # A linha da cerca (```sql) ainda não terminou.
+                return "" if final else None
+            inicio, cerca, conteudo = fim_linha + 1, True, False
+            i = fim_linha
+        elif c in "'\"`":
+            aspas = c
+        elif c == ";":
+            return texto[inicio:i + 1].strip()
+        elif c == "\n" and conteudo and not cerca:
+            proximo = i + 1
+            while proximo < n and texto[proximo] in " \t\r":
+                proximo += 1
+            if proximo < n and texto[proximo] == "\n":
+                if PADRAO_INICIO_SQL.match(texto, inicio):
+                    return texto[inicio:i].strip()
+                # Parágrafo de conversa antes do SQL ("Aqui está a consulta:"): descartado.
+                inicio, conteudo = proximo + 1, False
+                i = proximo
+        elif not c.isspace():
+            conteudo = True
+        i += 1
+    return texto[inicio:].strip() if final else None
 
-        - Pergunta: Qual a renda do cliente de nome 'João da Silva'?
-        - SQL: SELECT renda FROM clientes WHERE nome = 'João da Silva';
+class MontadorSQL:
+    """Acumulador da resposta em streaming: completo assim que a primeira instrução termina."""
 
-        - Pergunta: Me diga o nome dos clientes que têm uma renda maior que 2000?
-        - SQL: SELECT nome FROM clientes WHERE renda > 2000;
+    def __init__(self):
+        self._texto = ""
+        self._sql = None
 
-        - Pergunta: Qual a média de renda de todos os clientes?
-        - SQL: SELECT AVG(renda) FROM clientes;
+    def alimentar(self, pedaco):
+        """Acrescenta um pedaço da resposta; retorna True quando o SQL já está completo."""
+        if self._sql is None:
+            self._texto += pedaco
+            # As respostas são curtas: reexaminar o texto inteiro a cada pedaço custa pouco.
+            self._sql = cortar_sql(self._texto, final=False)
+        return self._sql is not None
 
-        - Pergunta: Quantos clientes do sexo masculino com nome sujo existem?
-        - SQL: SELECT COUNT(*) FROM clientes WHERE genero = 'masculino' AND status = 'nome sujo';
+    def texto(self):
+        return self._sql if self._sql is not None else cortar_sql(self._texto)
 
+ESQUEMA_CLIENTES = montar_esquema(COLUNAS_CLIENTES)
+
+EXEMPLOS_TRADUCAO = formatar_exemplos(EXEMPLOS_PADRAO)
+
+PROMPT_SQL = """
+        Você é um tradutor de perguntas em linguagem natural para consultas SQL. Sua única e estrita tarefa é converter a pergunta do usuário em uma consulta SQL válida, sem adicionar nenhum outro texto.
+
+        Regras e Formato da Resposta:
+        1. A resposta deve conter SOMENTE a consulta SQL, sem aspas, blocos de código ou explicações.
+        2. A consulta deve ser completa e válida para o {dialeto}.
+{esquema}{exemplos}
         Pergunta do Usuário:
         {pergunta_usuario}
 
         Sua Resposta (APENAS o código SQL):
         """
-        
+
+# Prompt com várias perguntas numeradas, respondidas numa única chamada (modo lote).
+PROMPT_PACOTE = """
+        Você é um tradutor de perguntas em linguagem natural para consultas SQL. Sua única e estrita tarefa é converter cada pergunta numerada do usuário em uma consulta SQL válida, sem adicionar nenhum outro texto.
+
+        Regras e Formato da Resposta:
+        1. Responda com uma consulta por pergunta, na mesma ordem, no formato "N. consulta SQL;" com o número da pergunta.
+        2. Cada consulta deve ser completa e válida para o {dialeto}, sem aspas, blocos de código ou explicações.
+{esquema}{exemplos}
+        Perguntas do Usuário:
+{perguntas}
+
+        Suas Respostas (APENAS as consultas SQL numeradas):
+        """
+
+PADRAO_NUMERO_RESPOSTA = re.compile(r"^\s*(\d+)\s*[.)]\s*", re.M)
+
+def separar_respostas(texto, quantidade):
+    """Divide a resposta a um prompt de perguntas numeradas em uma lista de `quantidade` SQLs (ou None).
+
+    Só conta como marcador o próximo número esperado (1., 2., ...), para que uma linha de SQL
+    começando com um número não seja tomada por uma nova resposta.
+    """
+    texto = re.sub(r"^\s*```[^\n]*$", "", texto, flags=re.M)
+    marcas, esperado = [], 1
+    for m in PADRAO_NUMERO_RESPOSTA.finditer(texto):
+        if esperado <= quantidade and int(m.group(1)) == esperado:
+            marcas.append((m.start(), m.end()))
+            esperado += 1
+    respostas = [None] * quantidade
+    for numero, (_, fim) in enumerate(marcas):
+        proximo = marcas[numero + 1][0] if numero + 1 < len(marcas) else len(texto)
+        respostas[numero] = cortar_sql(texto[fim:proximo]) or None
+    return respostas
+
+class ModeloSobDemanda:
+    """genai.GenerativeModel criado no primeiro uso.
+
+    Importar o google.generativeai (grpc, protobuf) leva boa parte do início do chat; assim ele
+    só acontece na primeira pergunta ao modelo ou no aquecimento em segundo plano.
+    """
+
+    def __init__(self, api_key, model_name):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._modelo = None
+        self._lock = threading.Lock()
+
+    def carregar(self):
+        with self._lock:
+            if self._modelo is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._modelo = genai.GenerativeModel(self.model_name)
+            return self._modelo
+
+    def generate_content(self, prompt, **kwargs):
+        return self.carregar().generate_content(prompt, **kwargs)
+
+class AgenteDeDados:
+    """Gerencia a comunicação com o modelo Gemma."""
+
+    def __init__(self, api_key, model_name='gemini-1.5-flash', cache=None, interpretador=None,
+                 base_exemplos=None, k_exemplos=3, dialeto='MySQL', modelo=None,
+                 model_name_reserva=None, modelo_reserva=None, opcoes_cliente=None, fluxo=False,
+                 indice_nomes=None):
+        # `modelo` substitui o genai.GenerativeModel (ex.: o ModeloFalso dos benchmarks).
+        if modelo is None:
+            modelo = ModeloSobDemanda(api_key, model_name)
+            if model_name_reserva and modelo_reserva is None:
+                modelo_reserva = ModeloSobDemanda(api_key, model_name_reserva)
+        self.model_name = model_name
+        self.model = modelo
+        # Prazo, novas tentativas, circuit breaker e modelo reserva; `opcoes_cliente` vai para o ClienteModelo.
+        self.cliente = ClienteModelo(modelo, model_name, reserva=modelo_reserva, nome_reserva=model_name_reserva,
+                                     **(opcoes_cliente or {}))
+        # Com `fluxo`, a resposta chega em streaming e a leitura para no fim da primeira instrução.
+        self.fluxo = fluxo
+        self.cache = cache
+        self.interpretador = interpretador
+        # Com um IndiceNomes, filtros por nome viram buscas pela chave primária (e toleram erros de digitação).
+        self.indice_nomes = indice_nomes
+        self.base_exemplos = base_exemplos
+        self.k_exemplos = k_exemplos
+        # Dialeto SQL do backend ativo (ex.: 'MySQL' ou 'SQLite'), citado nas regras do prompt.
+        self.dialeto = dialeto
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.tokens_prompt_completo = 0
+        self.tokens_prompt_enviado = 0
+        # Qualquer mudança no prompt ou no esquema muda a impressão digital e invalida o cache.
+        # Exemplos verificados acrescentados à base não entram nela: não tornam traduções antigas erradas.
+        self.impressao = impressao_digital(PROMPT_SQL, ESQUEMA_CLIENTES, EXEMPLOS_TRADUCAO, dialeto)
+        if self.cache is not None:
+            self.cache.invalidar_outras_versoes(self.model_name, self.impressao)
+
+    @cronometrado("agente.montar_prompt")
+    def montar_prompt(self, pergunta_usuario):
+        """Monta o prompt com o esquema, os exemplos e a pergunta.
+
+        Com uma base de exemplos, o prompt leva só os k exemplos mais relevantes e as colunas
+        que eles ou a pergunta citam.
+        """
+        completo = PROMPT_SQL.format(
+            dialeto=self.dialeto,
+            esquema=ESQUEMA_CLIENTES,
+            exemplos=EXEMPLOS_TRADUCAO,
+            pergunta_usuario=pergunta_usuario,
+        )
+        if self.base_exemplos is None:
+            prompt = completo
+        else:
+            exemplos = self.base_exemplos.buscar(pergunta_usuario, self.k_exemplos)
+            colunas = colunas_referenciadas(pergunta_usuario, exemplos) or COLUNAS_CLIENTES
+            prompt = PROMPT_SQL.format(
+                dialeto=self.dialeto,
+                esquema=montar_esquema(colunas),
+                exemplos=formatar_exemplos(exemplos),
+                pergunta_usuario=pergunta_usuario,
+            )
+        with self._lock:
+            self.prompts += 1
+            self.tokens_prompt_completo += estimar_tokens(completo)
+            self.tokens_prompt_enviado += estimar_tokens(prompt)
+        return prompt
+
+    def montar_prompt_pacote(self, perguntas):
+        """Monta um prompt com as perguntas numeradas, o esquema e os exemplos relevantes a todas."""
+        if self.base_exemplos is None:
+            esquema, exemplos = ESQUEMA_CLIENTES, EXEMPLOS_TRADUCAO
+        else:
+            escolhidos = []
+            for pergunta in perguntas:
+                escolhidos += [exemplo for exemplo in self.base_exemplos.buscar(pergunta, self.k_exemplos)
+                               if exemplo not in escolhidos]
+            colunas = set().union(*(colunas_referenciadas(pergunta, escolhidos) for pergunta in perguntas))
+            esquema, exemplos = montar_esquema(colunas or COLUNAS_CLIENTES), formatar_exemplos(escolhidos)
+        numeradas = "\n".join(f"        {numero}. {pergunta}" for numero, pergunta in enumerate(perguntas, start=1))
+        return PROMPT_PACOTE.format(dialeto=self.dialeto, esquema=esquema, exemplos=exemplos, perguntas=numeradas)
+
+    def aquecer(self):
+        """Carrega o cliente do modelo antes da primeira pergunta (ex.: numa thread em segundo plano)."""
+        self.cliente.aquecer()
+
+    def registrar_resposta_verificada(self, pergunta_usuario, sql):
+        """Guarda uma tradução confirmada pelo usuário como novo exemplo."""
+        if self.base_exemplos is not None:
+            self.base_exemplos.adicionar(pergunta_usuario, sql)
+
+    def estatisticas_prompt(self):
+        """Compara os tokens estimados do prompt completo com os do prompt enviado."""
+        with self._lock:
+            economia = 1 - self.tokens_prompt_enviado / self.tokens_prompt_completo if self.tokens_prompt_completo else 0.0
+            return {
+                "prompts": self.prompts,
+                "exemplos_na_base": len(self.base_exemplos) if self.base_exemplos is not None else len(EXEMPLOS_PADRAO),
+                "tokens_prompt_completo": self.tokens_prompt_completo,
+                "tokens_prompt_enviado": self.tokens_prompt_enviado,
+                "economia": economia,
+            }
+
+    def traduzir(self, pergunta_usuario, resolver_nomes=True):
+        """Traduz a pergunta para (sql, parametros).
+
+        Perguntas com formato conhecido são resolvidas pelo interpretador local, sem chamar o modelo;
+        as demais vão para traduzir_para_sql e retornam parametros None. Com resolver_nomes=False,
+        os filtros por nome ficam como o tradutor os escreveu (ver resolver_nomes).
+        """
+        consulta = self.interpretador.interpretar(pergunta_usuario) if self.interpretador is not None else None
+        if consulta is not None:
+            METRICAS.contar("traducoes_do_interpretador")
+            sql, parametros = consulta.sql, consulta.parametros
+        else:
+            sql, parametros = self.traduzir_para_sql(pergunta_usuario), None
+        return self.resolver_nomes(sql, parametros) if resolver_nomes else (sql, parametros)
+
+    def resolver_nomes(self, sql, parametros):
+        """Passa os filtros por nome do SQL pelo índice de nomes, que os troca por `id IN (...)`.
+
+        A troca acontece depois do cache: os ids de um nome mudam com as escritas, a tradução não.
+        """
+        if self.indice_nomes is None or not sql:
+            return sql, parametros
+        sql, parametros, correcoes = self.indice_nomes.reescrever(sql, parametros)
+        for nome, ids in correcoes:
+            print(f"Agente: nenhum cliente se chama '{nome}'; usando o nome mais parecido"
+                  f" (id{'s' if len(ids) > 1 else ''} {', '.join(map(str, ids))}).")
+        return sql, parametros
+
+    @cronometrado("agente.traduzir_pacote")
+    def traduzir_pacote(self, perguntas):
+        """Traduz várias perguntas com uma chamada ao modelo; retorna [(sql, parametros)] na mesma ordem.
+
+        O interpretador e o cache atendem primeiro; as perguntas restantes vão juntas num prompt
+        numerado. As que a resposta não trouxer (ou todas, se a chamada falhar) são traduzidas
+        uma a uma por traduzir_para_sql.
+        """
+        resultados = [None] * len(perguntas)
+        pendentes = []
+        for posicao, pergunta in enumerate(perguntas):
+            consulta = self.interpretador.interpretar(pergunta) if self.interpretador is not None else None
+            if consulta is not None:
+                METRICAS.contar("traducoes_do_interpretador")
+                resultados[posicao] = (consulta.sql, consulta.parametros)
+                continue
+            sql = self.cache.obter(pergunta, self.model_name, self.impressao) if self.cache is not None else None
+            if sql is not None:
+                METRICAS.contar("traducoes_do_cache")
+                resultados[posicao] = (sql, None)
+                continue
+            pendentes.append(posicao)
+
+        if len(pendentes) > 1:
+            prompt = self.montar_prompt_pacote([perguntas[posicao] for posicao in pendentes])
+            try:
+                texto, modelo = self.cliente.gerar(prompt)
+            except ErroModelo as e:
+                print(f"Erro na API do Gemma ao traduzir {len(pendentes)} perguntas juntas: {e}")
+                texto, modelo = "", None
+            for posicao, sql in zip(pendentes, separar_respostas(texto, len(pendentes))):
+                if sql:
+                    METRICAS.contar("traducoes_em_pacote")
+                    resultados[posicao] = (sql, None)
+                    if self.cache is not None and modelo == self.model_name:
+                        self.cache.guardar(perguntas[posicao], self.model_name, self.impressao, sql)
+
+        for posicao in pendentes:
+            if resultados[posicao] is None:
+                resultados[posicao] = (self.traduzir_para_sql(perguntas[posicao]), None)
+        return [self.resolver_nomes(sql, parametros) for sql, parametros in resultados]
+
+    @cronometrado("agente.traduzir_para_sql")
+    def traduzir_para_sql(self, pergunta_usuario):
+        """Usa o Gemma para traduzir a pergunta para SQL com RAG."""
+        if self.cache is not None:
+            sql = self.cache.obter(pergunta_usuario, self.model_name, self.impressao)
+            if sql is not None:
+                METRICAS.contar("traducoes_do_cache")
+                return sql
+
+        sql, modelo = self._gerar_sql(pergunta_usuario)
+        # Respostas do modelo reserva não vão para o cache: ele é mais barato e menos confiável.
+        if sql and self.cache is not None and modelo == self.model_name:
+            self.cache.guardar(pergunta_usuario, self.model_name, self.impressao, sql)
+        return sql
+
+    def _gerar_sql(self, pergunta_usuario):
+        """Retorna (sql, nome do modelo que respondeu), ou (None, None) se a chamada falhar."""
+        prompt = self.montar_prompt(pergunta_usuario)
+
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except genai.types.APIError as e:
-            print(f"Erro na API do Gemma: {e}")
-            return None
-        except genai.types.RateLimitError as e:
-            print(f"Limite de requisições atingido: {e}")
-            return None
-        except genai.types.AuthenticationError as e:
-            print(f"Erro de autenticação com a API do Gemma: {e}")
-            return None
-        except Exception as e:
-            print(f"Erro na API do Gemma: {e}")
-            return None
\ No newline at end of file
+            texto, modelo = self.cliente.gerar(prompt, fluxo=MontadorSQL if self.fluxo else None)
+            return cortar_sql(texto) or None, modelo
+        except ErroModelo as e:
+            if e.codigo == 429:
+                print(f"Limite de requisições atingido: {e}")
+            elif e.codigo in (401, 403):
+                print(f"Erro de autenticação com a API do Gemma: {e}")
+            else:
+                print(f"Erro na API do Gemma: {e}")
+            return None, None
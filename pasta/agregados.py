@@ -0,0 +1,333 @@
+# agregados.py
+
+import re
+import threading
+import unicodedata
+
+# Expressões do SELECT que o resumo sabe calcular: (função, coluna) -> campo do resumo.
+AGREGADOS = {
+    ("count", "*"): "contagem",
+    ("count", "id"): "contagem",
+    ("count", "renda"): "com_renda",
+    ("sum", "renda"): "soma",
+    ("avg", "renda"): "media",
+    ("min", "renda"): "minimo",
+    ("max", "renda"): "maximo",
+}
+COLUNAS_GRUPO = ("status", "genero")
+
+PADRAO_CONSULTA = re.compile(
+    r"^select (?P<selecao>.+?) from clientes"
+    r"(?: where (?P<filtros>.+?))?"
+    r"(?: group by (?P<grupo>[\w\s,]+?))?"
+    r"(?: limit (?P<limite>\d+))?$"
+)
+PADRAO_AGREGADO = re.compile(r"^(count|sum|avg|min|max) ?\( ?(\*|\w+) ?\)(?: as \w+)?$")
+PADRAO_COLUNA = re.compile(r"^(\w+)(?: as \w+)?$")
+PADRAO_FILTRO = re.compile(r"^(\w+) ?= ?\x00(\d+)$")
+
+def sem_caixa(valor):
+    """Forma de comparação do MySQL (collation *_ai_ci): sem acentos e sem diferença de caixa."""
+    if valor is None:
+        return None
+    return unicodedata.normalize("NFKD", valor).encode("ascii", "ignore").decode("ascii").casefold()
+
+def separar_literais(sql, params):
+    """Troca literais e marcadores %s por \\x00N e retorna (texto em minúsculas, valores).
+
+    Retorna (None, None) quando o SQL tem algo que o resumo não interpreta com segurança
+    (aspas duplas, crases, barras invertidas ou parâmetros que não batem com os marcadores).
+    """
+    if any(c in sql for c in '"`\\'):
+        return None, None
+    valores = []
+    params = list(params or [])
+    pedacos = []
+    posicao = 0
+    for m in re.finditer(r"'((?:[^']|'')*)'|%s", sql):
+        pedacos.append(sql[posicao:m.start()].lower())
+        if m.group(0) == "%s":
+            if not params:
+                return None, None
+            valores.append(params.pop(0))
+        else:
+            valores.append(m.group(1).replace("''", "'"))
+        pedacos.append(f"\x00{len(valores) - 1}")
+        posicao = m.end()
+    pedacos.append(sql[posicao:].lower())
+    if params:
+        return None, None
+    texto = re.sub(r"([(),=])", r" \1 ", "".join(pedacos)).strip().rstrip(";")
+    return " ".join(texto.split()), valores
+
+class ResumoClientes:
+    """Contagem e soma/mínimo/máximo de renda por (status, genero), mantidos a cada escrita.
+
+    Registra-se como observador e respondedor do GerenciadorClientes: consultas como
+    `SELECT COUNT(*) FROM clientes WHERE status = 'nome sujo'` ou
+    `SELECT genero, AVG(renda) FROM clientes GROUP BY genero` são respondidas daqui, sem ler a
+    tabela. O resumo é montado da tabela no primeiro uso (ou em `reconstruir`). Remover o
+    mínimo ou o máximo de um grupo não permite saber o próximo; esse grupo tem os extremos
+    relidos do banco quando uma consulta precisar deles.
+    """
+
+    def __init__(self, gerenciador, tentativas_reconstrucao=3):
+        self.gerenciador = gerenciador
+        self.tentativas_reconstrucao = tentativas_reconstrucao
+        # No MySQL, 'Ativo' e 'ativo' caem no mesmo filtro e no mesmo grupo.
+        self._chave = sem_caixa if gerenciador.db_conn.dialeto == "MySQL" else (lambda valor: valor)
+        self._lock = threading.Lock()
+        self._grupos = {}               # (status, genero) -> [contagem, com_renda, soma, minimo, maximo]
+        self._extremos_obsoletos = set()
+        self._versao = None             # versão da tabela refletida no resumo; None = ainda não montado
+        self.respondidas = 0
+        self.encaminhadas = 0
+        self.reconstrucoes = 0
+        self.releituras_extremos = 0
+        gerenciador.adicionar_observador(self)
+        gerenciador.adicionar_respondedor(self)
+
+    # --- manutenção -------------------------------------------------------------------------
+
+    def reconstruir(self):
+        """Monta o resumo a partir da tabela. Retorna False se não conseguir uma leitura estável."""
+        db = self.gerenciador.db_conn
+        for _ in range(self.tentativas_reconstrucao):
+            versao = self.gerenciador.versao_tabela
+            with db.conexao() as conn:
+                if conn is None: return False
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("SELECT status, genero, COUNT(*), COUNT(renda), SUM(renda), MIN(renda), MAX(renda)"
+                                   " FROM clientes GROUP BY status, genero")
+                    linhas = cursor.fetchall()
+                except db.Erro as err:
+                    print(f"Erro ao montar o resumo de clientes: {err}")
+                    return False
+                finally:
+                    cursor.close()
+            with self._lock:
+                # Uma escrita confirmada durante a leitura pode ou não estar nela; lê de novo.
+                if self.gerenciador.versao_tabela != versao:
+                    continue
+                self._grupos = {(status, genero): [contagem, com_renda, soma, minimo, maximo]
+                                for status, genero, contagem, com_renda, soma, minimo, maximo in linhas}
+                self._extremos_obsoletos = set()
+                self._versao = versao
+                self.reconstrucoes += 1
+                return True
+        return False
+
+    def _somar(self, linha):
+        grupo = self._grupos.setdefault((linha[3], linha[4]), [0, 0, None, None, None])
+        grupo[0] += 1
+        renda = linha[2]
+        if renda is not None:
+            grupo[1] += 1
+            grupo[2] = renda if grupo[2] is None else grupo[2] + renda
+            grupo[3] = renda if grupo[3] is None else min(grupo[3], renda)
+            grupo[4] = renda if grupo[4] is None else max(grupo[4], renda)
+
+    def _subtrair(self, linha):
+        chave = (linha[3], linha[4])
+        grupo = self._grupos.get(chave)
+        if grupo is None:
+            return
+        grupo[0] -= 1
+        renda = linha[2]
+        if renda is not None:
+            grupo[1] -= 1
+            grupo[2] -= renda
+            if renda in (grupo[3], grupo[4]):
+                self._extremos_obsoletos.add(chave)
+        if grupo[0] <= 0:
+            del self._grupos[chave]
+            self._extremos_obsoletos.discard(chave)
+        elif grupo[1] <= 0:
+            grupo[2:] = [None, None, None]
+            self._extremos_obsoletos.discard(chave)
+
+    def _aplicar(self, versao, antes, depois):
+        with self._lock:
+            # Antes de montado não há o que atualizar; escritas já lidas na montagem são ignoradas.
+            if self._versao is None or versao <= self._versao:
+                return
+            if antes is not None:
+                self._subtrair(antes)
+            if depois is not None:
+                self._somar(depois)
+
+    def ao_inserir(self, versao, linha):
+        self._aplicar(versao, None, linha)
+
+    def ao_atualizar(self, versao, antes, depois):
+        self._aplicar(versao, antes, depois)
+
+    def ao_deletar(self, versao, antes):
+        self._aplicar(versao, antes, None)
+
+    def _reler_extremos(self, chaves):
+        """Relê do banco o mínimo e o máximo dos grupos que perderam um extremo."""
+        db = self.gerenciador.db_conn
+        versao = self.gerenciador.versao_tabela
+        extremos = {}
+        with db.conexao() as conn:
+            if conn is None: return False
+            cursor = conn.cursor()
+            try:
+                for status, genero in chaves:
+                    condicoes, valores = [], []
+                    for coluna, valor in (("status", status), ("genero", genero)):
+                        if valor is None:
+                            condicoes.append(f"{coluna} IS NULL")
+                        else:
+                            condicoes.append(f"{coluna} = %s")
+                            valores.append(valor)
+                    cursor.execute(db.adaptar_sql(
+                        f"SELECT MIN(renda), MAX(renda) FROM clientes WHERE {' AND '.join(condicoes)}"), tuple(valores))
+                    extremos[(status, genero)] = cursor.fetchone()
+            except db.Erro as err:
+                print(f"Erro ao reler os extremos do resumo: {err}")
+                return False
+            finally:
+                cursor.close()
+        with self._lock:
+            if self.gerenciador.versao_tabela != versao:
+                return False
+            for chave, (minimo, maximo) in extremos.items():
+                if chave in self._grupos:
+                    self._grupos[chave][3:] = [minimo, maximo]
+                self._extremos_obsoletos.discard(chave)
+            self.releituras_extremos += 1
+            return True
+
+    # --- consultas --------------------------------------------------------------------------
+
+    def interpretar(self, sql, params=None):
+        """Reconhece um SELECT respondível pelo resumo: (expressões, filtros, agrupamento, limite) ou None."""
+        texto, valores = separar_literais(sql, params)
+        if texto is None:
+            return None
+        m = PADRAO_CONSULTA.match(texto)
+        if m is None:
+            return None
+
+        agrupamento = []
+        if m.group("grupo"):
+            agrupamento = [coluna.strip() for coluna in m.group("grupo").split(",")]
+            if any(coluna not in COLUNAS_GRUPO for coluna in agrupamento) or len(set(agrupamento)) != len(agrupamento):
+                return None
+
+        expressoes = []
+        for item in m.group("selecao").split(","):
+            item = item.strip()
+            agregado = PADRAO_AGREGADO.match(item)
+            coluna = PADRAO_COLUNA.match(item)
+            if agregado and (agregado.group(1), agregado.group(2)) in AGREGADOS:
+                expressoes.append(("agregado", AGREGADOS[(agregado.group(1), agregado.group(2))]))
+            elif coluna and coluna.group(1) in agrupamento:
+                expressoes.append(("coluna", coluna.group(1)))
+            else:
+                return None
+
+        filtros = {}
+        if m.group("filtros"):
+            for condicao in m.group("filtros").split(" and "):
+                filtro = PADRAO_FILTRO.match(condicao.strip())
+                if filtro is None or filtro.group(1) not in COLUNAS_GRUPO:
+                    return None
+                valor = valores[int(filtro.group(2))]
+                if not isinstance(valor, str):
+                    return None
+                chave = self._chave(valor)
+                # status = 'a' AND status = 'b' não seleciona nada; deixa o banco responder.
+                if filtros.get(filtro.group(1), chave) != chave:
+                    return None
+                filtros[filtro.group(1)] = chave
+        return expressoes, filtros, agrupamento, int(m.group("limite")) if m.group("limite") else None
+
+    def responder(self, sql, params=None):
+        """Retorna as linhas da consulta calculadas pelo resumo, ou None se ela não se encaixa."""
+        consulta = self.interpretar(sql, params)
+        if consulta is None:
+            return None
+        expressoes, filtros, agrupamento, limite = consulta
+        if self._versao is None and not self.reconstruir():
+            self._contar(False)
+            return None
+
+        precisa_extremos = any(valor in ("minimo", "maximo") for _, valor in expressoes)
+        for _ in range(2):
+            with self._lock:
+                selecionados = [
+                    (chave, list(grupo)) for chave, grupo in self._grupos.items()
+                    if all(self._chave(chave[COLUNAS_GRUPO.index(coluna)]) == valor for coluna, valor in filtros.items())
+                ]
+                obsoletos = [chave for chave, _ in selecionados if chave in self._extremos_obsoletos]
+            if not (precisa_extremos and obsoletos):
+                break
+            if not self._reler_extremos(obsoletos):
+                self._contar(False)
+                return None
+        else:
+            self._contar(False)
+            return None
+
+        buckets = {}
+        for chave, grupo in selecionados:
+            rotulo = tuple(self._chave(chave[COLUNAS_GRUPO.index(coluna)]) for coluna in agrupamento)
+            bucket = buckets.setdefault(rotulo, {"valores": {}, "contagem": 0, "com_renda": 0,
+                                                 "soma": None, "minimo": None, "maximo": None})
+            for coluna in agrupamento:
+                valor = chave[COLUNAS_GRUPO.index(coluna)]
+                atual = bucket["valores"].get(coluna)
+                bucket["valores"][coluna] = valor if atual is None else min(atual, valor)
+            contagem, com_renda, soma, minimo, maximo = grupo
+            bucket["contagem"] += contagem
+            bucket["com_renda"] += com_renda
+            if com_renda:
+                bucket["soma"] = soma if bucket["soma"] is None else bucket["soma"] + soma
+                bucket["minimo"] = minimo if bucket["minimo"] is None else min(bucket["minimo"], minimo)
+                bucket["maximo"] = maximo if bucket["maximo"] is None else max(bucket["maximo"], maximo)
+
+        if not agrupamento and not buckets:
+            # Sem GROUP BY, a agregação sobre nenhuma linha ainda devolve uma linha.
+            buckets[()] = {"valores": {}, "contagem": 0, "com_renda": 0, "soma": None, "minimo": None, "maximo": None}
+
+        linhas = []
+        # Os bancos devolvem os grupos ordenados pelas colunas do GROUP BY, com NULL primeiro.
+        for rotulo in sorted(buckets, key=lambda r: [(valor is not None, valor or "") for valor in r]):
+            bucket = buckets[rotulo]
+            linha = []
+            for tipo, valor in expressoes:
+                if tipo == "coluna":
+                    linha.append(bucket["valores"][valor])
+                elif valor == "media":
+                    linha.append(bucket["soma"] / bucket["com_renda"] if bucket["com_renda"] else None)
+                elif valor == "soma" and bucket["soma"] is not None:
+                    linha.append(float(bucket["soma"]))
+                else:
+                    linha.append(bucket[valor])
+            linhas.append(tuple(linha))
+        self._contar(True)
+        return linhas if limite is None else linhas[:limite]
+
+    def _contar(self, respondida):
+        with self._lock:
+            if respondida:
+                self.respondidas += 1
+            else:
+                self.encaminhadas += 1
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "montado": self._versao is not None,
+                "grupos": len(self._grupos),
+                "clientes": sum(grupo[0] for grupo in self._grupos.values()),
+                "respondidas": self.respondidas,
+                "encaminhadas_ao_banco": self.encaminhadas,
+                "reconstrucoes": self.reconstrucoes,
+                "releituras_extremos": self.releituras_extremos,
+                "extremos_obsoletos": len(self._extremos_obsoletos),
+            }
@@ -0,0 +1,167 @@
+# assincrono.py
+
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from cache import normalizar_pergunta
+
+class AgenteAssincrono:
+    """Versão asyncio do AgenteDeDados para atender muitas sessões no mesmo processo.
+
+    As chamadas ao modelo rodam num executor limitado, no máximo `max_chamadas_simultaneas`
+    de cada vez, e perguntas idênticas em andamento compartilham uma única chamada.
+    """
+
+    def __init__(self, agente, max_chamadas_simultaneas=4, timeout=30.0):
+        self.agente = agente
+        self.timeout = timeout
+        self.max_chamadas_simultaneas = max_chamadas_simultaneas
+        self._limite = asyncio.Semaphore(max_chamadas_simultaneas)
+        self._executor = ThreadPoolExecutor(max_workers=max_chamadas_simultaneas, thread_name_prefix="agente")
+        self._em_andamento = {}
+        self.chamadas_modelo = 0
+        self.coalescidas = 0
+        self.timeouts = 0
+
+    async def _chamar_modelo(self, funcao, pergunta_usuario):
+        async with self._limite:
+            self.chamadas_modelo += 1
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, funcao, pergunta_usuario)
+
+    async def _coalescer(self, funcao, pergunta_usuario, timeout):
+        """Roda funcao(pergunta_usuario) no executor, compartilhando a chamada com perguntas idênticas."""
+        # Mesma chave do cache de traduções: só compartilham a chamada perguntas que diferem em
+        # maiúsculas, acentos ou pontuação, nunca no operador ou no sinal de um número.
+        chave = (funcao.__name__, normalizar_pergunta(pergunta_usuario))
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is None:
+            tarefa = asyncio.ensure_future(self._chamar_modelo(funcao, pergunta_usuario))
+            self._em_andamento[chave] = tarefa
+
+            def remover(t, chave=chave):
+                if self._em_andamento.get(chave) is t:
+                    del self._em_andamento[chave]
+            tarefa.add_done_callback(remover)
+        else:
+            self.coalescidas += 1
+
+        try:
+            # O shield impede que o timeout de uma sessão cancele a chamada compartilhada com as outras.
+            return await asyncio.wait_for(asyncio.shield(tarefa), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            print(f"Tempo esgotado aguardando o modelo para: {pergunta_usuario}")
+            return None
+
+    async def traduzir_para_sql(self, pergunta_usuario, timeout=None):
+        """Traduz a pergunta para SQL; retorna None em caso de erro ou de tempo esgotado."""
+        return await self._coalescer(self.agente.traduzir_para_sql, pergunta_usuario, timeout)
+
+    async def traduzir(self, pergunta_usuario, timeout=None):
+        """Traduz a pergunta para (sql, parametros) por AgenteDeDados.traduzir, rodando no executor.
+
+        Interpretador local, modelo e resolução de nomes seguem o mesmo caminho da versão síncrona.
+        """
+        return await self._coalescer(self.agente.traduzir, pergunta_usuario, timeout) or (None, None)
+
+    async def traduzir_pacote(self, perguntas, timeout=None):
+        """Traduz várias perguntas numa chamada (AgenteDeDados.traduzir_pacote); [(sql, parametros)] ou None."""
+        async with self._limite:
+            self.chamadas_modelo += 1
+            loop = asyncio.get_running_loop()
+            futuro = loop.run_in_executor(self._executor, self.agente.traduzir_pacote, list(perguntas))
+            try:
+                return await asyncio.wait_for(futuro, timeout or self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                print(f"Tempo esgotado aguardando o modelo para {len(perguntas)} perguntas.")
+                return None
+
+    def estatisticas(self):
+        return {
+            "chamadas_modelo": self.chamadas_modelo,
+            "coalescidas": self.coalescidas,
+            "timeouts": self.timeouts,
+            "em_andamento": len(self._em_andamento),
+        }
+
+    def fechar(self):
+        self._executor.shutdown(wait=False)
+
+class GerenciadorClientesAssincrono:
+    """Versão asyncio do GerenciadorClientes sobre um executor limitado.
+
+    Por padrão o executor tem o tamanho máximo do pool de conexões (quando o backend tem um),
+    para que nenhuma thread fique bloqueada esperando conexão. O timeout interrompe a espera,
+    não a instrução no servidor.
+    """
+
+    def __init__(self, gerenciador, max_workers=None, timeout=30.0):
+        self.gerenciador = gerenciador
+        self.timeout = timeout
+        max_workers = max_workers or gerenciador.db_conn.max_conexoes or 4
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="banco")
+        self.timeouts = 0
+
+    async def rodar(self, funcao, *args, timeout=None, **kwargs):
+        """Executa uma função qualquer que use o banco no executor limitado."""
+        return await self._executar(funcao, *args, timeout=timeout, **kwargs)
+
+    async def _executar(self, funcao, *args, timeout=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        futuro = loop.run_in_executor(self._executor, partial(funcao, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(futuro, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            print(f"Tempo esgotado na operação '{funcao.__name__}'.")
+            return None
+
+    async def adicionar_cliente(self, id, nome, renda, status, genero, timeout=None):
+        return await self._executar(self.gerenciador.adicionar_cliente, id, nome, renda, status, genero,
+                                    timeout=timeout)
+
+    async def atualizar_cliente(self, id, nome, renda, status, genero, timeout=None):
+        return await self._executar(self.gerenciador.atualizar_cliente, id, nome, renda, status, genero,
+                                    timeout=timeout)
+
+    async def deletar_cliente(self, id, timeout=None):
+        return await self._executar(self.gerenciador.deletar_cliente, id, timeout=timeout)
+
+    async def contar_clientes(self, timeout=None):
+        return await self._executar(self.gerenciador.contar_clientes, timeout=timeout)
+
+    async def executar_query(self, query_sql, params=None, usar_cache=True, timeout=None):
+        return await self._executar(self.gerenciador.executar_query, query_sql, params,
+                                    usar_cache=usar_cache, timeout=timeout)
+
+    async def importar_clientes(self, caminho, formato=None, tamanho_lote=1000, upsert=False, timeout=None):
+        return await self._executar(self.gerenciador.importar_clientes, caminho, formato,
+                                    tamanho_lote=tamanho_lote, upsert=upsert, timeout=timeout)
+
+    async def iterar_query(self, query_sql, params=None, tamanho_lote=500):
+        """Gera as linhas de forma assíncrona, buscando um lote por vez no executor."""
+        loop = asyncio.get_running_loop()
+        linhas = self.gerenciador.iterar_query(query_sql, params, tamanho_lote=tamanho_lote)
+        proximo_lote = lambda: list(itertools.islice(linhas, tamanho_lote))
+        try:
+            while True:
+                lote = await loop.run_in_executor(self._executor, proximo_lote)
+                if not lote:
+                    break
+                for linha in lote:
+                    yield linha
+        finally:
+            await loop.run_in_executor(self._executor, linhas.close)
+
+    def fechar(self):
+        self._executor.shutdown(wait=False)
+
+async def responder(agente, gerenciador, pergunta_usuario, timeout=None):
+    """Traduz e executa uma pergunta de uma sessão: retorna (sql, linhas) ou (None, None)."""
+    query_sql, params = await agente.traduzir(pergunta_usuario, timeout)
+    if not query_sql:
+        return None, None
+    return query_sql, await gerenciador.executar_query(query_sql, params, timeout=timeout)
@@ -0,0 +1,430 @@
+# benchmark.py
+#
+# Mede o desempenho do projeto sem rede: gera clientes sintéticos, mede a vazão do CRUD,
+# a latência das consultas de exemplo e o caminho completo de uma pergunta do chat, com o
+# ModeloFalso no lugar do Gemini. Os resultados saem em JSON para comparar entre commits.
+#
+#   python benchmark.py --linhas 10000 100000 --saida resultados.json
+#   python benchmark.py --backend mysql --linhas 1000000 --latencia-modelo 0.8
+#   python benchmark.py --linhas 1000000 --fragmentos 4
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from agente import AgenteDeDados
+from agregados import ResumoClientes
+from cache import CacheResultados
+from database import ConexaoBancoDados, ConexaoSQLite, GerenciadorClientes
+from exemplos import EXEMPLOS_PADRAO, BaseExemplos
+from fragmentos import BancoFragmentado
+from intencoes import InterpretadorIntencoes
+from metricas import METRICAS
+from modelo_falso import COMENTARIO_PADRAO, ModeloFalso
+from nomes import IndiceNomes
+
+NOMES_MASCULINOS = ["João", "Pedro", "Carlos", "Lucas", "Gabriel", "Rafael", "Marcos", "Paulo", "Tiago", "André",
+                    "Felipe", "Bruno", "Gustavo", "Rodrigo", "Mateus", "Eduardo", "Daniel", "Leonardo"]
+NOMES_FEMININOS = ["Maria", "Ana", "Fernanda", "Juliana", "Beatriz", "Camila", "Larissa", "Patrícia", "Aline",
+                   "Letícia", "Mariana", "Gabriela", "Vanessa", "Bruna", "Amanda", "Natália", "Luíza", "Júlia"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima",
+              "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Araújo",
+              "Fernandes", "Vieira", "Barbosa", "Rocha", "Dias", "Nascimento", "Andrade", "Moreira"]
+
+# Perguntas do caminho completo: as dos exemplos e algumas que o interpretador não reconhece.
+PERGUNTAS = [pergunta for pergunta, _ in EXEMPLOS_PADRAO] + [
+    "Quantos clientes com nome sujo temos no sistema hoje?",
+    "Qual é a média das rendas cadastradas, por favor?",
+    "Me diga o nome de quem tem renda maior que 2000 reais",
+]
+
+# Consultas comparadas entre o banco único e o fragmentado, além das de exemplo do prompt.
+CONSULTAS_FRAGMENTOS = [sql for _, sql in EXEMPLOS_PADRAO] + [
+    "SELECT status, genero, COUNT(*), AVG(renda), MIN(renda), MAX(renda) FROM clientes GROUP BY status, genero",
+    "SELECT nome, renda FROM clientes ORDER BY renda DESC LIMIT 10",
+    "SELECT id, nome FROM clientes WHERE renda BETWEEN 2000 AND 2100 ORDER BY nome LIMIT 50 OFFSET 20",
+    "SELECT nome, renda FROM clientes WHERE id = 1234",
+]
+
+def gerar_clientes(quantidade, semente=0, primeiro_id=1):
+    """Gera clientes sintéticos (id, nome, renda, status, genero) com distribuições plausíveis.
+
+    A renda segue uma log-normal com mediana perto de R$ 2.500; cerca de 30% estão com nome
+    sujo, mais frequente nas rendas baixas.
+    """
+    aleatorio = random.Random(semente)
+    for id in range(primeiro_id, primeiro_id + quantidade):
+        genero = "feminino" if aleatorio.random() < 0.51 else "masculino"
+        primeiro = aleatorio.choice(NOMES_FEMININOS if genero == "feminino" else NOMES_MASCULINOS)
+        nome = f"{primeiro} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}"
+        renda = round(min(max(aleatorio.lognormvariate(math.log(2500), 0.8), 0.0), 200000.0), 2)
+        status = "nome sujo" if aleatorio.random() < (0.45 if renda < 1500 else 0.22) else "ativo"
+        yield id, nome, renda, status, genero
+
+def percentis(amostras):
+    """Resumo de latências em milissegundos."""
+    if not amostras:
+        return {}
+    ordenadas = sorted(amostras)
+    em_ms = lambda p: ordenadas[min(len(ordenadas) - 1, int(round(p * (len(ordenadas) - 1))))] * 1000
+    return {
+        "n": len(ordenadas),
+        "media_ms": sum(ordenadas) / len(ordenadas) * 1000,
+        "p50_ms": em_ms(0.50),
+        "p90_ms": em_ms(0.90),
+        "p99_ms": em_ms(0.99),
+        "max_ms": ordenadas[-1] * 1000,
+    }
+
+def cronometrar(funcao, *args, **kwargs):
+    inicio = time.perf_counter()
+    funcao(*args, **kwargs)
+    return time.perf_counter() - inicio
+
+def criar_backend(args, fragmento=None):
+    if args.backend == "sqlite":
+        if fragmento is None:
+            return ConexaoSQLite(args.sqlite_caminho)
+        raiz, extensao = os.path.splitext(args.sqlite_caminho)
+        return ConexaoSQLite(f"{raiz}.{fragmento}{extensao}")
+    return ConexaoBancoDados(args.mysql_host, args.mysql_usuario, args.mysql_senha,
+                             args.mysql_banco if fragmento is None else f"{args.mysql_banco}_{fragmento}")
+
+def recriar_tabela(db):
+    if not db.preparar_banco():
+        raise SystemExit("Não foi possível preparar o banco do benchmark.")
+    with db.conexao() as conn:
+        if conn is None:
+            raise SystemExit("Não foi possível conectar ao banco do benchmark.")
+        cursor = conn.cursor()
+        cursor.execute("DROP TABLE IF EXISTS clientes")
+        cursor.execute("DROP TABLE IF EXISTS migracoes_esquema")
+        conn.commit()
+        cursor.close()
+
+def medir_carga(gerenciador, linhas, tamanho_lote, semente):
+    """Importa `linhas` clientes sintéticos em lotes."""
+    relatorio = gerenciador.inserir_clientes(enumerate(gerar_clientes(linhas, semente), start=1),
+                                             tamanho_lote=tamanho_lote)
+    return {
+        "gravadas": relatorio["gravadas"],
+        "segundos": relatorio["segundos"],
+        "linhas_por_segundo": relatorio["linhas_por_segundo"],
+    }
+
+def medir_crud(gerenciador, linhas, operacoes, semente):
+    """Latência e vazão de adicionar/atualizar/deletar um cliente por vez."""
+    aleatorio = random.Random(semente)
+    novos = list(gerar_clientes(operacoes, semente + 1, primeiro_id=linhas + 1))
+    tempos = {"adicionar": [], "atualizar": [], "deletar": []}
+    # As operações imprimem uma mensagem cada; o benchmark não quer medir o terminal.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for cliente in novos:
+            tempos["adicionar"].append(cronometrar(gerenciador.adicionar_cliente, *cliente))
+        for _ in range(operacoes):
+            id = aleatorio.randint(1, linhas)
+            tempos["atualizar"].append(cronometrar(gerenciador.atualizar_cliente, id, None,
+                                                   round(aleatorio.uniform(500, 20000), 2), None, None))
+        for cliente in novos:
+            tempos["deletar"].append(cronometrar(gerenciador.deletar_cliente, cliente[0]))
+    return {
+        operacao: dict(percentis(amostras), operacoes_por_segundo=len(amostras) / sum(amostras) if amostras else 0.0)
+        for operacao, amostras in tempos.items()
+    }
+
+def medir_sessao(gerenciador, linhas, operacoes, semente):
+    """Vazão da mesma mistura de escritas feita uma a uma e numa SessaoClientes (um commit).
+
+    A mistura tem `operacoes` inserções, atualizações de renda e exclusões dos inseridos; as
+    duas rodadas usam faixas de ids novas diferentes para não se atrapalharem.
+    """
+    aleatorio = random.Random(semente)
+    rendas = [(aleatorio.randint(1, linhas), round(aleatorio.uniform(500, 20000), 2)) for _ in range(operacoes)]
+    avulsas = list(gerar_clientes(operacoes, semente + 2, primeiro_id=linhas + operacoes + 1))
+    em_sessao = list(gerar_clientes(operacoes, semente + 3, primeiro_id=linhas + 2 * operacoes + 1))
+    total = 3 * operacoes
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        for cliente in avulsas:
+            gerenciador.adicionar_cliente(*cliente)
+        for id, renda in rendas:
+            gerenciador.atualizar_cliente(id, None, renda, None, None)
+        for cliente in avulsas:
+            gerenciador.deletar_cliente(cliente[0])
+        segundos_avulsas = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with gerenciador.sessao() as sessao:
+        for cliente in em_sessao:
+            sessao.adicionar(*cliente)
+        for id, renda in rendas:
+            sessao.atualizar(id, renda=renda)
+        for cliente in em_sessao:
+            sessao.deletar(cliente[0])
+    segundos_sessao = time.perf_counter() - inicio
+
+    return {
+        "operacoes": total,
+        "avulsas": {"segundos": segundos_avulsas, "operacoes_por_segundo": total / segundos_avulsas},
+        "sessao": {"segundos": segundos_sessao, "operacoes_por_segundo": total / segundos_sessao,
+                   "instrucoes": sessao.relatorio["instrucoes"] if sessao.relatorio else None},
+        "aceleracao": segundos_avulsas / segundos_sessao if segundos_sessao else None,
+    }
+
+def medir_consultas(gerenciador, repeticoes):
+    """Latência das consultas de exemplo do prompt: direto no banco e pelo caminho com caches."""
+    resultado = {}
+    for _, sql in EXEMPLOS_PADRAO:
+        banco = [cronometrar(gerenciador.executar_query, sql, usar_cache=False) for _ in range(repeticoes)]
+        com_cache = [cronometrar(gerenciador.executar_query, sql) for _ in range(repeticoes)]
+        resultado[sql] = {"banco": percentis(banco), "com_cache": percentis(com_cache)}
+    return resultado
+
+def medir_perguntas(agente, gerenciador, repeticoes):
+    """Caminho de uma pergunta no chat: tradução e leitura do resultado com iterar_query."""
+    tempos, traducao = [], []
+    for _ in range(repeticoes):
+        for pergunta in PERGUNTAS:
+            inicio = time.perf_counter()
+            query_sql, params = agente.traduzir(pergunta)
+            traduzida = time.perf_counter()
+            if query_sql:
+                for _ in gerenciador.iterar_query(query_sql, params):
+                    pass
+            traducao.append(traduzida - inicio)
+            tempos.append(time.perf_counter() - inicio)
+    return {"total": percentis(tempos), "traducao": percentis(traducao), "chamadas_modelo": agente.model.chamadas}
+
+def trocar_letras(nome, aleatorio):
+    """Erro de digitação: duas letras vizinhas trocadas."""
+    posicao = aleatorio.randrange(len(nome) - 1)
+    return nome[:posicao] + nome[posicao + 1] + nome[posicao] + nome[posicao + 2:]
+
+def medir_nomes(gerenciador, linhas, repeticoes, semente):
+    """Busca por nome: LIKE e igualdade no banco contra o IndiceNomes, inclusive com erros de digitação."""
+    aleatorio = random.Random(semente)
+    nomes = [gerenciador.executar_query("SELECT nome FROM clientes WHERE id = %s",
+                                        (aleatorio.randint(1, linhas),), usar_cache=False)[0][0]
+             for _ in range(repeticoes)]
+    com_erro = [trocar_letras(nome, aleatorio) for nome in nomes]
+    indice = IndiceNomes(gerenciador)
+    montagem = cronometrar(indice.reconstruir)
+    # Acerto: o primeiro resultado da busca com erro é um cliente com o nome certo.
+    acertos = sum(1 for nome, errado in zip(nomes, com_erro)
+                  if any(id in indice.ids_com_nome(nome) for id, _ in indice.buscar(errado, 1)))
+    return {
+        "montagem_s": montagem,
+        **{chave: valor for chave, valor in indice.estatisticas().items() if chave in ("nomes_distintos", "palavras")},
+        "banco_igualdade": percentis([cronometrar(gerenciador.executar_query, "SELECT id FROM clientes WHERE nome = %s",
+                                                  (nome,), usar_cache=False) for nome in nomes]),
+        "banco_like": percentis([cronometrar(gerenciador.executar_query, "SELECT id FROM clientes WHERE nome LIKE %s",
+                                             (f"%{nome.split()[-1]}%",), usar_cache=False) for nome in nomes]),
+        "indice_exato": percentis([cronometrar(indice.ids_com_nome, nome) for nome in nomes]),
+        "indice_padrao": percentis([cronometrar(indice.buscar_padrao, f"%{nome.split()[-1]}%") for nome in nomes]),
+        "indice_com_erro": percentis([cronometrar(indice.buscar, errado, 1) for errado in com_erro]),
+        "acertos_com_erro": acertos / len(nomes) if nomes else None,
+    }
+
+def medir_fragmentos(args, gerenciador, linhas):
+    """Consultas no banco único contra `args.fragmentos` bancos com os mesmos clientes.
+
+    Confere se o resultado recombinado é igual ao do banco único e guarda o tempo de cada
+    fragmento: a consulta espera pelo mais lento.
+    """
+    db = BancoFragmentado([criar_backend(args, i) for i in range(args.fragmentos)])
+    for fragmento in db.fragmentos:
+        recriar_tabela(fragmento)
+    fragmentado = GerenciadorClientes(db)
+    with contextlib.redirect_stdout(io.StringIO()):
+        fragmentado.configurar_tabela()
+    # Copia as linhas atuais do banco único, já alteradas pelas medições de CRUD.
+    relatorio = fragmentado.inserir_clientes(
+        enumerate(gerenciador.iterar_query("SELECT id, nome, renda, status, genero FROM clientes", usar_cache=False),
+                  start=1), tamanho_lote=args.tamanho_lote)
+    resultado = {"fragmentos": args.fragmentos, "carga_linhas_por_segundo": relatorio["linhas_por_segundo"]}
+    comparar = lambda linhas: sorted(tuple(round(v, 6) if isinstance(v, float) else v for v in linha)
+                                     for linha in linhas)
+    for sql in CONSULTAS_FRAGMENTOS:
+        unico = [cronometrar(gerenciador.executar_query, sql, usar_cache=False) for _ in range(args.repeticoes)]
+        distribuido = [cronometrar(fragmentado.executar_query, sql, usar_cache=False) for _ in range(args.repeticoes)]
+        resultado[sql] = {
+            "banco_unico": percentis(unico),
+            "fragmentado": percentis(distribuido),
+            "resultado_igual": comparar(gerenciador.executar_query(sql, usar_cache=False))
+                               == comparar(fragmentado.executar_query(sql, usar_cache=False)),
+        }
+    resultado["por_fragmento"] = {chave: valor for chave, valor in db.estatisticas_fragmentos().items()
+                                  if chave.startswith("fragmento_")}
+    db.fechar()
+    return resultado
+
+def medir_sobrecarga_metricas(gerenciador, repeticoes, iteracoes=100000):
+    """Custo da instrumentação: por span (desligada e ligada) e numa consulta pontual."""
+    habilitado = METRICAS.habilitado
+
+    def por_span():
+        inicio = time.perf_counter()
+        for _ in range(iteracoes):
+            with METRICAS.medir("benchmark.vazio"):
+                pass
+        return (time.perf_counter() - inicio) / iteracoes * 1e9
+
+    def consulta():
+        sql = "SELECT nome FROM clientes WHERE id = %s"
+        return percentis([cronometrar(gerenciador.executar_query, sql, (1,), usar_cache=False)
+                          for _ in range(repeticoes)])
+
+    inicio = time.perf_counter()
+    for _ in range(iteracoes):
+        pass
+    laco_ns = (time.perf_counter() - inicio) / iteracoes * 1e9
+    try:
+        METRICAS.desligar()
+        desligada_ns, consulta_desligada = por_span(), consulta()
+        METRICAS.ligar()
+        ligada_ns, consulta_ligada = por_span(), consulta()
+    finally:
+        METRICAS.habilitado = habilitado
+        METRICAS.zerar()
+    return {
+        "span_desligado_ns": desligada_ns - laco_ns,
+        "span_ligado_ns": ligada_ns - laco_ns,
+        "consulta_pontual_desligada": consulta_desligada,
+        "consulta_pontual_ligada": consulta_ligada,
+    }
+
+def executar(args):
+    resultados = []
+    for linhas in args.linhas:
+        db = criar_backend(args)
+        recriar_tabela(db)
+        gerenciador = GerenciadorClientes(db, cache_resultados=CacheResultados())
+        with contextlib.redirect_stdout(io.StringIO()):
+            gerenciador.configurar_tabela()
+        print(f"[{linhas} linhas] carregando...", file=sys.stderr)
+        rodada = {"linhas": linhas, "carga": medir_carga(gerenciador, linhas, args.tamanho_lote, args.semente)}
+        if args.resumo:
+            ResumoClientes(gerenciador)
+        print(f"[{linhas} linhas] CRUD...", file=sys.stderr)
+        rodada["crud"] = medir_crud(gerenciador, linhas, args.operacoes, args.semente)
+        rodada["sessao"] = medir_sessao(gerenciador, linhas, args.operacoes, args.semente)
+        print(f"[{linhas} linhas] consultas...", file=sys.stderr)
+        rodada["consultas"] = medir_consultas(gerenciador, args.repeticoes)
+        rodada["sobrecarga_metricas"] = medir_sobrecarga_metricas(gerenciador, args.repeticoes)
+        rodada["nomes"] = medir_nomes(gerenciador, linhas, args.repeticoes, args.semente)
+        if args.fragmentos > 1:
+            print(f"[{linhas} linhas] fragmentos...", file=sys.stderr)
+            rodada["fragmentos"] = medir_fragmentos(args, gerenciador, linhas)
+        print(f"[{linhas} linhas] perguntas...", file=sys.stderr)
+        agente = AgenteDeDados(
+            None,
+            interpretador=InterpretadorIntencoes() if args.interpretador else None,
+            base_exemplos=BaseExemplos(),
+            dialeto=db.dialeto,
+            modelo=ModeloFalso(args.latencia_modelo, args.variacao_modelo, semente=args.semente),
+        )
+        rodada["perguntas"] = medir_perguntas(agente, gerenciador, args.repeticoes_perguntas)
+        resultados.append(rodada)
+        db.fechar()
+    return resultados
+
+def medir_fluxo(args):
+    """Tempo até o SQL com e sem streaming, com um modelo falso que cerca o SQL e comenta depois.
+
+    Sem cache nem interpretador: toda pergunta vai ao modelo. Com streaming, a leitura para no
+    fim da primeira instrução e o comentário não é esperado.
+    """
+    resultado = {}
+    for nome, fluxo in (("sem_fluxo", False), ("com_fluxo", True)):
+        agente = AgenteDeDados(
+            None,
+            base_exemplos=BaseExemplos(),
+            modelo=ModeloFalso(args.latencia_modelo, args.variacao_modelo, semente=args.semente,
+                               latencia_pedaco=args.latencia_pedaco, comentario=COMENTARIO_PADRAO, cercas=True),
+            fluxo=fluxo,
+        )
+        tempos, sqls = [], set()
+        for _ in range(args.repeticoes_perguntas):
+            for pergunta in PERGUNTAS:
+                inicio = time.perf_counter()
+                sqls.add(agente.traduzir_para_sql(pergunta))
+                tempos.append(time.perf_counter() - inicio)
+        resultado[nome] = dict(percentis(tempos), sqls_distintos=len(sqls))
+    resultado["reducao_mediana"] = 1 - resultado["com_fluxo"]["p50_ms"] / resultado["sem_fluxo"]["p50_ms"]
+    return resultado
+
+def commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do agente de clientes (offline).")
+    parser.add_argument("--backend", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--sqlite-caminho", default=None, help="arquivo SQLite (padrão: temporário)")
+    parser.add_argument("--mysql-host", default=os.getenv("DB_HOST", "localhost"))
+    parser.add_argument("--mysql-usuario", default=os.getenv("DB_USER", "root"))
+    parser.add_argument("--mysql-senha", default=os.getenv("DB_PASSWORD", ""))
+    # Banco separado: a tabela clientes é apagada e recriada a cada rodada.
+    parser.add_argument("--mysql-banco", default=os.getenv("DB_BENCHMARK", "agente-ia-benchmark"))
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10000])
+    parser.add_argument("--tamanho-lote", type=int, default=1000)
+    parser.add_argument("--operacoes", type=int, default=200, help="operações de CRUD avulsas por tipo")
+    parser.add_argument("--repeticoes", type=int, default=20, help="execuções de cada consulta de exemplo")
+    parser.add_argument("--repeticoes-perguntas", type=int, default=5)
+    parser.add_argument("--latencia-modelo", type=float, default=0.0, help="segundos por chamada ao modelo falso")
+    parser.add_argument("--variacao-modelo", type=float, default=0.0)
+    parser.add_argument("--latencia-pedaco", type=float, default=0.005,
+                        help="segundos entre os pedaços da resposta em streaming do modelo falso")
+    parser.add_argument("--fragmentos", type=int, default=0,
+                        help="compara as consultas com a tabela distribuída entre N bancos (0: não compara)")
+    parser.add_argument("--sem-interpretador", dest="interpretador", action="store_false")
+    parser.add_argument("--sem-resumo", dest="resumo", action="store_false")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default=None, help="arquivo JSON de resultados (padrão: stdout)")
+    args = parser.parse_args()
+
+    temporario = None
+    if args.backend == "sqlite" and args.sqlite_caminho is None:
+        temporario = tempfile.mkdtemp(prefix="benchmark-clientes-")
+        args.sqlite_caminho = os.path.join(temporario, "clientes.sqlite3")
+    try:
+        resultados = executar(args)
+        print("streaming do modelo...", file=sys.stderr)
+        fluxo = medir_fluxo(args)
+    finally:
+        if temporario:
+            for nome in os.listdir(temporario):
+                os.remove(os.path.join(temporario, nome))
+            os.rmdir(temporario)
+
+    relatorio = {
+        "commit": commit_atual(),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": {chave: valor for chave, valor in vars(args).items() if chave != "mysql_senha"},
+        "resultados": resultados,
+        "fluxo_do_modelo": fluxo,
+    }
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto + "\n")
+        print(f"Resultados gravados em {args.saida}.")
+    else:
+        print(texto)
+
+if __name__ == "__main__":
+    main()
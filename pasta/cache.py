@@ -0,0 +1,294 @@
+# cache.py
+
+import hashlib
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Comparações e o sinal de menos de um número mudam o sentido da pergunta: viram termos próprios.
+PADRAO_OPERADOR = re.compile(r"(<=|>=|!=|<>|=|<|>|(?<![\w.,])-(?=\d))")
+# Muda a cada alteração de normalizar_pergunta, para que as chaves antigas do disco não sejam reaproveitadas.
+VERSAO_NORMALIZACAO = 2
+
+def normalizar_pergunta(texto):
+    """Normaliza a pergunta ignorando maiúsculas, acentos, pontuação e espaços repetidos.
+
+    Os operadores de comparação e o sinal de menos são mantidos como termos:
+
+    >>> normalizar_pergunta("Clientes com renda > 2.000?"), normalizar_pergunta("clientes com renda < 2000")
+    ('clientes com renda > 2 000', 'clientes com renda < 2000')
+    >>> len({normalizar_pergunta(f"renda {op} 2000") for op in ("<", ">", "=", "<=", ">=", "!=")})
+    6
+    >>> normalizar_pergunta("saldo de -5"), normalizar_pergunta("renda <> 10")
+    ('saldo de - 5', 'renda != 10')
+    """
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    partes = PADRAO_OPERADOR.split(texto)
+    # Nas partes pares (fora dos operadores), a pontuação vira espaço (e não some) para que
+    # "2,5" não se confunda com "25".
+    for i in range(0, len(partes), 2):
+        partes[i] = re.sub(r"[^\w\s]", " ", partes[i])
+    for i in range(1, len(partes), 2):
+        partes[i] = "!=" if partes[i] == "<>" else partes[i]
+    return " ".join(" ".join(partes).split())
+
+def impressao_digital(*partes):
+    """Retorna um hash curto e estável das partes (prompt, esquema...)."""
+    h = hashlib.sha256()
+    for parte in partes:
+        h.update(str(parte).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+def normalizar_sql(sql):
+    """Normaliza o texto SQL para uso como chave (espaços e ';' final)."""
+    return " ".join(sql.split()).rstrip(";").rstrip()
+
+def tamanho_resultado(linhas):
+    """Estimativa em bytes da memória ocupada por uma lista de linhas."""
+    total = sys.getsizeof(linhas)
+    for linha in linhas:
+        total += sys.getsizeof(linha) + sum(sys.getsizeof(valor) for valor in linha)
+    return total
+
+class CacheResultados:
+    """Cache LRU de resultados de consultas, limitado por entradas e bytes.
+
+    Cada entrada guarda a versão da tabela em que foi lida; qualquer escrita feita pelo
+    GerenciadorClientes incrementa a versão e torna as entradas anteriores inválidas.
+    Escritas feitas por fora deste processo não são percebidas.
+    """
+
+    def __init__(self, max_entradas=500, max_bytes=32 * 1024 * 1024, max_linhas_por_entrada=1000):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.max_linhas_por_entrada = max_linhas_por_entrada
+        self._entradas = OrderedDict()  # chave -> (versão, linhas, bytes)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidadas = 0
+        self.despejos = 0
+
+    @staticmethod
+    def chave(sql, params):
+        return normalizar_sql(sql), repr(tuple(params)) if params else ""
+
+    @staticmethod
+    def cacheavel(sql):
+        """Só consultas de leitura podem ser guardadas."""
+        return sql.lstrip().lower().startswith("select")
+
+    def obter(self, sql, params, versao):
+        """Retorna as linhas em cache lidas na versão atual da tabela, ou None."""
+        chave = self.chave(sql, params)
+        with self._lock:
+            item = self._entradas.get(chave)
+            if item is None:
+                self.misses += 1
+                return None
+            versao_item, linhas, tamanho = item
+            if versao_item != versao:
+                del self._entradas[chave]
+                self.bytes -= tamanho
+                self.invalidadas += 1
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.hits += 1
+            return list(linhas)
+
+    def guardar(self, sql, params, versao, linhas):
+        """Guarda o resultado lido na `versao` da tabela, se couber nos limites."""
+        if len(linhas) > self.max_linhas_por_entrada:
+            return
+        tamanho = tamanho_resultado(linhas)
+        if tamanho > self.max_bytes:
+            return
+        chave = self.chave(sql, params)
+        with self._lock:
+            antigo = self._entradas.pop(chave, None)
+            if antigo is not None:
+                self.bytes -= antigo[2]
+            self._entradas[chave] = (versao, linhas, tamanho)
+            self.bytes += tamanho
+            while len(self._entradas) > self.max_entradas or self.bytes > self.max_bytes:
+                _, (_, _, tamanho_antigo) = self._entradas.popitem(last=False)
+                self.bytes -= tamanho_antigo
+                self.despejos += 1
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.bytes = 0
+
+    def estatisticas(self):
+        """Retorna taxa de acerto, entradas e bytes ocupados."""
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "taxa_acerto": self.hits / consultas if consultas else 0.0,
+                "entradas": len(self._entradas),
+                "bytes": self.bytes,
+                "invalidadas": self.invalidadas,
+                "despejos": self.despejos,
+            }
+
+class CacheTraducoes:
+    """Cache de traduções pergunta -> SQL em dois níveis: LRU em memória e SQLite em disco."""
+
+    def __init__(self, caminho="cache_traducoes.db", max_memoria=1000, max_disco=100000, ttl=7 * 24 * 3600):
+        self.caminho = caminho
+        self.max_memoria = max_memoria
+        self.max_disco = max_disco
+        self.ttl = ttl
+        self._memoria = OrderedDict()  # chave -> (sql, criado_em)
+        self._lock = threading.Lock()
+        self._gravacoes_desde_poda = 0
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.misses = 0
+        self.gravacoes = 0
+        self.despejos = 0
+        self.invalidacoes = 0
+
+        self._conn = None
+        if caminho:
+            self._conn = sqlite3.connect(caminho, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS traducoes (
+                    chave TEXT PRIMARY KEY,
+                    modelo TEXT,
+                    impressao TEXT,
+                    pergunta TEXT,
+                    sql TEXT,
+                    criado_em REAL,
+                    acessado_em REAL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_traducoes_acesso ON traducoes (acessado_em)")
+            self._conn.commit()
+
+    @staticmethod
+    def chave(pergunta, modelo, impressao):
+        return impressao_digital(modelo, impressao, VERSAO_NORMALIZACAO, normalizar_pergunta(pergunta))
+
+    def invalidar_outras_versoes(self, modelo, impressao):
+        """Remove do disco as traduções do modelo feitas com outro prompt ou esquema."""
+        if self._conn is None:
+            return 0
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM traducoes WHERE modelo = ? AND impressao <> ?", (modelo, impressao))
+            self._conn.commit()
+            self.invalidacoes += cur.rowcount
+            return cur.rowcount
+
+    def obter(self, pergunta, modelo, impressao):
+        """Retorna o SQL em cache para a pergunta, ou None."""
+        chave = self.chave(pergunta, modelo, impressao)
+        agora = time.time()
+        with self._lock:
+            item = self._memoria.get(chave)
+            if item is not None:
+                sql, criado_em = item
+                if agora - criado_em <= self.ttl:
+                    self._memoria.move_to_end(chave)
+                    self.hits_memoria += 1
+                    return sql
+                del self._memoria[chave]
+
+            if self._conn is not None:
+                linha = self._conn.execute(
+                    "SELECT sql, criado_em FROM traducoes WHERE chave = ?", (chave,)).fetchone()
+                if linha is not None:
+                    sql, criado_em = linha
+                    if agora - criado_em <= self.ttl:
+                        self._conn.execute("UPDATE traducoes SET acessado_em = ? WHERE chave = ?", (agora, chave))
+                        self._conn.commit()
+                        self._guardar_memoria(chave, sql, criado_em)
+                        self.hits_disco += 1
+                        return sql
+                    self._conn.execute("DELETE FROM traducoes WHERE chave = ?", (chave,))
+                    self._conn.commit()
+
+            self.misses += 1
+            return None
+
+    def guardar(self, pergunta, modelo, impressao, sql):
+        """Guarda a tradução nos dois níveis."""
+        chave = self.chave(pergunta, modelo, impressao)
+        agora = time.time()
+        with self._lock:
+            self._guardar_memoria(chave, sql, agora)
+            self.gravacoes += 1
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO traducoes (chave, modelo, impressao, pergunta, sql, criado_em, acessado_em)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (chave, modelo, impressao, pergunta, sql, agora, agora))
+                self._gravacoes_desde_poda += 1
+                # Podar a cada gravação custaria um COUNT(*); basta fazê-lo periodicamente.
+                if self._gravacoes_desde_poda >= max(1, self.max_disco // 100):
+                    self._podar_disco(agora)
+                self._conn.commit()
+
+    def _guardar_memoria(self, chave, sql, criado_em):
+        self._memoria[chave] = (sql, criado_em)
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_memoria:
+            self._memoria.popitem(last=False)
+            self.despejos += 1
+
+    def _podar_disco(self, agora):
+        """Remove entradas expiradas e, se preciso, as menos acessadas. Chamar com o lock."""
+        self._gravacoes_desde_poda = 0
+        cur = self._conn.execute("DELETE FROM traducoes WHERE criado_em < ?", (agora - self.ttl,))
+        self.despejos += cur.rowcount
+        excesso = self._conn.execute("SELECT COUNT(*) FROM traducoes").fetchone()[0] - self.max_disco
+        if excesso > 0:
+            cur = self._conn.execute(
+                "DELETE FROM traducoes WHERE chave IN "
+                "(SELECT chave FROM traducoes ORDER BY acessado_em LIMIT ?)", (excesso,))
+            self.despejos += cur.rowcount
+
+    def limpar(self):
+        """Esvazia os dois níveis do cache."""
+        with self._lock:
+            self._memoria.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM traducoes")
+                self._conn.commit()
+
+    def estatisticas(self):
+        """Retorna contadores de acertos, falhas e tamanho do cache."""
+        with self._lock:
+            consultas = self.hits_memoria + self.hits_disco + self.misses
+            entradas_disco = 0
+            if self._conn is not None:
+                entradas_disco = self._conn.execute("SELECT COUNT(*) FROM traducoes").fetchone()[0]
+            return {
+                "hits_memoria": self.hits_memoria,
+                "hits_disco": self.hits_disco,
+                "misses": self.misses,
+                "taxa_acerto": (self.hits_memoria + self.hits_disco) / consultas if consultas else 0.0,
+                "gravacoes": self.gravacoes,
+                "despejos": self.despejos,
+                "invalidacoes": self.invalidacoes,
+                "entradas_memoria": len(self._memoria),
+                "entradas_disco": entradas_disco,
+            }
+
+    def fechar(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
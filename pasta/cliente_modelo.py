@@ -0,0 +1,272 @@
+# cliente_modelo.py
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from metricas import METRICAS
+
+# Códigos HTTP que indicam falha passageira: vale a pena tentar de novo (ou no modelo reserva).
+CODIGOS_TRANSITORIOS = {408, 429, 500, 502, 503, 504}
+# Nomes das exceções do google.api_core equivalentes, para quando o código não vem como número.
+ERROS_TRANSITORIOS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway", "Aborted",
+}
+
+class ErroModelo(Exception):
+    """Falha ao chamar o modelo; `codigo` segue os códigos HTTP (ex.: 429) quando conhecido."""
+
+    def __init__(self, mensagem, codigo=None):
+        super().__init__(mensagem)
+        self.codigo = codigo
+
+class PrazoEsgotado(ErroModelo):
+    """O modelo não respondeu dentro do prazo da chamada."""
+
+    def __init__(self, mensagem):
+        super().__init__(mensagem, codigo=408)
+
+class CircuitoAberto(ErroModelo):
+    """O disjuntor do modelo está aberto: a chamada falha sem chegar à API."""
+
+def codigo_do_erro(erro):
+    """Código HTTP da exceção (ErroModelo, google.api_core ou similar), ou None."""
+    codigo = getattr(erro, "codigo", None)
+    if codigo is None:
+        codigo = getattr(erro, "code", None)
+        codigo = getattr(codigo, "value", codigo)   # alguns clientes usam enums de HTTPStatus
+    return codigo if isinstance(codigo, int) else None
+
+def erro_transitorio(erro):
+    """Se a falha é passageira (limite de requisições, indisponibilidade, prazo) e pode ser repetida."""
+    if isinstance(erro, CircuitoAberto):
+        return False
+    if isinstance(erro, (TimeoutError, ConnectionError)):
+        return True
+    codigo = codigo_do_erro(erro)
+    if codigo is not None:
+        return codigo in CODIGOS_TRANSITORIOS
+    return type(erro).__name__ in ERROS_TRANSITORIOS
+
+class Disjuntor:
+    """Circuit breaker de um modelo.
+
+    Depois de `falhas_para_abrir` falhas seguidas o circuito abre e as chamadas falham na hora
+    por `pausa_segundos`; passada a pausa, uma única chamada de teste é liberada (meio aberto):
+    se der certo o circuito fecha, se falhar abre de novo.
+    """
+
+    FECHADO, ABERTO, MEIO_ABERTO = "fechado", "aberto", "meio_aberto"
+
+    def __init__(self, falhas_para_abrir=5, pausa_segundos=30.0, relogio=time.monotonic):
+        self.falhas_para_abrir = falhas_para_abrir
+        self.pausa_segundos = pausa_segundos
+        self.relogio = relogio
+        self._lock = threading.Lock()
+        self.estado = self.FECHADO
+        self.falhas_seguidas = 0
+        self.aberto_em = None
+        self._teste_em_andamento = False
+        self.aberturas = 0
+
+    def permitir(self):
+        with self._lock:
+            if self.estado == self.ABERTO:
+                if self.relogio() - self.aberto_em < self.pausa_segundos:
+                    return False
+                self.estado = self.MEIO_ABERTO
+                self._teste_em_andamento = False
+            if self.estado == self.MEIO_ABERTO:
+                if self._teste_em_andamento:
+                    return False
+                self._teste_em_andamento = True
+            return True
+
+    def sucesso(self):
+        with self._lock:
+            self.estado = self.FECHADO
+            self.falhas_seguidas = 0
+            self._teste_em_andamento = False
+
+    def falha(self):
+        with self._lock:
+            self.falhas_seguidas += 1
+            if self.estado == self.MEIO_ABERTO or self.falhas_seguidas >= self.falhas_para_abrir:
+                if self.estado != self.ABERTO:
+                    self.aberturas += 1
+                self.estado = self.ABERTO
+                self.aberto_em = self.relogio()
+                self._teste_em_andamento = False
+
+class ClienteModelo:
+    """Chama o modelo com prazo, novas tentativas, circuit breaker, hedge e modelo reserva.
+
+    - `prazo_segundos`: tempo total de uma geração, somando tentativas e esperas. Cada chamada
+      recebe o que resta do prazo (repassado à API em request_options) e, se o modelo não
+      responder a tempo, é abandonada na thread de trabalho.
+    - `tentativas`: chamadas por modelo (no mínimo 1) quando a falha é transitória (429, 5xx, prazo), com
+      espera exponencial com jitter completo entre `espera_base` e `espera_maxima` segundos.
+    - `falhas_para_abrir` / `pausa_circuito`: parâmetros do Disjuntor de cada modelo.
+    - `atraso_hedge`: se definido, uma segunda chamada idêntica é disparada quando a primeira
+      passa desse tempo sem responder, e vale a que chegar primeiro.
+    - `reserva`: modelo (tipicamente mais barato) usado quando o principal esgota as tentativas
+      ou está com o circuito aberto.
+
+    Erros permanentes (autenticação, requisição inválida) não são repetidos.
+
+    Com `fluxo` (em `gerar`), a resposta é pedida em streaming: `fluxo()` cria um acumulador com
+    `alimentar(pedaco) -> bool` e `texto()`, e a leitura para assim que ele devolve True.
+    """
+
+    def __init__(self, modelo, nome, reserva=None, nome_reserva=None, prazo_segundos=30.0, tentativas=3,
+                 espera_base=0.5, espera_maxima=8.0, falhas_para_abrir=5, pausa_circuito=30.0,
+                 atraso_hedge=None, max_threads=8, semente=None):
+        self.modelos = [(nome, modelo, Disjuntor(falhas_para_abrir, pausa_circuito))]
+        if reserva is not None:
+            self.modelos.append((nome_reserva or "reserva", reserva, Disjuntor(falhas_para_abrir, pausa_circuito)))
+        self.prazo_segundos = prazo_segundos
+        # Pelo menos a primeira chamada acontece (MODELO_TENTATIVAS=0 não deixa a geração sem resposta).
+        self.tentativas = max(1, tentativas)
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.atraso_hedge = atraso_hedge
+        self._aleatorio = random.Random(semente)
+        self._executor = None
+        self._max_threads = max_threads
+        self._lock = threading.Lock()
+        self._contadores = {}
+
+    def _contar(self, nome, quantidade=1):
+        with self._lock:
+            self._contadores[nome] = self._contadores.get(nome, 0) + quantidade
+        METRICAS.contar(f"modelo.{nome}", quantidade)
+
+    def _threads(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self._max_threads, thread_name_prefix="modelo")
+            return self._executor
+
+    def aquecer(self):
+        """Carrega os modelos sob demanda (os que têm `carregar`) e cria as threads de trabalho."""
+        for _, modelo, _ in self.modelos:
+            if hasattr(modelo, "carregar"):
+                modelo.carregar()
+        if self.prazo_segundos is not None or self.atraso_hedge is not None:
+            self._threads()
+
+    def gerar(self, prompt, fluxo=None):
+        """Retorna (texto, nome do modelo que respondeu); levanta ErroModelo se nenhum responder."""
+        self._contar("geracoes")
+        limite = None if self.prazo_segundos is None else time.monotonic() + self.prazo_segundos
+        ultimo_erro = None
+        for posicao, (nome, modelo, disjuntor) in enumerate(self.modelos):
+            if posicao > 0:
+                self._contar("usos_da_reserva")
+            try:
+                texto = self._gerar_com_tentativas(nome, modelo, disjuntor, prompt, limite, fluxo)
+                return texto, nome
+            except Exception as err:
+                if not isinstance(err, CircuitoAberto) and not erro_transitorio(err):
+                    # Erro permanente (chave inválida, requisição recusada): o reserva não resolveria.
+                    self._contar("erros_permanentes")
+                    if isinstance(err, ErroModelo):
+                        raise
+                    raise ErroModelo(f"{nome}: {err}", codigo_do_erro(err)) from err
+                ultimo_erro = err
+            if isinstance(ultimo_erro, PrazoEsgotado) and limite is not None and time.monotonic() >= limite:
+                break
+        raise ultimo_erro
+
+    def _gerar_com_tentativas(self, nome, modelo, disjuntor, prompt, limite, fluxo):
+        for tentativa in range(self.tentativas):
+            if not disjuntor.permitir():
+                self._contar("recusas_circuito_aberto")
+                raise CircuitoAberto(f"{nome}: circuito aberto após falhas seguidas", codigo=503)
+            restante = None if limite is None else limite - time.monotonic()
+            if restante is not None and restante <= 0:
+                self._contar("prazos_esgotados")
+                raise PrazoEsgotado(f"{nome}: prazo de {self.prazo_segundos}s esgotado")
+            self._contar("chamadas")
+            try:
+                with METRICAS.medir("agente.modelo", modelo=nome, tentativa=tentativa + 1):
+                    texto = self._chamar(modelo, prompt, restante, fluxo)
+            except Exception as err:
+                if not erro_transitorio(err):
+                    # A API respondeu: o serviço está de pé, só a requisição é que não serve.
+                    disjuntor.sucesso()
+                    raise
+                disjuntor.falha()
+                self._contar("prazos_esgotados" if isinstance(err, PrazoEsgotado) else "erros_transitorios")
+                if tentativa + 1 == self.tentativas:
+                    if isinstance(err, ErroModelo):
+                        raise
+                    raise ErroModelo(f"{nome}: {err}", codigo_do_erro(err)) from err
+                self._contar("novas_tentativas")
+                espera = self._aleatorio.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** tentativa))
+                if limite is not None:
+                    espera = min(espera, max(0.0, limite - time.monotonic()))
+                time.sleep(espera)
+            else:
+                disjuntor.sucesso()
+                return texto
+
+    def _gerar_texto(self, modelo, prompt, opcoes, fluxo):
+        if fluxo is None:
+            return modelo.generate_content(prompt, **opcoes).text.strip()
+        acumulador = fluxo()
+        for pedaco in modelo.generate_content(prompt, stream=True, **opcoes):
+            if acumulador.alimentar(pedaco.text):
+                # O resto da resposta não interessa: a leitura do fluxo para aqui.
+                self._contar("fluxos_encerrados_cedo")
+                break
+        return acumulador.texto()
+
+    def _chamar(self, modelo, prompt, restante, fluxo):
+        """Uma chamada ao modelo (mais a de hedge, se configurada) limitada a `restante` segundos."""
+        opcoes = {} if restante is None else {"request_options": {"timeout": restante}}
+        if restante is None and self.atraso_hedge is None:
+            return self._gerar_texto(modelo, prompt, opcoes, fluxo)
+
+        executor = self._threads()
+        chamadas = [executor.submit(self._gerar_texto, modelo, prompt, opcoes, fluxo)]
+        inicio = time.monotonic()
+
+        def sobra():
+            return None if restante is None else max(0.0, restante - (time.monotonic() - inicio))
+
+        if self.atraso_hedge is not None and (restante is None or self.atraso_hedge < restante):
+            prontas, _ = wait(chamadas, timeout=self.atraso_hedge)
+            if not prontas:
+                self._contar("hedges")
+                chamadas.append(executor.submit(self._gerar_texto, modelo, prompt, opcoes, fluxo))
+        pendentes = set(chamadas)
+        erro = None
+        while pendentes:
+            prontas, pendentes = wait(pendentes, timeout=sobra(), return_when=FIRST_COMPLETED)
+            if not prontas:
+                break
+            for chamada in prontas:
+                if chamada.exception() is None:
+                    if len(chamadas) > 1 and chamada is chamadas[1]:
+                        self._contar("hedges_vencedores")
+                    for outra in pendentes:
+                        outra.cancel()
+                    return chamada.result()
+                erro = chamada.exception()
+        for outra in pendentes:
+            outra.cancel()
+        if erro is not None and not pendentes:
+            raise erro
+        raise PrazoEsgotado(f"o modelo não respondeu em {restante:.1f}s")
+
+    def estado_circuitos(self):
+        return {nome: disjuntor.estado for nome, _, disjuntor in self.modelos}
+
+    def estatisticas(self):
+        with self._lock:
+            estatisticas = dict(sorted(self._contadores.items()))
+        estatisticas["circuitos"] = self.estado_circuitos()
+        estatisticas["aberturas_circuito"] = sum(disjuntor.aberturas for _, _, disjuntor in self.modelos)
+        return estatisticas
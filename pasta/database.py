@@ -1,186 +1,1113 @@
 # database.py
 
-import mysql.connector
-import os
+import csv
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from importacao import ler_registros, validar_cliente
+from metricas import METRICAS, cronometrado
+from sessao import SessaoClientes
 
-class ConexaoBancoDados:
+# Linha de migracoes_esquema que marca o esquema base (tabela clientes e dados iniciais) como aplicado.
+VERSAO_ESQUEMA_BASE = 0
+
+def _mysql():
+    """Importa o mysql.connector no primeiro uso: a importação é lenta e desnecessária com o SQLite."""
+    import mysql.connector
+    return mysql.connector
+
+class PoolConexoes:
+    """Pool limitado e thread-safe de conexões reutilizáveis."""
+
+    def __init__(self, fabrica, tamanho_min=1, tamanho_max=5, tempo_ocioso_max=300.0,
+                 timeout_espera=10.0, verificar_apos=0.5, verificar=None):
+        if tamanho_max < 1 or not 0 <= tamanho_min <= tamanho_max:
+            raise ValueError("Tamanho de pool inválido: use 0 <= tamanho_min <= tamanho_max e tamanho_max >= 1.")
+        self.fabrica = fabrica
+        self.tamanho_min = tamanho_min
+        self.tamanho_max = tamanho_max
+        self.tempo_ocioso_max = tempo_ocioso_max
+        self.timeout_espera = timeout_espera
+        # Conexões devolvidas há menos de `verificar_apos` segundos não são testadas no checkout.
+        self.verificar_apos = verificar_apos
+        self.verificar = verificar or (lambda conn: conn.is_connected())
+
+        self._cond = threading.Condition()
+        self._livres = deque()  # pares (conexão, instante em que foi devolvida)
+        self._total = 0
+        self._em_uso = 0
+        self._esperas = 0
+        self._tempo_espera = 0.0
+        self._criadas = 0
+        self._descartadas = 0
+        self._fechado = False
+
+    def _criar(self):
+        conn = self.fabrica()
+        if conn is not None:
+            with self._cond:
+                self._criadas += 1
+        return conn
+
+    def _fechar_silenciosamente(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _saudavel(self, conn):
+        try:
+            return self.verificar(conn)
+        except Exception:
+            return False
+
+    def _despejar_ociosas(self, agora):
+        """Remove conexões ociosas há muito tempo, preservando o tamanho mínimo. Chamar com o lock."""
+        despejadas = []
+        while (self._livres and self._total > self.tamanho_min
+               and agora - self._livres[0][1] > self.tempo_ocioso_max):
+            conn, _ = self._livres.popleft()
+            self._total -= 1
+            self._descartadas += 1
+            despejadas.append(conn)
+        return despejadas
+
+    def preencher(self):
+        """Abre conexões até atingir o tamanho mínimo do pool."""
+        while True:
+            with self._cond:
+                if self._fechado or self._total >= self.tamanho_min:
+                    return
+                self._total += 1
+            conn = self._criar()
+            with self._cond:
+                if conn is None:
+                    self._total -= 1
+                    return
+                self._livres.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    @cronometrado("pool.obter")
+    def obter(self):
+        """Retira uma conexão do pool, aguardando até `timeout_espera` se ele estiver esgotado."""
+        inicio_espera = None
+        despejadas = []
+        with self._cond:
+            while True:
+                if self._fechado:
+                    print("Erro: o pool de conexões está fechado.")
+                    return None
+                agora = time.monotonic()
+                despejadas += self._despejar_ociosas(agora)
+                if self._livres:
+                    # LIFO: a conexão usada mais recentemente tem menos chance de ter expirado.
+                    conn, devolvida_em = self._livres.pop()
+                    self._em_uso += 1
+                    break
+                if self._total < self.tamanho_max:
+                    conn, devolvida_em = None, None
+                    self._total += 1
+                    self._em_uso += 1
+                    break
+                if inicio_espera is None:
+                    inicio_espera = agora
+                    self._esperas += 1
+                restante = self.timeout_espera - (agora - inicio_espera)
+                if restante <= 0:
+                    self._tempo_espera += agora - inicio_espera
+                    print(f"Erro: nenhuma conexão livre no pool após {self.timeout_espera}s.")
+                    return None
+                self._cond.wait(restante)
+            if inicio_espera is not None:
+                self._tempo_espera += time.monotonic() - inicio_espera
+
+        for antiga in despejadas:
+            self._fechar_silenciosamente(antiga)
+
+        if conn is not None and time.monotonic() - devolvida_em >= self.verificar_apos:
+            if not self._saudavel(conn):
+                self._fechar_silenciosamente(conn)
+                with self._cond:
+                    self._descartadas += 1
+                conn = None
+
+        if conn is None:
+            conn = self._criar()
+            if conn is None:
+                with self._cond:
+                    self._total -= 1
+                    self._em_uso -= 1
+                    self._cond.notify()
+        return conn
+
+    def devolver(self, conn, descartar=False):
+        """Devolve uma conexão ao pool, encerrando qualquer transação pendente."""
+        if not descartar:
+            try:
+                # Sem o rollback, uma transação aberta por um SELECT manteria o snapshot antigo.
+                conn.rollback()
+            except Exception:
+                descartar = True
+        with self._cond:
+            self._em_uso -= 1
+            if descartar or self._fechado:
+                self._total -= 1
+                self._descartadas += 1
+            else:
+                self._livres.append((conn, time.monotonic()))
+            self._cond.notify()
+        if descartar or self._fechado:
+            self._fechar_silenciosamente(conn)
+
+    @contextmanager
+    def conexao(self):
+        """Empresta uma conexão do pool durante o bloco `with` (ou None se não houver)."""
+        conn = self.obter()
+        try:
+            yield conn
+        finally:
+            if conn is not None:
+                self.devolver(conn)
+
+    def estatisticas(self):
+        """Retorna um retrato do uso do pool."""
+        with self._cond:
+            return {
+                "tamanho_min": self.tamanho_min,
+                "tamanho_max": self.tamanho_max,
+                "total": self._total,
+                "em_uso": self._em_uso,
+                "livres": len(self._livres),
+                "esperas": self._esperas,
+                "tempo_espera_total": self._tempo_espera,
+                "tempo_espera_medio": self._tempo_espera / self._esperas if self._esperas else 0.0,
+                "criadas": self._criadas,
+                "descartadas": self._descartadas,
+            }
+
+    def fechar(self):
+        """Fecha as conexões livres; as emprestadas são fechadas ao serem devolvidas."""
+        with self._cond:
+            self._fechado = True
+            livres = [conn for conn, _ in self._livres]
+            self._total -= len(livres)
+            self._livres.clear()
+            self._cond.notify_all()
+        for conn in livres:
+            self._fechar_silenciosamente(conn)
+
+class BackendBanco:
+    """Interface comum dos bancos suportados pelo GerenciadorClientes.
+
+    As subclasses fornecem as conexões e as diferenças de dialeto (marcador de parâmetros,
+    upsert, cursor em streaming); o SQL interno é escrito com marcadores %s.
+    """
+
+    dialeto = None
+    Erro = Exception
+    # Sufixo do SELECT que lê as linhas que a transação vai alterar.
+    bloqueio_leitura = ""
+    # Limite de conexões simultâneas do backend (None quando não há limite).
+    max_conexoes = None
+
+    def obter_conexao(self):
+        raise NotImplementedError
+
+    def devolver_conexao(self, conn, descartar=False):
+        raise NotImplementedError
+
+    @contextmanager
+    def conexao(self):
+        """Empresta uma conexão; use `with db.conexao() as conn:`."""
+        conn = self.obter_conexao()
+        try:
+            yield conn
+        finally:
+            if conn is not None:
+                self.devolver_conexao(conn)
+
+    def preparar_banco(self):
+        """Garante que o banco exista antes de criar as tabelas. Retorna False em caso de erro."""
+        return True
+
+    def adaptar_sql(self, sql):
+        """Converte os marcadores %s para o estilo do driver."""
+        return sql
+
+    def cursor_streaming(self, conn):
+        """Cursor que busca as linhas aos poucos, sem bufferizar o resultado inteiro."""
+        return conn.cursor()
+
+    def sql_upsert_clientes(self):
+        """Cláusula que transforma o INSERT de clientes em upsert."""
+        raise NotImplementedError
+
+    def iniciar_escrita(self, cursor):
+        """Abre a transação de escrita antes da leitura das linhas que serão alteradas."""
+
+    def sql_com_limite_tempo(self, sql, segundos):
+        """Reescreve o SELECT para que o servidor o interrompa após `segundos`, se o banco permitir."""
+        return sql
+
+    def armar_limite_tempo(self, conn, segundos):
+        """Interrompe as instruções da conexão que passarem de `segundos` (bancos sem limite no servidor)."""
+
+    def desarmar_limite_tempo(self, conn):
+        pass
+
+    def listar_indices(self, cursor, tabela="clientes"):
+        """Retorna {nome do índice: [colunas na ordem do índice]}."""
+        raise NotImplementedError
+
+    def explicar(self, cursor, sql, params=None):
+        """Retorna (linhas examinadas estimadas ou None, descrição do plano) para a consulta."""
+        raise NotImplementedError
+
+    def analisar(self, cursor, tabela="clientes"):
+        """Atualiza as estatísticas do otimizador para a tabela."""
+
+    def aquecer(self):
+        """Abre de antemão as conexões compartilhadas, para a primeira consulta não pagar por elas."""
+
+    def estatisticas_pool(self):
+        return {}
+
+    def fechar(self):
+        pass
+
+class ConexaoBancoDados(BackendBanco):
     """Gerencia a conexão com o banco de dados MySQL."""
 
-    def __init__(self, host, user, password, database):
+    dialeto = "MySQL"
+    bloqueio_leitura = " FOR UPDATE"
+
+    def __init__(self, host, user, password, database, tamanho_min_pool=1, tamanho_max_pool=5,
+                 tempo_ocioso_max=300.0, timeout_pool=10.0):
         self.host = host
         self.user = user
         self.password = password
         self.database = database
-    
+        self.pool = PoolConexoes(
+            self.get_connection,
+            tamanho_min=tamanho_min_pool,
+            tamanho_max=tamanho_max_pool,
+            tempo_ocioso_max=tempo_ocioso_max,
+            timeout_espera=timeout_pool,
+        )
+
+    @property
+    def Erro(self):
+        return _mysql().Error
+
+    @cronometrado("banco.conectar")
     def get_connection(self):
         """Retorna uma nova conexão com o banco de dados MySQL."""
         try:
-            conn = mysql.connector.connect(
+            conn = _mysql().connect(
                 host=self.host,
                 user=self.user,
                 password=self.password,
                 database=self.database
             )
             return conn
-        except mysql.connector.Error as err:
-            print(f"Erro de conexão com o MySQL: {err}")
+        except self.Erro as err:
+            # 1049: o banco ainda não existe; configurar_tabela o cria e tenta de novo.
+            if err.errno != 1049:
+                print(f"Erro de conexão com o MySQL: {err}")
             return None
 
     def get_connection_no_db(self):
         """Retorna uma conexão sem um banco de dados específico."""
         try:
-            conn = mysql.connector.connect(
+            conn = _mysql().connect(
                 host=self.host,
                 user=self.user,
                 password=self.password
             )
             return conn
-        except mysql.connector.Error as err:
+        except self.Erro as err:
             print(f"Erro de conexão com o MySQL: {err}")
             return None
 
-class GerenciadorClientes:
-    """Lida com as operações CRUD na tabela de clientes."""
+    @property
+    def max_conexoes(self):
+        return self.pool.tamanho_max
 
-    def __init__(self, db_conn):
-        self.db_conn = db_conn
+    def obter_conexao(self):
+        """Retira uma conexão do pool."""
+        return self.pool.obter()
 
-    def configurar_tabela(self):
-        """Cria o banco de dados e a tabela de clientes no MySQL."""
+    def devolver_conexao(self, conn, descartar=False):
+        """Devolve a conexão ao pool (ou a descarta)."""
+        self.pool.devolver(conn, descartar)
+
+    def aquecer(self):
+        self.pool.preencher()
+
+    def preparar_banco(self):
+        """Cria o banco de dados no servidor MySQL, se ainda não existir."""
         conn = None
         cursor = None
         try:
-            conn = self.db_conn.get_connection_no_db()
-            if conn is None: return
+            conn = self.get_connection_no_db()
+            if conn is None: return False
             cursor = conn.cursor()
-            
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{self.db_conn.database}`")
-            print(f"Banco de dados '{self.db_conn.database}' verificado/criado com sucesso.")
-
-            create_table_sql = f"""
-                CREATE TABLE IF NOT EXISTS `{self.db_conn.database}`.clientes (
-                    id INT PRIMARY KEY,
-                    nome VARCHAR(255),
-                    renda FLOAT,
-                    status VARCHAR(50),
-                    genero VARCHAR(50)
-                );
-            """
-            cursor.execute(create_table_sql)
-            
-            conn.commit()
-            print("Tabela 'clientes' verificada/criada com sucesso.")
-            
-        except mysql.connector.Error as err:
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{self.database}`")
+            print(f"Banco de dados '{self.database}' verificado/criado com sucesso.")
+            return True
+        except self.Erro as err:
             print(f"Erro ao configurar o banco de dados: {err}")
+            return False
         finally:
             if conn and conn.is_connected():
                 cursor.close()
                 conn.close()
-    
+
+    def cursor_streaming(self, conn):
+        return conn.cursor(buffered=False)
+
+    def sql_com_limite_tempo(self, sql, segundos):
+        # A dica vale só para esta instrução, sem mudar a sessão da conexão do pool.
+        return re.sub(r"^\s*select\b", f"SELECT /*+ MAX_EXECUTION_TIME({int(segundos * 1000)}) */", sql,
+                      count=1, flags=re.I)
+
+    def sql_upsert_clientes(self):
+        return (" ON DUPLICATE KEY UPDATE nome = VALUES(nome), renda = VALUES(renda),"
+                " status = VALUES(status), genero = VALUES(genero)")
+
+    def listar_indices(self, cursor, tabela="clientes"):
+        cursor.execute(f"SHOW INDEX FROM `{tabela}`")
+        colunas = [d[0] for d in cursor.description]
+        indices = {}
+        for linha in sorted(cursor.fetchall(), key=lambda l: (l[colunas.index("Key_name")], l[colunas.index("Seq_in_index")])):
+            indices.setdefault(linha[colunas.index("Key_name")], []).append(linha[colunas.index("Column_name")])
+        return indices
+
+    def explicar(self, cursor, sql, params=None):
+        if params is None:
+            cursor.execute("EXPLAIN " + sql)
+        else:
+            cursor.execute("EXPLAIN " + sql, params)
+        colunas = [d[0] for d in cursor.description]
+        linhas = cursor.fetchall()
+        estimadas = sum(int(l[colunas.index("rows")] or 0) for l in linhas)
+        plano = "; ".join(f"{l[colunas.index('type')]} key={l[colunas.index('key')]}" for l in linhas)
+        return estimadas, plano
+
+    def analisar(self, cursor, tabela="clientes"):
+        cursor.execute(f"ANALYZE TABLE `{tabela}`")
+        cursor.fetchall()
+
+    def estatisticas_pool(self):
+        """Retorna as estatísticas do pool (em uso, esperas, tempo de espera...)."""
+        return self.pool.estatisticas()
+
+    def fechar(self):
+        """Fecha o pool de conexões."""
+        self.pool.fechar()
+
+class ConexaoSQLite(BackendBanco):
+    """Banco SQLite embutido no processo, sem nenhum salto de rede.
+
+    Cada thread usa a sua própria conexão, aberta em modo WAL (leitores não bloqueiam o
+    escritor) e com os PRAGMAs de PRAGMAS_PADRAO, que podem ser sobrescritos.
+    """
+
+    dialeto = "SQLite"
+    Erro = sqlite3.Error
+
+    PRAGMAS_PADRAO = {
+        "journal_mode": "WAL",
+        # Com WAL, NORMAL só arrisca as últimas transações numa queda de energia, não a integridade.
+        "synchronous": "NORMAL",
+        "cache_size": -64000,       # em KiB: 64 MiB de cache de páginas
+        "mmap_size": 268435456,     # 256 MiB mapeados em memória
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    }
+
+    def __init__(self, caminho, pragmas=None):
+        self.caminho = caminho
+        self.database = caminho
+        self.pragmas = dict(self.PRAGMAS_PADRAO, **(pragmas or {}))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conexoes = []
+
+    @cronometrado("banco.conectar")
+    def get_connection(self):
+        """Retorna uma nova conexão com o arquivo SQLite, já configurada."""
+        try:
+            # check_same_thread=False: o iterador de resultados pode ser consumido por outra thread.
+            conn = sqlite3.connect(self.caminho, check_same_thread=False)
+            for nome, valor in self.pragmas.items():
+                conn.execute(f"PRAGMA {nome} = {valor}")
+            return conn
+        except sqlite3.Error as err:
+            print(f"Erro ao abrir o banco SQLite: {err}")
+            return None
+
+    def obter_conexao(self):
+        """Retorna a conexão da thread atual, abrindo-a no primeiro uso."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.get_connection()
+            if conn is None:
+                return None
+            self._local.conn = conn
+            with self._lock:
+                self._conexoes.append(conn)
+        return conn
+
+    def devolver_conexao(self, conn, descartar=False):
+        """A conexão continua com a thread; só a transação pendente é encerrada."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def adaptar_sql(self, sql):
+        return sql.replace("%s", "?")
+
+    def sql_upsert_clientes(self):
+        return (" ON CONFLICT(id) DO UPDATE SET nome = excluded.nome, renda = excluded.renda,"
+                " status = excluded.status, genero = excluded.genero")
+
+    def armar_limite_tempo(self, conn, segundos):
+        prazo = time.monotonic() + segundos
+        # O handler roda a cada 1000 instruções da VM; retornar verdadeiro interrompe a consulta.
+        conn.set_progress_handler(lambda: time.monotonic() > prazo, 1000)
+
+    def desarmar_limite_tempo(self, conn):
+        conn.set_progress_handler(None, 0)
+
+    def iniciar_escrita(self, cursor):
+        # Sem BEGIN IMMEDIATE, o SELECT ficaria fora da transação que o UPDATE abre depois.
+        if not cursor.connection.in_transaction:
+            cursor.execute("BEGIN IMMEDIATE")
+
+    def listar_indices(self, cursor, tabela="clientes"):
+        cursor.execute(f"PRAGMA index_list({tabela})")
+        nomes = [linha[1] for linha in cursor.fetchall()]
+        indices = {}
+        for nome in nomes:
+            cursor.execute(f"PRAGMA index_info({nome})")
+            indices[nome] = [coluna for _, _, coluna in sorted(cursor.fetchall())]
+        return indices
+
+    def explicar(self, cursor, sql, params=None):
+        """O SQLite não estima linhas no plano; a estimativa vem de sqlite_stat1 (após ANALYZE).
+
+        Uma varredura completa conta a tabela inteira; uma busca por índice usa a média de
+        linhas por valor do prefixo de colunas com igualdade. Sem estatísticas, retorna None.
+        """
+        if params is None:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+        else:
+            cursor.execute("EXPLAIN QUERY PLAN " + self.adaptar_sql(sql), params)
+        detalhes = [linha[-1] for linha in cursor.fetchall()]
+        plano = "; ".join(detalhes)
+        estimadas = 0
+        for detalhe in detalhes:
+            if detalhe.startswith("SCAN") and "INDEX" not in detalhe:
+                cursor.execute("SELECT COUNT(*) FROM clientes")
+                estimadas += cursor.fetchone()[0]
+                continue
+            m = re.search(r"USING (?:COVERING )?INDEX (\w+)(?: \((.*)\))?", detalhe)
+            if m is None:
+                if "PRIMARY KEY" in detalhe:
+                    estimadas += 1
+                continue
+            condicao = m.group(2) or ""
+            igualdades = len(re.findall(r"\w+=\?", condicao))
+            try:
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE idx = ?", (m.group(1),))
+                linha = cursor.fetchone()
+            except sqlite3.Error:
+                linha = None
+            if linha is None:
+                return None, plano
+            numeros = [int(n) for n in linha[0].split() if n.isdigit()]
+            # stat = "total média_1ª_coluna média_2ª_coluna ..."; cada desigualdade conta como 1/4,
+            # a mesma heurística do planejador do SQLite sem STAT4.
+            estimadas += numeros[min(igualdades, len(numeros) - 1)] // 4 ** len(re.findall(r"[<>]", condicao))
+        return estimadas, plano
+
+    def analisar(self, cursor, tabela="clientes"):
+        cursor.execute(f"ANALYZE {tabela}")
+
+    def estatisticas_pool(self):
+        with self._lock:
+            return {"conexoes_por_thread": len(self._conexoes), "pragmas": dict(self.pragmas)}
+
+    def fechar(self):
+        with self._lock:
+            conexoes, self._conexoes = self._conexoes, []
+        for conn in conexoes:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+class GerenciadorClientes:
+    """Lida com as operações CRUD na tabela de clientes."""
+
+    def __init__(self, db_conn, cache_resultados=None):
+        self.db_conn = db_conn
+        self.cache_resultados = cache_resultados
+        # Incrementada a cada escrita confirmada; invalida os resultados em cache.
+        self.versao_tabela = 0
+        self._lock_versao = threading.Lock()
+        self.observadores = []
+        self.respondedores = []
+
+    def _registrar_escrita(self):
+        """Marca que a tabela mudou, invalidando os resultados em cache. Retorna a nova versão."""
+        with self._lock_versao:
+            self.versao_tabela += 1
+            return self.versao_tabela
+
+    def adicionar_observador(self, observador):
+        """Registra um objeto avisado de cada escrita confirmada.
+
+        O observador implementa ao_inserir(versao, linha), ao_atualizar(versao, antes, depois) e
+        ao_deletar(versao, antes), com linhas no formato (id, nome, renda, status, genero) e a
+        versão da tabela após a escrita. Com observadores, as escritas leem as linhas antigas
+        (bloqueando-as, quando o banco permite) antes de alterá-las.
+        """
+        self.observadores.append(observador)
+
+    def adicionar_respondedor(self, respondedor):
+        """Registra um objeto consultado antes do banco: responder(sql, params) retorna as linhas ou None."""
+        self.respondedores.append(respondedor)
+
+    def _notificar(self, evento, versao, *linhas):
+        for observador in self.observadores:
+            getattr(observador, evento)(versao, *linhas)
+
+    def _ler_para_escrita(self, cursor, ids):
+        """Lê as linhas atuais dos ids dentro da transação de escrita: {id: linha}."""
+        self.db_conn.iniciar_escrita(cursor)
+        ids = list(ids)
+        atuais = {}
+        for inicio in range(0, len(ids), 500):
+            parte = ids[inicio:inicio + 500]
+            cursor.execute(self.db_conn.adaptar_sql(
+                f"SELECT id, nome, renda, status, genero FROM clientes WHERE id IN ({', '.join(['%s'] * len(parte))})"
+                + self.db_conn.bloqueio_leitura), tuple(parte))
+            atuais.update((linha[0], tuple(linha)) for linha in cursor.fetchall())
+        return atuais
+
+    def respondivel_sem_banco(self, query_sql, params=None):
+        """Diz, sem executar, se algum respondedor com `interpretar(sql, params)` reconhece a consulta."""
+        return any(hasattr(respondedor, "interpretar") and respondedor.interpretar(query_sql, params) is not None
+                   for respondedor in self.respondedores)
+
+    def _responder(self, query_sql, params):
+        for respondedor in self.respondedores:
+            linhas = respondedor.responder(query_sql, params)
+            if linhas is not None:
+                return linhas
+        return None
+
+    def configurar_tabela(self, dados_iniciais=None):
+        """Cria o banco de dados (quando o backend exige) e a tabela de clientes.
+
+        Se a tabela estiver vazia, insere os `dados_iniciais` (tuplas id, nome, renda, status, genero).
+        Concluído, o passo é registrado como a versão
+        VERSAO_ESQUEMA_BASE em migracoes_esquema; nas próximas execuções basta uma consulta a ela
+        para pular o DDL e a contagem da tabela.
+
+        Os índices sugeridos pelo AssessorIndices não entram aqui: são aplicados pelo chat
+        ('aplicar indices'), como novas migrações.
+        """
+        if not self._esquema_base_aplicado():
+            self._aplicar_esquema_base(dados_iniciais)
+
+    def _esquema_base_aplicado(self):
+        with self.db_conn.conexao() as conn:
+            if conn is None: return False
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.db_conn.adaptar_sql("SELECT 1 FROM migracoes_esquema WHERE versao = %s"),
+                               (VERSAO_ESQUEMA_BASE,))
+                return cursor.fetchone() is not None
+            except self.db_conn.Erro:
+                return False
+            finally:
+                cursor.close()
+
+    def _aplicar_esquema_base(self, dados_iniciais):
+        if not self.db_conn.preparar_banco(): return False
+        create_table_sql = """
+                    CREATE TABLE IF NOT EXISTS clientes (
+                        id INT PRIMARY KEY,
+                        nome VARCHAR(255),
+                        renda FLOAT,
+                        status VARCHAR(50),
+                        genero VARCHAR(50)
+                    );
+                """
+        with self.db_conn.conexao() as conn:
+            if conn is None: return False
+            cursor = conn.cursor()
+            try:
+                cursor.execute(create_table_sql)
+                self._criar_tabela_migracoes(cursor)
+                conn.commit()
+                print("Tabela 'clientes' verificada/criada com sucesso.")
+            except self.db_conn.Erro as err:
+                print(f"Erro ao configurar o banco de dados: {err}")
+                return False
+            finally:
+                cursor.close()
+
+        if dados_iniciais:
+            if self.contar_clientes() == 0:
+                print("Tabela de clientes vazia. Adicionando dados iniciais...")
+                if self.inserir_clientes(enumerate(dados_iniciais, start=1)) is None: return False
+            else:
+                print("Tabela de clientes já contém dados. Pulando a inserção inicial.")
+
+        with self.db_conn.conexao() as conn:
+            if conn is None: return False
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    self.db_conn.adaptar_sql(
+                        "INSERT INTO migracoes_esquema (versao, descricao, ddl, aplicada_em) VALUES (%s, %s, %s, %s)"),
+                    (VERSAO_ESQUEMA_BASE, "tabela clientes e dados iniciais", " ".join(create_table_sql.split()),
+                     time.strftime("%Y-%m-%d %H:%M:%S")))
+                conn.commit()
+            except self.db_conn.Erro as err:
+                # Outro processo pode ter registrado a versão base ao mesmo tempo: o esquema está pronto igual.
+                print(f"Aviso: não foi possível registrar a versão do esquema: {err}")
+            finally:
+                cursor.close()
+        return True
+
+    def _criar_tabela_migracoes(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS migracoes_esquema (
+                versao INT PRIMARY KEY,
+                descricao VARCHAR(255),
+                ddl TEXT,
+                aplicada_em VARCHAR(32)
+            )
+        """)
+
+    def versao_esquema(self):
+        """Retorna a última versão de migração aplicada (0 se nenhuma)."""
+        with self.db_conn.conexao() as conn:
+            if conn is None: return 0
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT COALESCE(MAX(versao), 0) FROM migracoes_esquema")
+                return cursor.fetchone()[0]
+            except self.db_conn.Erro:
+                return 0
+            finally:
+                cursor.close()
+
+    def aplicar_migracao(self, descricao, comandos_ddl):
+        """Aplica os comandos DDL como a próxima versão do esquema e a registra.
+
+        No MySQL cada DDL é confirmado implicitamente; se um comando falhar, os anteriores
+        permanecem e a versão não é registrada. Retorna a versão aplicada ou None.
+        """
+        with self.db_conn.conexao() as conn:
+            if conn is None: return None
+            cursor = conn.cursor()
+            try:
+                self._criar_tabela_migracoes(cursor)
+                cursor.execute("SELECT COALESCE(MAX(versao), 0) FROM migracoes_esquema")
+                versao = cursor.fetchone()[0] + 1
+                for ddl in comandos_ddl:
+                    cursor.execute(ddl)
+                cursor.execute(
+                    self.db_conn.adaptar_sql(
+                        "INSERT INTO migracoes_esquema (versao, descricao, ddl, aplicada_em) VALUES (%s, %s, %s, %s)"),
+                    (versao, descricao, ";\n".join(comandos_ddl), time.strftime("%Y-%m-%d %H:%M:%S")))
+                conn.commit()
+                self.db_conn.analisar(cursor)
+                print(f"Migração {versao} aplicada: {descricao}")
+                return versao
+            except self.db_conn.Erro as err:
+                print(f"Erro ao aplicar a migração '{descricao}': {err}")
+                return None
+            finally:
+                cursor.close()
+
+    @cronometrado("gerenciador.adicionar_cliente")
     def adicionar_cliente(self, id, nome, renda, status, genero):
         """Insere um novo cliente na tabela."""
-        conn = self.db_conn.get_connection()
-        if conn is None: return
-        cursor = conn.cursor()
-        try:
-            sql = "INSERT INTO clientes (id, nome, renda, status, genero) VALUES (%s, %s, %s, %s, %s)"
-            data = (id, nome, renda, status, genero)
-            cursor.execute(sql, data)
-            conn.commit()
-            print(f"Cliente '{nome}' adicionado com sucesso!")
-        except mysql.connector.Error as err:
-            print(f"Erro ao adicionar cliente: {err}")
-        finally:
-            if conn and conn.is_connected():
+        with self.db_conn.conexao() as conn:
+            if conn is None: return
+            cursor = conn.cursor()
+            try:
+                sql = self.db_conn.adaptar_sql(
+                    "INSERT INTO clientes (id, nome, renda, status, genero) VALUES (%s, %s, %s, %s, %s)")
+                data = (id, nome, renda, status, genero)
+                cursor.execute(sql, data)
+                conn.commit()
+                versao = self._registrar_escrita()
+                self._notificar("ao_inserir", versao, data)
+                print(f"Cliente '{nome}' adicionado com sucesso!")
+            except self.db_conn.Erro as err:
+                print(f"Erro ao adicionar cliente: {err}")
+            finally:
                 cursor.close()
-                conn.close()
 
+    @cronometrado("gerenciador.atualizar_cliente")
     def atualizar_cliente(self, id, nome, renda, status, genero):
         """Atualiza os dados de um cliente existente de forma parcial."""
-        conn = self.db_conn.get_connection()
-        if conn is None: return
-        cursor = conn.cursor()
-        try:
-            updates = []
-            values = []
-
-            if nome:
-                updates.append("nome = %s")
-                values.append(nome)
-            if renda is not None:
-                updates.append("renda = %s")
-                values.append(renda)
-            if status:
-                updates.append("status = %s")
-                values.append(status)
-            if genero:
-                updates.append("genero = %s")
-                values.append(genero)
-
-            if not updates:
-                print("Nenhum campo para atualizar.")
-                return
+        with self.db_conn.conexao() as conn:
+            if conn is None: return
+            cursor = conn.cursor()
+            try:
+                updates = []
+                values = []
 
-            sql = f"UPDATE clientes SET {', '.join(updates)} WHERE id = %s"
-            values.append(id)
-            
-            cursor.execute(sql, tuple(values))
-            conn.commit()
-            print(f"Cliente de ID {id} atualizado com sucesso!")
-        except mysql.connector.Error as err:
-            print(f"Erro ao atualizar cliente: {err}")
-        finally:
-            if conn and conn.is_connected():
+                if nome:
+                    updates.append("nome = %s")
+                    values.append(nome)
+                if renda is not None:
+                    updates.append("renda = %s")
+                    values.append(renda)
+                if status:
+                    updates.append("status = %s")
+                    values.append(status)
+                if genero:
+                    updates.append("genero = %s")
+                    values.append(genero)
+
+                if not updates:
+                    print("Nenhum campo para atualizar.")
+                    return
+
+                sql = self.db_conn.adaptar_sql(f"UPDATE clientes SET {', '.join(updates)} WHERE id = %s")
+                values.append(id)
+
+                antes = self._ler_para_escrita(cursor, [id]).get(id) if self.observadores else None
+                cursor.execute(sql, tuple(values))
+                conn.commit()
+                versao = self._registrar_escrita()
+                if antes is not None:
+                    depois = (antes[0], nome or antes[1], antes[2] if renda is None else renda,
+                              status or antes[3], genero or antes[4])
+                    self._notificar("ao_atualizar", versao, antes, depois)
+                print(f"Cliente de ID {id} atualizado com sucesso!")
+            except self.db_conn.Erro as err:
+                print(f"Erro ao atualizar cliente: {err}")
+            finally:
                 cursor.close()
-                conn.close()
-    
+
+    @cronometrado("gerenciador.deletar_cliente")
     def deletar_cliente(self, id):
         """Deleta um cliente da tabela."""
-        conn = self.db_conn.get_connection()
-        if conn is None: return
-        cursor = conn.cursor()
+        with self.db_conn.conexao() as conn:
+            if conn is None: return
+            cursor = conn.cursor()
+            try:
+                sql = self.db_conn.adaptar_sql("DELETE FROM clientes WHERE id = %s")
+                antes = self._ler_para_escrita(cursor, [id]).get(id) if self.observadores else None
+                cursor.execute(sql, (id,))
+                conn.commit()
+                versao = self._registrar_escrita()
+                if antes is not None:
+                    self._notificar("ao_deletar", versao, antes)
+                print(f"Cliente de ID {id} deletado com sucesso!")
+            except self.db_conn.Erro as err:
+                print(f"Erro ao deletar cliente: {err}")
+            finally:
+                cursor.close()
+
+    def sessao(self):
+        """Abre uma SessaoClientes: as escritas enfileiradas são gravadas juntas, com um só commit.
+
+            with gerenciador.sessao() as sessao:
+                sessao.adicionar(7, 'Rita Dias', 3100.0, 'ativo', 'feminino')
+                sessao.atualizar(2, renda=1500.0)
+                sessao.deletar(6)
+        """
+        return SessaoClientes(self)
+
+    @cronometrado("gerenciador.atualizar_clientes")
+    def atualizar_clientes(self, ids, nome=None, renda=None, status=None, genero=None):
+        """Aplica a mesma atualização parcial a vários clientes numa transação. Retorna o relatório da sessão."""
+        sessao = self.sessao()
+        sessao.atualizar_varios(ids, nome, renda, status, genero)
+        relatorio = sessao.confirmar()
+        if relatorio is not None:
+            print(f"{relatorio['linhas_afetadas']} cliente(s) atualizado(s) com sucesso!")
+        return relatorio
+
+    @cronometrado("gerenciador.deletar_clientes")
+    def deletar_clientes(self, ids):
+        """Deleta vários clientes numa transação. Retorna o relatório da sessão."""
+        sessao = self.sessao()
+        sessao.deletar_varios(ids)
+        relatorio = sessao.confirmar()
+        if relatorio is not None:
+            print(f"{relatorio['linhas_afetadas']} cliente(s) deletado(s) com sucesso!")
+        return relatorio
+
+    @cronometrado("gerenciador.inserir_clientes")
+    def inserir_clientes(self, registros, tamanho_lote=1000, upsert=False, max_exemplos_rejeitados=20):
+        """Valida e insere clientes em lotes, com uma transação por lote, e retorna um relatório."""
+        if tamanho_lote < 1:
+            raise ValueError("tamanho_lote deve ser pelo menos 1.")
+        sql = "INSERT INTO clientes (id, nome, renda, status, genero) VALUES (%s, %s, %s, %s, %s)"
+        if upsert:
+            sql += self.db_conn.sql_upsert_clientes()
+        sql = self.db_conn.adaptar_sql(sql)
+
+        relatorio = {"lidas": 0, "gravadas": 0, "rejeitadas": 0, "exemplos_rejeitados": []}
+
+        def rejeitar(linha, motivo):
+            relatorio["rejeitadas"] += 1
+            if len(relatorio["exemplos_rejeitados"]) < max_exemplos_rejeitados:
+                relatorio["exemplos_rejeitados"].append((linha, motivo))
+
+        inicio = time.perf_counter()
+        with self.db_conn.conexao() as conn:
+            if conn is None: return None
+            cursor = conn.cursor()
+            try:
+                lote = []
+                for numero, registro in registros:
+                    relatorio["lidas"] += 1
+                    try:
+                        lote.append((numero, validar_cliente(registro)))
+                    except ValueError as err:
+                        rejeitar(numero, str(err))
+                        continue
+                    if len(lote) >= tamanho_lote:
+                        relatorio["gravadas"] += self._gravar_lote(conn, cursor, sql, lote, rejeitar, upsert)
+                        lote = []
+                if lote:
+                    relatorio["gravadas"] += self._gravar_lote(conn, cursor, sql, lote, rejeitar, upsert)
+            finally:
+                cursor.close()
+
+        relatorio["segundos"] = time.perf_counter() - inicio
+        relatorio["linhas_por_segundo"] = relatorio["gravadas"] / relatorio["segundos"] if relatorio["segundos"] else 0.0
+        return relatorio
+
+    def _gravar_lote(self, conn, cursor, sql, lote, rejeitar, upsert=False):
+        """Grava um lote com executemany; se falhar, isola as linhas problemáticas uma a uma."""
+        # Só o upsert pode sobrescrever linhas; sem observadores, nada precisa ser lido antes.
+        ler_antes = upsert and bool(self.observadores)
         try:
-            sql = "DELETE FROM clientes WHERE id = %s"
-            cursor.execute(sql, (id,))
+            atuais = self._ler_para_escrita(cursor, {valores[0] for _, valores in lote}) if ler_antes else {}
+            cursor.executemany(sql, [valores for _, valores in lote])
             conn.commit()
-            print(f"Cliente de ID {id} deletado com sucesso!")
-        except mysql.connector.Error as err:
-            print(f"Erro ao deletar cliente: {err}")
-        finally:
-            if conn and conn.is_connected():
-                cursor.close()
-                conn.close()
+            self._notificar_lote(self._registrar_escrita(), atuais, [valores for _, valores in lote])
+            return len(lote)
+        except self.db_conn.Erro:
+            conn.rollback()
 
+        atuais = self._ler_para_escrita(cursor, {valores[0] for _, valores in lote}) if ler_antes else {}
+        gravadas = []
+        for numero, valores in lote:
+            try:
+                cursor.execute(sql, valores)
+                gravadas.append(valores)
+            except self.db_conn.Erro as err:
+                rejeitar(numero, str(err))
+        conn.commit()
+        if gravadas:
+            self._notificar_lote(self._registrar_escrita(), atuais, gravadas)
+        return len(gravadas)
+
+    def _notificar_lote(self, versao, atuais, gravadas):
+        if not self.observadores:
+            return
+        for valores in gravadas:
+            antes = atuais.get(valores[0])
+            if antes is None:
+                self._notificar("ao_inserir", versao, valores)
+            else:
+                self._notificar("ao_atualizar", versao, antes, valores)
+            atuais[valores[0]] = valores
+
+    def importar_clientes(self, caminho, formato=None, tamanho_lote=1000, upsert=False):
+        """Importa clientes de um arquivo CSV ou JSONL em streaming."""
+        try:
+            registros = ler_registros(caminho, formato)
+            return self.inserir_clientes(registros, tamanho_lote=tamanho_lote, upsert=upsert)
+        except (OSError, ValueError, csv.Error) as err:
+            print(f"Erro ao importar clientes: {err}")
+            return None
+
+    @cronometrado("gerenciador.contar_clientes")
     def contar_clientes(self):
         """Conta o número de clientes na tabela."""
-        conn = self.db_conn.get_connection()
-        if conn is None: return 0
-        cursor = conn.cursor()
-        try:
-            cursor.execute("SELECT COUNT(*) FROM clientes")
-            count = cursor.fetchone()[0]
-            return count
-        except mysql.connector.Error as err:
-            print(f"Erro ao contar clientes: {err}")
-            return 0
-        finally:
-            if conn and conn.is_connected():
+        linhas = self._responder("SELECT COUNT(*) FROM clientes", None)
+        if linhas is not None:
+            return linhas[0][0]
+        with self.db_conn.conexao() as conn:
+            if conn is None: return 0
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT COUNT(*) FROM clientes")
+                count = cursor.fetchone()[0]
+                return count
+            except self.db_conn.Erro as err:
+                print(f"Erro ao contar clientes: {err}")
+                return 0
+            finally:
                 cursor.close()
-                conn.close()
 
-    def executar_query(self, query_sql):
-        """Executa uma consulta SQL no banco de dados e retorna o resultado."""
-        conn = self.db_conn.get_connection()
-        if conn is None: return None
-        cursor = conn.cursor()
-        try:
+    def _executar(self, cursor, query_sql, params, limite_segundos=None):
+        """Executa SQL avulso; só o SQL parametrizado tem os marcadores adaptados ao driver."""
+        if limite_segundos:
+            query_sql = self.db_conn.sql_com_limite_tempo(query_sql, limite_segundos)
+        if params is None:
+            # Sem parâmetros, um LIKE '%silva%' gerado pelo modelo não pode ser tratado como marcador.
             cursor.execute(query_sql)
-            return cursor.fetchall()
-        except mysql.connector.Error as err:
+        else:
+            cursor.execute(self.db_conn.adaptar_sql(query_sql), params)
+
+    def _usar_cache(self, query_sql, usar_cache):
+        return usar_cache and self.cache_resultados is not None and self.cache_resultados.cacheavel(query_sql)
+
+    @cronometrado("gerenciador.executar_query")
+    def executar_query(self, query_sql, params=None, usar_cache=True, limite_segundos=None):
+        """Executa uma consulta SQL no banco de dados e retorna o resultado.
+
+        Com usar_cache=False a consulta vai direto ao banco, sem cache nem respondedores.
+        Com limite_segundos, o banco interrompe a consulta que passar desse tempo.
+        """
+        linhas = self._responder(query_sql, params) if usar_cache else None
+        if linhas is not None:
+            METRICAS.contar("consultas_respondidas_sem_banco")
+            return linhas
+        cache = self._usar_cache(query_sql, usar_cache)
+        # A versão é lida antes da consulta: uma escrita concorrente torna o resultado obsoleto.
+        versao = self.versao_tabela
+        if cache:
+            linhas = self.cache_resultados.obter(query_sql, params, versao)
+            if linhas is not None:
+                METRICAS.contar("consultas_do_cache")
+                return linhas
+        with self.db_conn.conexao() as conn:
+            if conn is None: return None
+            cursor = conn.cursor()
+            try:
+                # Com as métricas desligadas, nem o relógio é lido.
+                medir = METRICAS.habilitado
+                inicio = time.perf_counter() if medir else 0.0
+                if limite_segundos:
+                    self.db_conn.armar_limite_tempo(conn, limite_segundos)
+                try:
+                    self._executar(cursor, query_sql, params, limite_segundos)
+                    executada = time.perf_counter() if medir else 0.0
+                    linhas = cursor.fetchall()
+                finally:
+                    if limite_segundos:
+                        self.db_conn.desarmar_limite_tempo(conn)
+                if medir:
+                    fim = time.perf_counter()
+                    METRICAS.observar("consulta.executar", executada - inicio)
+                    METRICAS.observar("consulta.buscar", fim - executada)
+                    METRICAS.registrar_consulta(query_sql, params, fim - inicio)
+                if cache:
+                    self.cache_resultados.guardar(query_sql, params, versao, linhas)
+                return linhas
+            except self.db_conn.Erro as err:
+                print(f"Erro ao executar a query: {err}")
+                return None
+            finally:
+                cursor.close()
+
+    def iterar_query(self, query_sql, params=None, tamanho_lote=500, usar_cache=True, limite_segundos=None):
+        """Executa uma consulta e gera as linhas aos poucos, com cursor não bufferizado e fetchmany.
+
+        A conexão fica emprestada do pool até o resultado ser esgotado ou o gerador ser fechado.
+        Resultados pequenos lidos até o fim são guardados no cache de resultados. O limite_segundos
+        conta o tempo no banco, não as pausas do consumidor entre um lote e outro.
+        """
+        linhas = self._responder(query_sql, params) if usar_cache else None
+        if linhas is not None:
+            METRICAS.contar("consultas_respondidas_sem_banco")
+            yield from linhas
+            return
+        cache = self._usar_cache(query_sql, usar_cache)
+        versao = self.versao_tabela
+        if cache:
+            linhas = self.cache_resultados.obter(query_sql, params, versao)
+            if linhas is not None:
+                METRICAS.contar("consultas_do_cache")
+                yield from linhas
+                return
+            acumuladas = []
+
+        conn = self.db_conn.obter_conexao()
+        if conn is None: return
+        cursor = None
+        esgotado = False
+        # Só conta o tempo dentro do banco, não o que o consumidor leva entre um lote e outro.
+        medir = METRICAS.habilitado
+        segundos_execucao = segundos_busca = 0.0
+        try:
+            cursor = self.db_conn.cursor_streaming(conn)
+            restante = limite_segundos
+            inicio = time.perf_counter()
+            if restante:
+                self.db_conn.armar_limite_tempo(conn, restante)
+            try:
+                self._executar(cursor, query_sql, params, limite_segundos)
+            finally:
+                if restante:
+                    self.db_conn.desarmar_limite_tempo(conn)
+            segundos_execucao = time.perf_counter() - inicio
+            if restante:
+                restante -= segundos_execucao
+            while True:
+                inicio = time.perf_counter()
+                if restante:
+                    self.db_conn.armar_limite_tempo(conn, max(restante, 0.001))
+                try:
+                    linhas = cursor.fetchmany(tamanho_lote)
+                finally:
+                    if restante:
+                        self.db_conn.desarmar_limite_tempo(conn)
+                segundos = time.perf_counter() - inicio
+                segundos_busca += segundos
+                if restante:
+                    restante -= segundos
+                if not linhas:
+                    esgotado = True
+                    if cache:
+                        self.cache_resultados.guardar(query_sql, params, versao, acumuladas)
+                    break
+                if cache:
+                    acumuladas.extend(linhas)
+                    # Resultados grandes demais para o cache não são acumulados.
+                    if len(acumuladas) > self.cache_resultados.max_linhas_por_entrada:
+                        cache = False
+                        acumuladas = None
+                yield from linhas
+        except self.db_conn.Erro as err:
+            # Um erro do servidor encerra o resultado; a conexão pode voltar ao pool.
+            esgotado = True
             print(f"Erro ao executar a query: {err}")
-            return None
         finally:
-            if conn and conn.is_connected():
-                cursor.close()
-                conn.close()
\ No newline at end of file
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except self.db_conn.Erro:
+                    pass
+            # Linhas não lidas ficariam pendentes no protocolo; é mais barato descartar a conexão
+            # do que drenar um resultado grande só para devolvê-la.
+            self.db_conn.devolver_conexao(conn, descartar=not esgotado)
+            if medir:
+                METRICAS.observar("consulta.executar", segundos_execucao)
+                METRICAS.observar("consulta.buscar", segundos_busca)
+                METRICAS.registrar_consulta(query_sql, params, segundos_execucao + segundos_busca)
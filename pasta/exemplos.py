@@ -0,0 +1,121 @@
+# exemplos.py
+
+import json
+import math
+import os
+import threading
+from collections import Counter
+from cache import normalizar_pergunta
+
+# Exemplos originais do prompt; servem de semente para a base.
+EXEMPLOS_PADRAO = [
+    ("Qual o número de clientes com nome sujo?",
+     "SELECT COUNT(*) FROM clientes WHERE status = 'nome sujo';"),
+    ("Qual a renda do cliente de nome 'João da Silva'?",
+     "SELECT renda FROM clientes WHERE nome = 'João da Silva';"),
+    ("Me diga o nome dos clientes que têm uma renda maior que 2000?",
+     "SELECT nome FROM clientes WHERE renda > 2000;"),
+    ("Qual a média de renda de todos os clientes?",
+     "SELECT AVG(renda) FROM clientes;"),
+    ("Quantos clientes do sexo masculino com nome sujo existem?",
+     "SELECT COUNT(*) FROM clientes WHERE genero = 'masculino' AND status = 'nome sujo';"),
+]
+
+PALAVRAS_IGNORADAS = set("a as o os e de do da dos das no na em um uma que me diga qual quais".split())
+
+def termos(texto):
+    """Quebra o texto em termos normalizados, com um radical simples (sem plural)."""
+    resultado = []
+    for palavra in normalizar_pergunta(texto).split():
+        if palavra in PALAVRAS_IGNORADAS:
+            continue
+        if len(palavra) > 3 and palavra.endswith("s"):
+            palavra = palavra[:-1]
+        resultado.append(palavra)
+    return resultado
+
+def formatar_exemplos(exemplos):
+    """Formata pares (pergunta, sql) na seção de exemplos do prompt."""
+    blocos = [f"        - Pergunta: {pergunta}\n        - SQL: {sql}\n" for pergunta, sql in exemplos]
+    return "\n        Exemplos de Tradução:\n" + "\n".join(blocos)
+
+class BaseExemplos:
+    """Base de exemplos pergunta -> SQL com índice BM25 para escolher os mais relevantes.
+
+    Começa com EXEMPLOS_PADRAO e cresce com respostas verificadas, que são anexadas ao
+    arquivo JSONL `caminho` (se informado) e recarregadas na próxima execução.
+    """
+
+    def __init__(self, caminho=None, exemplos=EXEMPLOS_PADRAO, k1=1.5, b=0.75):
+        self.caminho = caminho
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._exemplos = []      # (pergunta, sql)
+        self._frequencias = []   # Counter de termos por exemplo
+        self._tamanhos = []      # número de termos por exemplo
+        self._indice = {}        # termo -> conjunto de posições em _exemplos
+        self._por_pergunta = {}  # pergunta normalizada -> posição
+        self._soma_tamanhos = 0
+
+        for pergunta, sql in exemplos:
+            self._indexar(pergunta, sql)
+        if caminho and os.path.exists(caminho):
+            with open(caminho, encoding="utf-8") as arquivo:
+                for linha in arquivo:
+                    if linha.strip():
+                        registro = json.loads(linha)
+                        self._indexar(registro["pergunta"], registro["sql"])
+
+    def __len__(self):
+        return len(self._exemplos)
+
+    def _indexar(self, pergunta, sql):
+        chave = normalizar_pergunta(pergunta)
+        posicao = self._por_pergunta.get(chave)
+        if posicao is not None:
+            # A mesma pergunta verificada de novo só atualiza o SQL.
+            self._exemplos[posicao] = (pergunta, sql)
+            return
+        frequencias = Counter(termos(pergunta))
+        posicao = len(self._exemplos)
+        self._exemplos.append((pergunta, sql))
+        self._frequencias.append(frequencias)
+        self._tamanhos.append(sum(frequencias.values()))
+        self._por_pergunta[chave] = posicao
+        self._soma_tamanhos += self._tamanhos[-1]
+        for termo in frequencias:
+            self._indice.setdefault(termo, set()).add(posicao)
+
+    def adicionar(self, pergunta, sql):
+        """Acrescenta uma resposta verificada à base (e ao arquivo, se houver)."""
+        with self._lock:
+            self._indexar(pergunta, sql)
+            if self.caminho:
+                with open(self.caminho, "a", encoding="utf-8") as arquivo:
+                    arquivo.write(json.dumps({"pergunta": pergunta, "sql": sql}, ensure_ascii=False) + "\n")
+
+    def buscar(self, pergunta, k=3):
+        """Retorna os k exemplos mais relevantes para a pergunta, do mais ao menos relevante."""
+        with self._lock:
+            total = len(self._exemplos)
+            if total == 0:
+                return []
+            media_tamanho = self._soma_tamanhos / total
+            pontuacoes = {}
+            for termo in set(termos(pergunta)):
+                documentos = self._indice.get(termo)
+                if not documentos:
+                    continue
+                idf = math.log(1 + (total - len(documentos) + 0.5) / (len(documentos) + 0.5))
+                for posicao in documentos:
+                    frequencia = self._frequencias[posicao][termo]
+                    tamanho = self._tamanhos[posicao]
+                    denominador = frequencia + self.k1 * (1 - self.b + self.b * tamanho / (media_tamanho or 1))
+                    pontuacoes[posicao] = pontuacoes.get(posicao, 0.0) + idf * frequencia * (self.k1 + 1) / denominador
+
+            melhores = sorted(pontuacoes, key=lambda posicao: (-pontuacoes[posicao], posicao))[:k]
+            if not melhores:
+                # Sem nenhum termo em comum, os primeiros exemplos ainda mostram o formato esperado.
+                melhores = range(min(k, total))
+            return [self._exemplos[posicao] for posicao in melhores]
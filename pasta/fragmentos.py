@@ -0,0 +1,855 @@
+# fragmentos.py
+
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from decimal import Decimal
+from functools import lru_cache
+from agregados import sem_caixa
+from database import BackendBanco
+from guarda import dividir_no_topo, limpar_sql
+from metricas import METRICAS
+
+# Literais de texto e identificadores entre crases; os identificadores simples só perdem as crases.
+PADRAO_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"|`(\w+)`|`[^`]*`")
+# Palavras que abrem as cláusulas de uma instrução; só contam fora de parênteses.
+PADRAO_CLAUSULA = re.compile(
+    r"\b(select|from|where|group\s+by|having|order\s+by|limit|union|join|values"
+    r"|for\s+update|for\s+share|lock\s+in\s+share\s+mode)\b|[()]", re.I)
+PADRAO_CONECTIVO = re.compile(r"\b(and|or)\b|[()]", re.I)
+PADRAO_FILTRO_ID = re.compile(r"(?:[a-z_]\w*\.)?id\s*(?:=\s*(%s|\d+)|in\s*\((.*)\))", re.I | re.S)
+PADRAO_CHAMADA_AGREGADO = re.compile(r"\b(count|sum|avg|min|max)\s*\(", re.I)
+# Agregações dos dois dialetos cujos parciais não se juntam com as operações de _combinar.
+PADRAO_AGREGADO_SEM_RECOMBINACAO = re.compile(
+    r"\b(group_concat|string_agg|json_arrayagg|json_objectagg|json_group_array|json_group_object|total"
+    r"|std|stddev(?:_pop|_samp)?|var_pop|var_samp|variance|bit_and|bit_or|bit_xor)\s*\(", re.I)
+PADRAO_ALIAS = re.compile(r"^(.*?[\w)\x00])\s+(?:as\s+)?([a-z_]\w*)$", re.I | re.S)
+PADRAO_LIMITE = re.compile(r"^(\d+)(?:\s*,\s*(\d+)|\s+offset\s+(\d+))?$", re.I)
+PADRAO_INSERCAO = re.compile(r"^insert\s+(?:ignore\s+)?into\s+(\w+)\s*(?:\(([^()]*)\))?\s*$", re.I)
+PADRAO_ALTERACAO = re.compile(r"^(?:update\s+(\w+)|delete\s+from\s+(\w+))\b", re.I)
+# Palavras que, no fim de uma expressão do SELECT, não são um apelido.
+NAO_APELIDOS = {"end", "null", "true", "false", "asc", "desc", "and", "or", "not", "is", "in", "like",
+                "between", "distinct", "then", "else", "when", "case"}
+# Expressão que termina num operador: a palavra seguinte é um operando, não um apelido.
+PADRAO_FIM_OPERADOR = re.compile(r"\b(?:and|or|not|is|in|like|between|then|else|when|case|distinct)$", re.I)
+# Colunas da tabela clientes, na ordem do CREATE TABLE (para INSERT sem lista de colunas).
+COLUNAS_CLIENTES = ("id", "nome", "renda", "status", "genero")
+
+class ErroFragmentos(Exception):
+    """Instrução que o modo fragmentado não sabe distribuir entre os bancos ou recombinar."""
+
+def _marcas(texto):
+    """Palavras de cláusula fora de parênteses: ([(palavra, início, fim)], tem subconsulta)."""
+    marcas, profundidade, subconsulta = [], 0, False
+    for m in PADRAO_CLAUSULA.finditer(texto):
+        if m.group(0) == "(":
+            profundidade += 1
+        elif m.group(0) == ")":
+            profundidade -= 1
+        elif profundidade == 0:
+            marcas.append((" ".join(m.group(1).lower().split()), m.start(), m.end()))
+        elif m.group(1).lower() == "select":
+            subconsulta = True
+    return marcas, subconsulta
+
+def _fechamento(texto, abre):
+    """Posição do parêntese que fecha o aberto em `abre`."""
+    profundidade = 0
+    for i in range(abre, len(texto)):
+        if texto[i] == "(":
+            profundidade += 1
+        elif texto[i] == ")":
+            profundidade -= 1
+            if profundidade == 0:
+                return i
+    raise ErroFragmentos("parênteses desbalanceados na consulta")
+
+def _normalizar(expressao):
+    """Forma de comparação de uma expressão: minúsculas, espaços únicos e sem o prefixo da tabela."""
+    texto = " ".join(expressao.lower().split())
+    texto = re.sub(r"\s*([(),.*])\s*", r"\1", texto)
+    return re.sub(r"(?<![\w.])[a-z_]\w*\.(?=[a-z_])", "", texto)
+
+def _separar_apelido(item):
+    """Divide um item do SELECT em (expressão, apelido ou None)."""
+    m = PADRAO_ALIAS.match(item)
+    if m is None or m.group(2).lower() in NAO_APELIDOS or PADRAO_FIM_OPERADOR.search(m.group(1)):
+        return item, None
+    return m.group(1).strip(), m.group(2)
+
+def _chamadas_agregado(expressao):
+    """Chamadas de função de agregação na expressão: [(início, fim, função, argumento)]."""
+    chamadas, depois = [], 0
+    for m in PADRAO_CHAMADA_AGREGADO.finditer(expressao):
+        if m.start() < depois:
+            continue
+        fecha = _fechamento(expressao, m.end() - 1)
+        chamadas.append((m.start(), fecha + 1, m.group(1).lower(), expressao[m.end():fecha].strip()))
+        depois = fecha + 1
+    return chamadas
+
+def _chave_ordem(valor, chave):
+    # NULL vem antes de qualquer valor, como no MySQL e no SQLite (e por último em DESC).
+    return (0,) if valor is None else (1, chave(valor))
+
+def _combinar(funcao, atual, novo, chave):
+    """Junta o valor parcial de um fragmento ao acumulado."""
+    if atual is None:
+        return novo
+    if novo is None:
+        return atual
+    if funcao in ("count", "sum"):
+        return atual + novo
+    if funcao == "min":
+        return min(atual, novo, key=chave)
+    return max(atual, novo, key=chave)
+
+def _finalizar(funcao, parciais):
+    if funcao == "avg":
+        soma, contagem = parciais
+        return soma / contagem if contagem and soma is not None else None
+    return parciais[0]
+
+_avaliadores = threading.local()
+
+def _avaliar(modelo, valores):
+    """Calcula uma expressão sobre os agregados já recombinados num SQLite em memória."""
+    conn = getattr(_avaliadores, "conn", None)
+    if conn is None:
+        conn = _avaliadores.conn = sqlite3.connect(":memory:")
+    valores = [float(valor) if isinstance(valor, Decimal) else valor for valor in valores]
+    try:
+        return conn.execute("SELECT " + modelo, valores).fetchone()[0]
+    except sqlite3.Error as err:
+        raise ErroFragmentos(f"não foi possível recombinar '{modelo}' entre os fragmentos: {err}") from err
+
+class Instrucao:
+    """SQL sem comentários, com os literais trocados por marcas \\x00n\\x00 e as cláusulas localizadas."""
+
+    def __init__(self, sql):
+        limpo, _ = limpar_sql(sql)
+        self.literais = []
+        self.texto = PADRAO_LITERAL.sub(self._mascarar, limpo).rstrip("; \n\t")
+        self.marcas, self.subconsulta = _marcas(self.texto)
+        self.palavras = [palavra for palavra, _, _ in self.marcas]
+        self.tipo = self.texto.split(None, 1)[0].lower() if self.texto else ""
+        self.trechos = {}   # palavra -> (início, fim) do texto da primeira cláusula com ela
+        for i, (palavra, _, fim) in enumerate(self.marcas):
+            proxima = self.marcas[i + 1][1] if i + 1 < len(self.marcas) else len(self.texto)
+            self.trechos.setdefault(palavra, (fim, proxima))
+
+    def _mascarar(self, m):
+        if m.group(1):
+            return m.group(1)
+        self.literais.append(m.group(0))
+        return f"\x00{len(self.literais) - 1}\x00"
+
+    def trecho(self, palavra):
+        """Texto da cláusula, sem a palavra que a abre (None se não houver)."""
+        if palavra not in self.trechos:
+            return None
+        inicio, fim = self.trechos[palavra]
+        return self.texto[inicio:fim].strip()
+
+    def inicio(self, *palavras):
+        """Posição da primeira marca entre `palavras` (o fim do texto se nenhuma aparecer)."""
+        return min((inicio for palavra, inicio, _ in self.marcas if palavra in palavras), default=len(self.texto))
+
+    def restaurar(self, texto):
+        return re.sub(r"\x00(\d+)\x00", lambda m: self.literais[int(m.group(1))], texto)
+
+class FiltroId:
+    """Um termo `id = x` ou `id IN (...)` ligado por AND ao resto do WHERE.
+
+    `valores` traz, para cada id, ("parametro", índice em params) ou ("literal", id); `inicio` e
+    `fim` delimitam os valores no texto mascarado, para refazer a lista de cada fragmento.
+    """
+
+    def __init__(self, valores, inicio, fim, lista):
+        self.valores = valores
+        self.inicio = inicio
+        self.fim = fim
+        self.lista = lista
+
+    def ids(self, params):
+        return [params[valor] if tipo == "parametro" else valor for tipo, valor in self.valores]
+
+    @classmethod
+    def localizar(cls, instrucao):
+        if "where" not in instrucao.trechos:
+            return None
+        inicio, fim = instrucao.trechos["where"]
+        texto = instrucao.texto
+        cortes, profundidade = [inicio], 0
+        for m in PADRAO_CONECTIVO.finditer(texto, inicio, fim):
+            if m.group(0) == "(":
+                profundidade += 1
+            elif m.group(0) == ")":
+                profundidade -= 1
+            elif profundidade == 0:
+                if m.group(1).lower() == "or":
+                    return None
+                cortes += [m.start(), m.end()]
+        cortes.append(fim)
+        for comeco, final in zip(cortes[::2], cortes[1::2]):
+            while comeco < final and texto[comeco].isspace():
+                comeco += 1
+            while final > comeco and texto[final - 1].isspace():
+                final -= 1
+            m = PADRAO_FILTRO_ID.fullmatch(texto, comeco, final)
+            if m is None:
+                continue
+            grupo = 1 if m.group(1) is not None else 2
+            valores = []
+            for item in re.finditer(r"[^,]+", texto[m.start(grupo):m.end(grupo)]):
+                valor = item.group(0).strip()
+                if valor == "%s":
+                    valores.append(("parametro", texto.count("%s", 0, m.start(grupo) + item.start())))
+                elif valor.isdigit():
+                    valores.append(("literal", int(valor)))
+                else:
+                    return None
+            return cls(valores, m.start(grupo), m.end(grupo), grupo == 2)
+        return None
+
+class PlanoLeitura:
+    """Como um SELECT é distribuído entre os fragmentos e como os resultados são recombinados.
+
+    Consultas sem agregação vão como estão (com LIMIT deslocamento + limite) e as linhas são
+    juntadas, ordenadas e cortadas aqui. Nas agregações, cada fragmento devolve os agregados
+    parciais por grupo (AVG vira SUM e COUNT) e os grupos são somados; HAVING, ORDER BY e LIMIT
+    são aplicados depois da soma.
+    """
+
+    def __init__(self, instrucao):
+        self.instrucao = instrucao
+        self.sql = None             # SQL enviado a cada fragmento
+        self.replicada = False      # tabela igual em todos os fragmentos: basta ler o primeiro
+        self.filtro = None          # FiltroId que restringe os fragmentos consultados
+        self.grupos = None          # agregação: colunas de grupo no início da linha de cada fragmento
+        self.parciais = []          # agregação: (função, argumento) de cada coluna depois dos grupos
+        self.finais = []            # agregação: (função, índices das parciais) de cada agregado
+        self.saidas = []            # agregação: ("grupo", k) | ("agregado", i) | ("expressao", sql, refs)
+        self.condicao = None        # agregação: HAVING como (sql, refs)
+        self.distinto = False
+        self.ordem = []             # (coluna, decrescente), da chave principal para a última
+        self.limite = None
+        self.deslocamento = 0
+        self.ocultas = 0            # colunas no fim da linha que só servem à ordenação
+
+    def montar(self):
+        instrucao = self.instrucao
+        origem = instrucao.trecho("from") or ""
+        if not re.search(r"\bclientes\b", origem, re.I):
+            self.replicada = True
+            self.sql = instrucao.restaurar(instrucao.texto)
+            return self
+        if instrucao.tipo != "select" or instrucao.subconsulta or {"union", "join"} & set(instrucao.palavras) \
+                or len(dividir_no_topo(origem)) > 1:
+            raise ErroFragmentos("junções, subconsultas e UNION sobre clientes não são suportadas no modo fragmentado")
+        selecao = instrucao.trecho("select")
+        self.distinto = bool(re.match(r"distinct\s", selecao, re.I))
+        if self.distinto:
+            selecao = selecao[len("distinct"):].strip()
+        for palavra in ("having", "order by", "limit"):
+            if "%s" in (instrucao.trecho(palavra) or ""):
+                raise ErroFragmentos(f"parâmetros no {palavra.upper()} não são suportados no modo fragmentado")
+        if "%s" in selecao:
+            raise ErroFragmentos("parâmetros na lista do SELECT não são suportados no modo fragmentado")
+        for trecho in (selecao, instrucao.trecho("having") or "", instrucao.trecho("order by") or ""):
+            m = PADRAO_AGREGADO_SEM_RECOMBINACAO.search(trecho)
+            if m:
+                raise ErroFragmentos(f"{m.group(1).upper()}(...) não pode ser recombinado entre fragmentos")
+        self._ler_limite(instrucao.trecho("limit"))
+        self.filtro = FiltroId.localizar(instrucao)
+        itens = [_separar_apelido(item) for item in dividir_no_topo(selecao)]
+        if "group by" in instrucao.palavras or any(_chamadas_agregado(expressao) for expressao, _ in itens):
+            self._montar_agregacao(itens)
+        else:
+            self._montar_linhas(itens)
+        return self
+
+    def _ler_limite(self, texto):
+        if texto is None:
+            return
+        m = PADRAO_LIMITE.match(texto)
+        if m is None:
+            raise ErroFragmentos(f"LIMIT '{texto}' não é suportado no modo fragmentado")
+        if m.group(2) is not None:
+            self.deslocamento, self.limite = int(m.group(1)), int(m.group(2))
+        else:
+            self.limite, self.deslocamento = int(m.group(1)), int(m.group(3) or 0)
+
+    def _ordenacao(self):
+        """Itens do ORDER BY como (expressão, decrescente)."""
+        itens = []
+        for item in dividir_no_topo(self.instrucao.trecho("order by") or ""):
+            if not item:
+                continue
+            m = re.match(r"^(.*?)\s+(asc|desc)$", item, re.I | re.S)
+            itens.append((m.group(1), m.group(2).lower() == "desc") if m else (item, False))
+        return itens
+
+    @staticmethod
+    def _posicao(expressao, itens):
+        """Coluna do SELECT a que o item do ORDER BY/GROUP BY se refere (por número, apelido ou texto)."""
+        if expressao.strip().isdigit():
+            return int(expressao) - 1
+        normalizada = _normalizar(expressao)
+        for i, (item, apelido) in enumerate(itens):
+            if apelido is not None and apelido.lower() == normalizada:
+                return i
+        for i, (item, _) in enumerate(itens):
+            if _normalizar(item) == normalizada:
+                return i
+        return None
+
+    def _montar_linhas(self, itens):
+        instrucao = self.instrucao
+        # Depois de um *, a posição das colunas seguintes não é conhecida sem consultar o banco.
+        estrela = next((i for i, (item, _) in enumerate(itens) if item == "*" or item.endswith(".*")), len(itens))
+        ocultas = []
+        for expressao, decrescente in self._ordenacao():
+            posicao = self._posicao(expressao, itens)
+            if posicao is None or (estrela <= posicao and not expressao.strip().isdigit()):
+                if self.distinto:
+                    raise ErroFragmentos("SELECT DISTINCT ordenado por coluna fora da seleção")
+                # Um apelido não pode ser repetido na seleção; vai a expressão que ele nomeia.
+                ocultas.append(expressao if posicao is None else itens[posicao][0])
+                posicao = -1     # ajustado abaixo, contado a partir do fim da linha
+            self.ordem.append((posicao, decrescente))
+        # Colunas ocultas ficam no fim da linha: índices negativos não dependem de quantas o * trouxe.
+        proxima = -len(ocultas)
+        for i, (posicao, decrescente) in enumerate(self.ordem):
+            if posicao == -1:
+                self.ordem[i] = (proxima, decrescente)
+                proxima += 1
+        self.ocultas = len(ocultas)
+        colunas = [instrucao.trecho("select")] + ocultas
+        fim = instrucao.inicio("limit", "for update", "for share", "lock in share mode")
+        sql = f"SELECT {', '.join(colunas)} {instrucao.texto[instrucao.inicio('from'):fim].strip()}"
+        if self.limite is not None:
+            sql += f" LIMIT {self.limite + self.deslocamento}"
+        sql += " " + instrucao.texto[instrucao.inicio("for update", "for share", "lock in share mode"):]
+        self.sql = instrucao.restaurar(sql.strip())
+
+    def _montar_agregacao(self, itens):
+        instrucao = self.instrucao
+        grupos = []
+        for expressao in dividir_no_topo(instrucao.trecho("group by") or ""):
+            if not expressao:
+                continue
+            posicao = self._posicao(expressao, itens)
+            grupos.append(itens[posicao][0] if posicao is not None and posicao < len(itens) else expressao)
+        self.grupos = len(grupos)
+        normalizados = [_normalizar(grupo) for grupo in grupos]
+        apelidos = {apelido.lower(): expressao for expressao, apelido in itens if apelido is not None}
+        indices_parciais, indices_finais = {}, {}
+
+        def parcial(funcao, argumento):
+            chave = (funcao, _normalizar(argumento))
+            if chave not in indices_parciais:
+                indices_parciais[chave] = len(self.parciais)
+                self.parciais.append((funcao, argumento))
+            return indices_parciais[chave]
+
+        def agregado(funcao, argumento):
+            if re.match(r"distinct\s", argumento, re.I):
+                if funcao not in ("min", "max"):
+                    raise ErroFragmentos(f"{funcao.upper()}(DISTINCT ...) não pode ser recombinado entre fragmentos")
+                argumento = argumento[len("distinct"):].strip()
+            chave = (funcao, _normalizar(argumento))
+            if chave not in indices_finais:
+                indices_finais[chave] = len(self.finais)
+                partes = ("sum", "count") if funcao == "avg" else (funcao,)
+                self.finais.append((funcao, [parcial(parte, argumento) for parte in partes]))
+            return indices_finais[chave]
+
+        def modelo(expressao):
+            """Troca agregados e colunas de grupo por '?': (sql avaliável, referências na ordem)."""
+            for apelido, original in apelidos.items():
+                if _chamadas_agregado(original):
+                    expressao = re.sub(rf"(?<![\w.]){re.escape(apelido)}\b", lambda _: original, expressao, flags=re.I)
+            trocas = [(inicio, fim, ("agregado", agregado(funcao, argumento)))
+                      for inicio, fim, funcao, argumento in _chamadas_agregado(expressao)]
+            for k, grupo in enumerate(grupos):
+                if not re.fullmatch(r"(?:[a-z_]\w*\.)?[a-z_]\w*", grupo, re.I):
+                    continue
+                coluna = grupo.split(".")[-1]
+                for m in re.finditer(rf"(?<![\w.\x00])(?:[a-z_]\w*\.)?{re.escape(coluna)}\b", expressao, re.I):
+                    if not any(inicio <= m.start() < fim for inicio, fim, _ in trocas):
+                        trocas.append((m.start(), m.end(), ("grupo", k)))
+            trocas.sort()
+            pedacos, refs, posicao = [], [], 0
+            for inicio, fim, ref in trocas:
+                pedacos += [expressao[posicao:inicio], "?"]
+                refs.append(ref)
+                posicao = fim
+            pedacos.append(expressao[posicao:])
+            sql = instrucao.restaurar("".join(pedacos))
+            _avaliar(sql, [None] * len(refs))   # recusa já no plano o que o SQLite não sabe calcular
+            return sql, refs
+
+        def saida(expressao):
+            normalizada = _normalizar(expressao)
+            if normalizada in normalizados:
+                return ("grupo", normalizados.index(normalizada))
+            chamadas = _chamadas_agregado(expressao)
+            if len(chamadas) == 1 and chamadas[0][0] == 0 and chamadas[0][1] == len(expressao):
+                return ("agregado", agregado(chamadas[0][2], chamadas[0][3]))
+            try:
+                return ("expressao",) + modelo(expressao)
+            except ErroFragmentos:
+                if not chamadas:
+                    raise ErroFragmentos(f"a coluna '{instrucao.restaurar(expressao)}' não está no GROUP BY")
+                raise
+
+        self.saidas = [saida(expressao) for expressao, _ in itens]
+        for expressao, decrescente in self._ordenacao():
+            posicao = self._posicao(expressao, itens)
+            if posicao is None:
+                self.saidas.append(saida(expressao))
+                self.ocultas += 1
+                posicao = len(self.saidas) - 1
+            self.ordem.append((posicao, decrescente))
+        # As colunas ocultas da ordenação ficam no fim; as posições viram negativas para o corte funcionar.
+        visiveis = len(self.saidas) - self.ocultas
+        self.ordem = [(posicao - len(self.saidas) if posicao >= visiveis else posicao, decrescente)
+                      for posicao, decrescente in self.ordem]
+        if "having" in instrucao.palavras:
+            self.condicao = modelo(instrucao.trecho("having"))
+
+        colunas = grupos + [f"{funcao.upper()}({argumento})" for funcao, argumento in self.parciais]
+        fim = instrucao.inicio("group by", "having", "order by", "limit", "for update", "for share",
+                               "lock in share mode")
+        sql = f"SELECT {', '.join(colunas)} {instrucao.texto[instrucao.inicio('from'):fim].strip()}"
+        if grupos:
+            sql += f" GROUP BY {', '.join(grupos)}"
+        self.sql = instrucao.restaurar(sql)
+
+    def recombinar(self, resultados, chave):
+        """Junta as linhas de cada fragmento no resultado que um banco único devolveria."""
+        if self.replicada:
+            return resultados[0]
+        if self.grupos is None:
+            linhas = [linha for parte in resultados for linha in parte]
+        else:
+            linhas = self._agregar(resultados, chave)
+        if self.distinto:
+            vistas, unicas = set(), []
+            for linha in linhas:
+                marca = tuple(chave(valor) for valor in linha)
+                if marca not in vistas:
+                    vistas.add(marca)
+                    unicas.append(linha)
+            linhas = unicas
+        # Ordenações estáveis da última chave para a primeira; cada fragmento já vem ordenado, e o
+        # Timsort aproveita essas sequências.
+        for coluna, decrescente in reversed(self.ordem):
+            linhas.sort(key=lambda linha: _chave_ordem(linha[coluna], chave), reverse=decrescente)
+        if self.limite is not None:
+            linhas = linhas[self.deslocamento:self.deslocamento + self.limite]
+        elif self.deslocamento:
+            linhas = linhas[self.deslocamento:]
+        if self.ocultas:
+            linhas = [tuple(linha[:len(linha) - self.ocultas]) for linha in linhas]
+        return linhas
+
+    def _agregar(self, resultados, chave):
+        n = self.grupos
+        grupos = {}
+        for parte in resultados:
+            for linha in parte:
+                marca = tuple(chave(valor) for valor in linha[:n])
+                atual = grupos.get(marca)
+                if atual is None:
+                    grupos[marca] = (linha[:n], list(linha[n:]))
+                    continue
+                parciais = atual[1]
+                for i, (funcao, _) in enumerate(self.parciais):
+                    parciais[i] = _combinar(funcao, parciais[i], linha[n + i], chave)
+        linhas = []
+        for valores_grupo, parciais in grupos.values():
+            finais = [_finalizar(funcao, [parciais[i] for i in indices]) for funcao, indices in self.finais]
+            valor = lambda ref: valores_grupo[ref[1]] if ref[0] == "grupo" else finais[ref[1]]
+            if self.condicao is not None and not _avaliar(self.condicao[0], [valor(ref) for ref in self.condicao[1]]):
+                continue
+            linhas.append(tuple(valor(saida) if saida[0] != "expressao"
+                                else _avaliar(saida[1], [valor(ref) for ref in saida[2]])
+                                for saida in self.saidas))
+        return linhas
+
+class PlanoEscrita:
+    """Para onde vai uma instrução que não é SELECT.
+
+    INSERT em clientes vai ao fragmento do id; UPDATE/DELETE com `id = x` ou `id IN (...)` no
+    WHERE, aos fragmentos desses ids (a lista é refeita para cada um). O resto (DDL, tabelas
+    auxiliares, UPDATE sem filtro por id) roda em todos os fragmentos.
+    """
+
+    def __init__(self, instrucao):
+        self.instrucao = instrucao
+        self.id_insercao = None     # ("parametro", índice) ou ("literal", id)
+        self.filtro = None
+
+    def montar(self):
+        instrucao = self.instrucao
+        if instrucao.tipo == "insert":
+            self._montar_insercao()
+        elif instrucao.tipo in ("update", "delete"):
+            m = PADRAO_ALTERACAO.match(instrucao.texto)
+            if m is not None and (m.group(1) or m.group(2)).lower() == "clientes":
+                if instrucao.subconsulta:
+                    raise ErroFragmentos("subconsultas em escritas não são suportadas no modo fragmentado")
+                if "limit" in instrucao.palavras or "order by" in instrucao.palavras:
+                    raise ErroFragmentos("UPDATE/DELETE com ORDER BY ou LIMIT não é suportado no modo fragmentado")
+                self.filtro = FiltroId.localizar(instrucao)
+        return self
+
+    def _montar_insercao(self):
+        instrucao = self.instrucao
+        texto = instrucao.texto
+        m = PADRAO_INSERCAO.match(texto[:instrucao.inicio("values", "select")])
+        if m is None or m.group(1).lower() != "clientes":
+            return
+        if "values" not in instrucao.palavras:
+            raise ErroFragmentos("INSERT ... SELECT em clientes não é suportado no modo fragmentado")
+        colunas = [_normalizar(coluna) for coluna in m.group(2).split(",")] if m.group(2) else list(COLUNAS_CLIENTES)
+        if "id" not in colunas:
+            raise ErroFragmentos("INSERT em clientes sem o id não pode ser distribuído entre os fragmentos")
+        abre = texto.index("(", instrucao.trechos["values"][0])
+        fecha = _fechamento(texto, abre)
+        if re.match(r"\s*,\s*\(", texto[fecha + 1:]):
+            raise ErroFragmentos("INSERT com várias linhas no VALUES não é suportado no modo fragmentado (use executemany)")
+        valores = dividir_no_topo(texto[abre + 1:fecha])
+        anteriores, valor = valores[:colunas.index("id")], valores[colunas.index("id")]
+        if valor == "%s":
+            self.id_insercao = ("parametro", texto.count("%s", 0, abre) + sum(item.count("%s") for item in anteriores))
+        elif valor.isdigit():
+            self.id_insercao = ("literal", int(valor))
+        else:
+            raise ErroFragmentos("o id do INSERT precisa ser um número ou um parâmetro no modo fragmentado")
+
+@lru_cache(maxsize=512)
+def planejar(sql):
+    """PlanoLeitura para SELECT, PlanoEscrita para o resto (os planos não dependem dos parâmetros)."""
+    instrucao = Instrucao(sql)
+    if instrucao.tipo in ("select", "with"):
+        return PlanoLeitura(instrucao).montar()
+    return PlanoEscrita(instrucao).montar()
+
+class ConexaoFragmentada:
+    """Uma conexão de cada fragmento, usadas juntas como se fossem uma só."""
+
+    def __init__(self, banco, conexoes):
+        self.banco = banco
+        self.conexoes = conexoes
+        self.limite_segundos = None
+
+    def cursor(self, *args, **kwargs):
+        return CursorFragmentado(self)
+
+    def commit(self):
+        # Cada fragmento confirma a sua parte: uma falha no meio deixa os anteriores confirmados.
+        for conn in self.conexoes:
+            conn.commit()
+
+    def rollback(self):
+        for conn in self.conexoes:
+            conn.rollback()
+
+class CursorFragmentado:
+    """Cursor que distribui cada instrução pelos cursores dos fragmentos (`cursores`)."""
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.cursores = [conn.cursor() for conn in conexao.conexoes]
+        self.rowcount = -1
+        self._linhas = []
+        self._posicao = 0
+
+    def execute(self, sql, params=None):
+        self._linhas, self._posicao = [], 0
+        plano = planejar(sql)
+        if isinstance(plano, PlanoLeitura):
+            self._linhas = self.conexao.banco._ler(self, plano, params)
+            self.rowcount = len(self._linhas)
+        else:
+            self.rowcount = self.conexao.banco._escrever(self, plano, sql, [params], varias=False)
+
+    def executemany(self, sql, lista_params):
+        self._linhas, self._posicao = [], 0
+        plano = planejar(sql)
+        if isinstance(plano, PlanoLeitura):
+            raise ErroFragmentos("executemany não aceita SELECT")
+        self.rowcount = self.conexao.banco._escrever(self, plano, sql, list(lista_params), varias=True)
+
+    def fetchone(self):
+        if self._posicao >= len(self._linhas):
+            return None
+        self._posicao += 1
+        return self._linhas[self._posicao - 1]
+
+    def fetchmany(self, tamanho=1):
+        linhas = self._linhas[self._posicao:self._posicao + tamanho]
+        self._posicao += len(linhas)
+        return linhas
+
+    def fetchall(self):
+        linhas = self._linhas[self._posicao:]
+        self._posicao = len(self._linhas)
+        return linhas
+
+    def close(self):
+        for cursor in self.cursores:
+            cursor.close()
+
+class BancoFragmentado(BackendBanco):
+    """Tabela clientes distribuída por id entre vários bancos (fragmentos) do mesmo dialeto.
+
+    O cliente de id `i` fica no fragmento `i % len(fragmentos)`. Escritas com id conhecido vão
+    só aos fragmentos donos; SELECTs em clientes rodam em paralelo em todos os fragmentos (ou
+    só nos donos, com `id = x`/`id IN (...)` no WHERE) e são recombinados como um banco único
+    responderia: COUNT e SUM somados, MIN/MAX dos parciais, AVG pela soma e contagem, grupos
+    juntados, ORDER BY/LIMIT aplicados depois. Tabelas auxiliares (migracoes_esquema) têm uma
+    cópia em cada fragmento: o DDL e as escritas vão a todos, as leituras ao primeiro.
+
+    Limitações: o commit não é atômico entre fragmentos, e consultas com JOIN, subconsulta,
+    UNION, COUNT(DISTINCT) ou GROUP_CONCAT em clientes levantam ErroFragmentos (tratado como erro do banco).
+    O tempo de cada fragmento em cada SELECT fica em `estatisticas_fragmentos()`.
+    """
+
+    def __init__(self, fragmentos, threads=None):
+        if not fragmentos:
+            raise ValueError("O modo fragmentado precisa de pelo menos um fragmento.")
+        self.fragmentos = list(fragmentos)
+        self.dialeto = self.fragmentos[0].dialeto
+        self.bloqueio_leitura = self.fragmentos[0].bloqueio_leitura
+        # No MySQL, 'Ativo' e 'ativo' caem no mesmo grupo e empatam na ordenação.
+        self._chave = ((lambda valor: sem_caixa(valor) if isinstance(valor, str) else valor)
+                       if self.dialeto == "MySQL" else (lambda valor: valor))
+        self._executor = ThreadPoolExecutor(max_workers=threads or 4 * len(self.fragmentos),
+                                            thread_name_prefix="fragmento")
+        self._lock = threading.Lock()
+        self._tempos = [[0, 0.0, 0.0, 0, 0] for _ in self.fragmentos]   # consultas, total, máximo, linhas, mais lento
+        self._ultima = None
+
+    @property
+    def Erro(self):
+        return tuple(dict.fromkeys((ErroFragmentos,) + tuple(fragmento.Erro for fragmento in self.fragmentos)))
+
+    @property
+    def max_conexoes(self):
+        # Cada operação ocupa uma conexão de cada fragmento: vale o menor limite.
+        limites = [fragmento.max_conexoes for fragmento in self.fragmentos if fragmento.max_conexoes is not None]
+        return min(limites) if limites else None
+
+    def fragmento_do_id(self, id):
+        return int(id) % len(self.fragmentos)
+
+    def obter_conexao(self):
+        """Empresta uma conexão de cada fragmento (None se algum não tiver)."""
+        conexoes = []
+        for fragmento in self.fragmentos:
+            conn = fragmento.obter_conexao()
+            if conn is None:
+                for obtida, dono in zip(conexoes, self.fragmentos):
+                    dono.devolver_conexao(obtida)
+                return None
+            conexoes.append(conn)
+        return ConexaoFragmentada(self, conexoes)
+
+    def devolver_conexao(self, conn, descartar=False):
+        for fragmento, conexao in zip(self.fragmentos, conn.conexoes):
+            fragmento.devolver_conexao(conexao, descartar)
+
+    def preparar_banco(self):
+        return all([fragmento.preparar_banco() for fragmento in self.fragmentos])
+
+    def cursor_streaming(self, conn):
+        # A recombinação precisa de todas as linhas de cada fragmento antes de devolver a primeira.
+        return conn.cursor()
+
+    def sql_upsert_clientes(self):
+        return self.fragmentos[0].sql_upsert_clientes()
+
+    def iniciar_escrita(self, cursor):
+        for fragmento, subcursor in zip(self.fragmentos, cursor.cursores):
+            fragmento.iniciar_escrita(subcursor)
+
+    def armar_limite_tempo(self, conn, segundos):
+        # Os fragmentos consultam em paralelo: cada um recebe o prazo inteiro.
+        conn.limite_segundos = segundos
+        for fragmento, conexao in zip(self.fragmentos, conn.conexoes):
+            fragmento.armar_limite_tempo(conexao, segundos)
+
+    def desarmar_limite_tempo(self, conn):
+        conn.limite_segundos = None
+        for fragmento, conexao in zip(self.fragmentos, conn.conexoes):
+            fragmento.desarmar_limite_tempo(conexao)
+
+    def listar_indices(self, cursor, tabela="clientes"):
+        # Os fragmentos recebem o mesmo DDL; o primeiro representa todos.
+        return self.fragmentos[0].listar_indices(cursor.cursores[0], tabela)
+
+    def explicar(self, cursor, sql, params=None):
+        """Soma as linhas estimadas nos fragmentos que a consulta vai ler."""
+        plano = planejar(sql)
+        alvos = self._alvos(plano, params) if isinstance(plano, PlanoLeitura) else range(len(self.fragmentos))
+        estimadas, planos = 0, []
+        for i in alvos:
+            linhas, descricao = self.fragmentos[i].explicar(cursor.cursores[i], sql, params)
+            estimadas = None if estimadas is None or linhas is None else estimadas + linhas
+            planos.append(f"fragmento {i}: {descricao}")
+        return estimadas, " | ".join(planos)
+
+    def analisar(self, cursor, tabela="clientes"):
+        for fragmento, subcursor in zip(self.fragmentos, cursor.cursores):
+            fragmento.analisar(subcursor, tabela)
+
+    def aquecer(self):
+        for fragmento in self.fragmentos:
+            fragmento.aquecer()
+
+    def _alvos(self, plano, params):
+        """Fragmentos que um SELECT precisa consultar."""
+        if plano.replicada:
+            return [0]
+        if plano.filtro is not None:
+            try:
+                return sorted({self.fragmento_do_id(id) for id in plano.filtro.ids(params)})
+            except (TypeError, ValueError, IndexError):
+                pass
+        return list(range(len(self.fragmentos)))
+
+    def _ler(self, cursor, plano, params):
+        alvos = self._alvos(plano, params)
+        limite = cursor.conexao.limite_segundos
+
+        def consultar(i):
+            fragmento = self.fragmentos[i]
+            sql = plano.sql if params is None else fragmento.adaptar_sql(plano.sql)
+            if limite:
+                sql = fragmento.sql_com_limite_tempo(sql, limite)
+            inicio = time.perf_counter()
+            if params is None:
+                cursor.cursores[i].execute(sql)
+            else:
+                cursor.cursores[i].execute(sql, params)
+            linhas = cursor.cursores[i].fetchall()
+            return linhas, time.perf_counter() - inicio
+
+        if len(alvos) == 1:
+            resultados = [consultar(alvos[0])]
+        else:
+            futuros = [self._executor.submit(consultar, i) for i in alvos]
+            # Espera todos antes de propagar um erro: a conexão não pode voltar ao pool em uso.
+            wait(futuros)
+            resultados = [futuro.result() for futuro in futuros]
+        if not plano.replicada:
+            self._registrar_tempos(plano.sql, alvos, resultados)
+        return plano.recombinar([linhas for linhas, _ in resultados], self._chave)
+
+    def _registrar_tempos(self, sql, alvos, resultados):
+        segundos = [tempo for _, tempo in resultados]
+        mais_lento = alvos[segundos.index(max(segundos))]
+        with self._lock:
+            for i, (linhas, tempo) in zip(alvos, resultados):
+                tempos = self._tempos[i]
+                tempos[0] += 1
+                tempos[1] += tempo
+                tempos[2] = max(tempos[2], tempo)
+                tempos[3] += len(linhas)
+            if len(alvos) > 1:
+                self._tempos[mais_lento][4] += 1
+            self._ultima = (sql, dict(zip(alvos, segundos)), mais_lento)
+        for i, tempo in zip(alvos, segundos):
+            METRICAS.observar(f"fragmento.{i}.consulta", tempo)
+
+    def _rotear(self, plano, params):
+        """Pares (fragmento, sql mascarado, params) de uma execução da instrução."""
+        instrucao = plano.instrucao
+        todos = [(i, instrucao.texto, params) for i in range(len(self.fragmentos))]
+        if plano.id_insercao is not None:
+            tipo, valor = plano.id_insercao
+            try:
+                return [(self.fragmento_do_id(params[valor] if tipo == "parametro" else valor), instrucao.texto, params)]
+            except (TypeError, ValueError, IndexError) as err:
+                raise ErroFragmentos(f"id inválido para distribuir o INSERT: {err}") from err
+        filtro = plano.filtro
+        if filtro is None:
+            return todos
+        try:
+            donos = [self.fragmento_do_id(id) for id in filtro.ids(params)]
+        except (TypeError, ValueError, IndexError):
+            return todos
+        if not filtro.lista or len(set(donos)) == 1:
+            return [(i, instrucao.texto, params) for i in sorted(set(donos))]
+        # id IN (...) com ids de vários fragmentos: cada um recebe só a sua parte da lista.
+        itens = [item.strip() for item in instrucao.texto[filtro.inicio:filtro.fim].split(",")]
+        primeiro = instrucao.texto.count("%s", 0, filtro.inicio)
+        quantos = sum(1 for tipo, _ in filtro.valores if tipo == "parametro")
+        rotas = []
+        for i in sorted(set(donos)):
+            escolhidos = [j for j, dono in enumerate(donos) if dono == i]
+            texto = (instrucao.texto[:filtro.inicio] + ", ".join(itens[j] for j in escolhidos)
+                     + instrucao.texto[filtro.fim:])
+            if params is not None:
+                params_i = (tuple(params[:primeiro])
+                            + tuple(params[filtro.valores[j][1]] for j in escolhidos if filtro.valores[j][0] == "parametro")
+                            + tuple(params[primeiro + quantos:]))
+            else:
+                params_i = None
+            rotas.append((i, texto, params_i))
+        return rotas
+
+    def _escrever(self, cursor, plano, sql, lista_params, varias):
+        """Executa a instrução nos fragmentos donos e retorna a soma das linhas afetadas."""
+        instrucao = plano.instrucao
+        lotes = {}      # (fragmento, sql mascarado) -> lista de params
+        for params in lista_params:
+            for i, texto, params_i in self._rotear(plano, params):
+                lotes.setdefault((i, texto), []).append(params_i)
+        afetadas = 0
+        for (i, texto), lista in sorted(lotes.items(), key=lambda item: item[0][0]):
+            fragmento, subcursor = self.fragmentos[i], cursor.cursores[i]
+            # Sem reescrita, vai o SQL original (com comentários e literais exatamente como vieram).
+            texto = sql if texto == instrucao.texto else instrucao.restaurar(texto)
+            if varias:
+                subcursor.executemany(fragmento.adaptar_sql(texto), lista)
+            elif lista[0] is None:
+                subcursor.execute(texto)
+            else:
+                subcursor.execute(fragmento.adaptar_sql(texto), lista[0])
+            afetadas += max(subcursor.rowcount, 0)
+        return afetadas
+
+    def estatisticas_fragmentos(self):
+        """Consultas, tempo médio e máximo de cada fragmento, e quantas vezes ele foi o mais lento."""
+        with self._lock:
+            tempos = [list(tempo) for tempo in self._tempos]
+            ultima = self._ultima
+        stats = {"fragmentos": len(self.fragmentos)}
+        for i, (consultas, total, maximo, linhas, mais_lento) in enumerate(tempos):
+            stats[f"fragmento_{i}_consultas"] = consultas
+            stats[f"fragmento_{i}_media_ms"] = total / consultas * 1000 if consultas else 0.0
+            stats[f"fragmento_{i}_max_ms"] = maximo * 1000
+            stats[f"fragmento_{i}_linhas"] = linhas
+            stats[f"fragmento_{i}_vezes_mais_lento"] = mais_lento
+        if ultima is not None:
+            sql, segundos, mais_lento = ultima
+            stats["ultima_consulta"] = sql
+            stats["ultima_consulta_ms_por_fragmento"] = ", ".join(
+                f"{i}: {tempo * 1000:.2f}" for i, tempo in sorted(segundos.items()))
+            stats["ultima_consulta_mais_lento"] = mais_lento
+        return stats
+
+    def estatisticas_pool(self):
+        return {f"fragmento_{i}": fragmento.estatisticas_pool() for i, fragmento in enumerate(self.fragmentos)}
+
+    def fechar(self):
+        self._executor.shutdown(wait=True)
+        for fragmento in self.fragmentos:
+            fragmento.fechar()
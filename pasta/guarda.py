@@ -0,0 +1,204 @@
+# guarda.py
+
+import re
+import threading
+
+# Funções e cláusulas que não têm lugar numa consulta de leitura do chat.
+PADRAO_PROIBIDO = re.compile(
+    r"\binto\b|\bfor update\b|\bfor share\b|\block in share mode\b"
+    r"|\b(?:sleep|benchmark|get_lock|load_file)\s*\("
+)
+# LIMIT no fim da consulta, com número ou parâmetro (%s ou ?): "limit 10", "limit %s offset ?".
+PADRAO_LIMITE = re.compile(r"\blimit\s+(?:\d+|%s|\?)(?:\s*(?:,|offset)\s*(?:\d+|%s|\?))?\s*$")
+PADRAO_AGREGADO = re.compile(r"^(?:count|sum|avg|min|max)\s*\(.*\)(?:\s+(?:as\s+)?\w+)?$", re.S)
+
+def limpar_sql(sql):
+    """Separa o SQL em (limpo, mascarado).
+
+    `limpo` é o SQL sem comentários, com os literais intactos; `mascarado` é o mesmo texto em
+    minúsculas com cada literal trocado por '?', para analisar a estrutura sem se confundir
+    com o conteúdo das strings.
+    """
+    limpo, mascarado = [], []
+    i, n = 0, len(sql)
+    while i < n:
+        c = sql[i]
+        if c in "'\"":
+            j = i + 1
+            while j < n:
+                if sql[j] == "\\":
+                    j += 2
+                    continue
+                if sql[j] == c:
+                    if j + 1 < n and sql[j + 1] == c:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            limpo.append(sql[i:j + 1])
+            mascarado.append("?")
+            i = j + 1
+        elif c == "`":
+            j = sql.find("`", i + 1)
+            j = n - 1 if j < 0 else j
+            limpo.append(sql[i:j + 1])
+            mascarado.append(sql[i + 1:j].lower())
+            i = j + 1
+        elif sql.startswith("--", i) or c == "#":
+            j = sql.find("\n", i)
+            i = n if j < 0 else j
+        elif sql.startswith("/*", i):
+            j = sql.find("*/", i + 2)
+            i = n if j < 0 else j + 2
+            limpo.append(" ")
+            mascarado.append(" ")
+        else:
+            limpo.append(c)
+            mascarado.append(c.lower())
+            i += 1
+    return "".join(limpo).strip(), " ".join("".join(mascarado).split())
+
+def dividir_no_topo(texto, separador=","):
+    """Divide o texto pelo separador, ignorando os que estão dentro de parênteses."""
+    partes, profundidade, inicio = [], 0, 0
+    for i, c in enumerate(texto):
+        if c == "(":
+            profundidade += 1
+        elif c == ")":
+            profundidade -= 1
+        elif c == separador and profundidade == 0:
+            partes.append(texto[inicio:i].strip())
+            inicio = i + 1
+    partes.append(texto[inicio:].strip())
+    return partes
+
+class Verificacao:
+    """Resultado da guarda para uma consulta: se pode rodar, com qual SQL e por quê."""
+
+    def __init__(self, permitida, sql, motivo=None, linhas_estimadas=None, plano=None, reescrita=False):
+        self.permitida = permitida
+        self.sql = sql
+        self.motivo = motivo
+        self.linhas_estimadas = linhas_estimadas
+        self.plano = plano
+        self.reescrita = reescrita
+
+    def __repr__(self):
+        return f"Verificacao({self.permitida!r}, {self.sql!r}, motivo={self.motivo!r}, linhas={self.linhas_estimadas!r})"
+
+class GuardaConsultas:
+    """Confere o SQL gerado pelo modelo antes de executá-lo.
+
+    Só passa um único SELECT, sem cláusulas de escrita ou bloqueio nem produto cartesiano;
+    sem LIMIT, recebe `limite_linhas` (exceto agregações de uma linha só). Em seguida o EXPLAIN
+    estima as linhas examinadas: acima de `orcamento_linhas` a consulta é recusada, a menos que
+    a função `confirmar(verificacao)` autorize. `timeout_segundos` é o limite de tempo que o
+    chamador deve repassar a executar_query/iterar_query (limite_segundos).
+    """
+
+    def __init__(self, gerenciador, limite_linhas=1000, orcamento_linhas=1000000, timeout_segundos=10.0,
+                 confirmar=None):
+        self.gerenciador = gerenciador
+        self.limite_linhas = limite_linhas
+        self.orcamento_linhas = orcamento_linhas
+        self.timeout_segundos = timeout_segundos
+        self.confirmar = confirmar
+        self._lock = threading.Lock()
+        self.verificadas = 0
+        self.rejeitadas = {}
+        self.reescritas = 0
+        self.acima_do_orcamento = 0
+        self.confirmadas = 0
+
+    def _rejeitar(self, sql, categoria, motivo, **extras):
+        with self._lock:
+            self.rejeitadas[categoria] = self.rejeitadas.get(categoria, 0) + 1
+        return Verificacao(False, sql, motivo, **extras)
+
+    def verificar(self, sql, params=None):
+        """Retorna uma Verificacao; execute `verificacao.sql` só se `verificacao.permitida`."""
+        with self._lock:
+            self.verificadas += 1
+        limpo, mascarado = limpar_sql(sql or "")
+        limpo, mascarado = limpo.rstrip("; \n\t"), mascarado.rstrip("; ")
+        if not mascarado:
+            return self._rejeitar(sql, "vazia", "o modelo não devolveu nenhuma consulta")
+        if ";" in mascarado:
+            return self._rejeitar(sql, "multiplas_instrucoes", "mais de uma instrução SQL")
+        if not mascarado.startswith("select "):
+            return self._rejeitar(sql, "nao_select", "apenas consultas SELECT podem ser executadas")
+        if PADRAO_PROIBIDO.search(mascarado):
+            return self._rejeitar(sql, "clausula_proibida", "a consulta usa uma cláusula ou função não permitida")
+        if self._produto_cartesiano(mascarado):
+            return self._rejeitar(sql, "produto_cartesiano", "junção sem condição (produto cartesiano)")
+
+        reescrita = False
+        if not PADRAO_LIMITE.search(mascarado) and not self._uma_linha(mascarado):
+            limpo = f"{limpo} LIMIT {self.limite_linhas}"
+            reescrita = True
+            with self._lock:
+                self.reescritas += 1
+
+        if self.gerenciador.respondivel_sem_banco(limpo, params):
+            # Respondida pelo resumo ou pelo motor em memória: não custa nada ao banco.
+            return Verificacao(True, limpo, reescrita=reescrita)
+
+        db = self.gerenciador.db_conn
+        with db.conexao() as conn:
+            if conn is None:
+                return self._rejeitar(sql, "sem_conexao", "sem conexão para estimar o custo")
+            cursor = conn.cursor()
+            try:
+                estimadas, plano = db.explicar(cursor, limpo, params)
+            except db.Erro as err:
+                return self._rejeitar(sql, "invalida", f"o banco recusou a consulta: {err}")
+            finally:
+                cursor.close()
+
+        verificacao = Verificacao(True, limpo, linhas_estimadas=estimadas, plano=plano, reescrita=reescrita)
+        if estimadas is not None and estimadas > self.orcamento_linhas:
+            with self._lock:
+                self.acima_do_orcamento += 1
+            if self.confirmar is not None and self.confirmar(verificacao):
+                with self._lock:
+                    self.confirmadas += 1
+                return verificacao
+            return self._rejeitar(sql, "acima_do_orcamento",
+                                  f"examinaria cerca de {estimadas} linhas (orçamento: {self.orcamento_linhas})",
+                                  linhas_estimadas=estimadas, plano=plano)
+        return verificacao
+
+    @staticmethod
+    def _produto_cartesiano(mascarado):
+        if re.search(r"\bcross join\b|\bnatural join\b", mascarado):
+            return True
+        for juncao in re.split(r"\bjoin\b", mascarado)[1:]:
+            # Cada JOIN precisa de ON/USING antes do próximo JOIN ou do fim da cláusula FROM.
+            trecho = re.split(r"\bwhere\b|\bgroup by\b|\border by\b|\blimit\b", juncao)[0]
+            if not re.search(r"\bon\b|\busing\b", trecho):
+                return True
+        m = re.search(r"\bfrom\b(.*?)(?=\bwhere\b|\bgroup by\b|\border by\b|\blimit\b|$)", mascarado)
+        # Tabelas separadas por vírgula só são aceitas com um WHERE para relacioná-las.
+        return bool(m and len(dividir_no_topo(m.group(1))) > 1 and not re.search(r"\bwhere\b", mascarado))
+
+    @staticmethod
+    def _uma_linha(mascarado):
+        """Agregação sem GROUP BY: o resultado tem uma linha, o LIMIT não acrescenta nada."""
+        m = re.match(r"select (.*?) from\b", mascarado)
+        if m is None or re.search(r"\bgroup by\b", mascarado):
+            return False
+        return all(PADRAO_AGREGADO.match(item) for item in dividir_no_topo(m.group(1)))
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "verificadas": self.verificadas,
+                "rejeitadas": sum(self.rejeitadas.values()),
+                "rejeitadas_por_motivo": dict(self.rejeitadas),
+                "reescritas_com_limit": self.reescritas,
+                "acima_do_orcamento": self.acima_do_orcamento,
+                "confirmadas_pelo_usuario": self.confirmadas,
+                "limite_linhas": self.limite_linhas,
+                "orcamento_linhas": self.orcamento_linhas,
+                "timeout_segundos": self.timeout_segundos,
+            }
@@ -0,0 +1,111 @@
+# importacao.py
+
+import csv
+import json
+import math
+import os
+import re
+
+CAMPOS_CLIENTE = ("id", "nome", "renda", "status", "genero")
+STATUS_VALIDOS = ("ativo", "nome sujo")
+GENEROS_VALIDOS = ("masculino", "feminino")
+# Renda com vírgula decimal: 1500,00 ou 1.500,00 (pontos só como separador de milhar).
+PADRAO_RENDA_VIRGULA = re.compile(r"[+-]?(?:\d{1,3}(?:\.\d{3})+|\d+),\d+")
+# Sem vírgula, vários pontos só podem separar milhares ("1.500.000"); um só, como em "1.500",
+# tanto pode ser mil e quinhentos quanto 1,5.
+PADRAO_RENDA_MILHARES = re.compile(r"[+-]?\d{1,3}(?:\.\d{3}){2,}")
+PADRAO_RENDA_AMBIGUA = re.compile(r"[+-]?\d{1,3}\.\d{3}")
+
+def detectar_formato(caminho):
+    """Deduz o formato ('csv' ou 'jsonl') pela extensão do arquivo."""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == ".csv":
+        return "csv"
+    if extensao in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    raise ValueError(f"Formato de arquivo não suportado: '{extensao}'. Use .csv ou .jsonl.")
+
+def ler_registros(caminho, formato=None):
+    """Lê o arquivo linha a linha, gerando pares (número da linha, registro) com memória constante."""
+    formato = formato or detectar_formato(caminho)
+    with open(caminho, newline="", encoding="utf-8-sig") as arquivo:
+        if formato == "csv":
+            leitor = csv.DictReader(arquivo)
+            if leitor.fieldnames:
+                leitor.fieldnames = [campo.strip().lower() for campo in leitor.fieldnames]
+            for registro in leitor:
+                # A linha 1 é o cabeçalho.
+                yield leitor.line_num, registro
+        elif formato == "jsonl":
+            for numero, linha in enumerate(arquivo, start=1):
+                if not linha.strip():
+                    continue
+                try:
+                    yield numero, json.loads(linha)
+                except json.JSONDecodeError:
+                    yield numero, None
+        else:
+            raise ValueError(f"Formato desconhecido: '{formato}'.")
+
+def converter_renda(valor):
+    """Converte a renda em float, aceitando o formato brasileiro ("1.500,00") e o de ponto decimal.
+
+    Valores em que a vírgula e os pontos não têm um sentido único são recusados com ValueError,
+    em vez de virarem outro número.
+    """
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return float(valor)
+    texto = str(valor).strip()
+    if "," in texto:
+        if not PADRAO_RENDA_VIRGULA.fullmatch(texto):
+            raise ValueError(f"renda inválida: {valor!r} (use 1500,00, 1.500,00 ou 1500.00)")
+        texto = texto.replace(".", "").replace(",", ".")
+    elif PADRAO_RENDA_MILHARES.fullmatch(texto):
+        texto = texto.replace(".", "")
+    elif PADRAO_RENDA_AMBIGUA.fullmatch(texto):
+        raise ValueError(f"renda ambígua: {valor!r} (use 1500, 1.500,00 ou 1500.00)")
+    try:
+        return float(texto)
+    except ValueError:
+        raise ValueError(f"renda inválida: {valor!r}")
+
+def validar_cliente(registro):
+    """Valida e converte um registro (dict ou sequência) na tupla (id, nome, renda, status, genero)."""
+    if isinstance(registro, dict):
+        registro = {str(chave).strip().lower(): valor for chave, valor in registro.items()}
+        faltando = [campo for campo in CAMPOS_CLIENTE if registro.get(campo) in (None, "")]
+        if faltando:
+            raise ValueError(f"campos ausentes: {', '.join(faltando)}")
+        id, nome, renda, status, genero = (registro[campo] for campo in CAMPOS_CLIENTE)
+    elif isinstance(registro, (list, tuple)) and len(registro) == len(CAMPOS_CLIENTE):
+        id, nome, renda, status, genero = registro
+    else:
+        raise ValueError("registro ilegível")
+
+    try:
+        id = int(str(id).strip())
+    except ValueError:
+        raise ValueError(f"id inválido: {id!r}")
+    if id <= 0:
+        raise ValueError(f"id deve ser positivo: {id}")
+
+    nome = str(nome).strip()
+    if not nome or len(nome) > 255:
+        raise ValueError("nome vazio ou com mais de 255 caracteres")
+
+    renda = converter_renda(renda)
+    # float() aceita "nan", "inf" e "1e309"; nenhum deles é uma renda (e nan passaria pelo < 0).
+    if not math.isfinite(renda):
+        raise ValueError(f"renda inválida: {renda!r}")
+    if renda < 0:
+        raise ValueError(f"renda negativa: {renda}")
+
+    status = str(status).strip().lower()
+    if status not in STATUS_VALIDOS:
+        raise ValueError(f"status inválido: {status!r}")
+
+    genero = str(genero).strip().lower()
+    if genero not in GENEROS_VALIDOS:
+        raise ValueError(f"gênero inválido: {genero!r}")
+
+    return id, nome, renda, status, genero
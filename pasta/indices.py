@@ -0,0 +1,187 @@
+# indices.py
+
+import re
+import threading
+from collections import Counter
+
+COLUNAS_INDEXAVEIS = ("id", "nome", "renda", "status", "genero")
+PADRAO_PREDICADO = re.compile(r"^\(?\s*(\w+)\s*(=|<=|>=|<>|!=|<|>|between\b|in\b|like\b)")
+
+def analisar_sql(sql):
+    """Extrai de um SELECT as colunas usadas em igualdades, faixas, agrupamento e agregações.
+
+    Retorna None para o que não é SELECT na tabela clientes.
+    """
+    texto = re.sub(r"'(?:[^']|'')*'", "?", sql).lower()
+    texto = " ".join(texto.replace("%s", "?").split()).rstrip(";").strip()
+    if not texto.startswith("select") or not re.search(r"\bfrom clientes\b", texto):
+        return None
+
+    igualdades, faixas = set(), set()
+    where = re.search(r"\bwhere\b(.*?)(?=\bgroup by\b|\border by\b|\blimit\b|$)", texto)
+    # Com OR, um índice composto não ajuda; a consulta conta só pelo agrupamento/agregação.
+    if where and not re.search(r"\bor\b", where.group(1)):
+        # O AND de um BETWEEN não separa predicados.
+        condicoes = re.sub(r"\bbetween (\S+) and ", r"between \1 __e__ ", where.group(1))
+        for predicado in re.split(r"\band\b", condicoes):
+            m = PADRAO_PREDICADO.match(predicado.strip())
+            if m is None or m.group(1) not in COLUNAS_INDEXAVEIS:
+                continue
+            if m.group(2) in ("=", "in"):
+                igualdades.add(m.group(1))
+            elif m.group(2) != "like":
+                # Com o literal removido não dá para saber se o LIKE tem prefixo fixo; fica de fora.
+                faixas.add(m.group(1))
+
+    agrupamento = []
+    m = re.search(r"\bgroup by ([\w\s,]+?)(?=\border by\b|\blimit\b|\bhaving\b|$)", texto)
+    if m:
+        agrupamento = [c.strip() for c in m.group(1).split(",") if c.strip() in COLUNAS_INDEXAVEIS]
+
+    agregadas = set(re.findall(r"\b(?:avg|sum|min|max)\(\s*(\w+)\s*\)", texto)) & set(COLUNAS_INDEXAVEIS)
+    return {
+        "igualdades": frozenset(igualdades),
+        "faixas": frozenset(faixas),
+        "agrupamento": tuple(agrupamento),
+        "agregadas": frozenset(agregadas),
+    }
+
+class AssessorIndices:
+    """Observa as consultas geradas pelo agente e propõe índices para a tabela clientes.
+
+    Cada consulta registrada tem suas colunas de filtro, agrupamento e agregação contadas;
+    as combinações mais frequentes viram índices compostos (igualdades primeiro, depois a
+    coluna de faixa ou de agrupamento e, se couber, a coluna agregada para cobrir a consulta).
+    """
+
+    def __init__(self, gerenciador, max_consultas=200, max_colunas_indice=3):
+        self.gerenciador = gerenciador
+        self.max_consultas = max_consultas
+        self.max_colunas_indice = max_colunas_indice
+        self._lock = threading.Lock()
+        self._consultas = {}  # sql normalizado -> [sql, params, ocorrências]
+        self.filtros = Counter()
+        self.combinacoes = Counter()
+        self.agrupamentos = Counter()
+        self.agregacoes = Counter()
+        self._assinaturas = Counter()
+
+    def registrar(self, sql, params=None):
+        """Registra uma consulta executada a pedido do agente."""
+        uso = analisar_sql(sql)
+        if uso is None:
+            return
+        chave = " ".join(sql.split()).lower()
+        with self._lock:
+            if chave in self._consultas:
+                self._consultas[chave][2] += 1
+            elif len(self._consultas) < self.max_consultas:
+                self._consultas[chave] = [sql, params, 1]
+            for coluna in uso["igualdades"] | uso["faixas"]:
+                self.filtros[coluna] += 1
+            if uso["igualdades"] or uso["faixas"]:
+                self.combinacoes[tuple(sorted(uso["igualdades"] | uso["faixas"]))] += 1
+            if uso["agrupamento"]:
+                self.agrupamentos[uso["agrupamento"]] += 1
+            for coluna in uso["agregadas"]:
+                self.agregacoes[coluna] += 1
+            self._assinaturas[(uso["igualdades"], uso["faixas"], uso["agrupamento"], uso["agregadas"])] += 1
+
+    def _colunas_para(self, igualdades, faixas, agrupamento, agregadas):
+        # Ordenar as igualdades pela frequência global faz consultas diferentes compartilharem prefixos.
+        colunas = sorted(igualdades, key=lambda c: (-self.filtros[c], c))
+        if faixas:
+            colunas.append(sorted(faixas, key=lambda c: (-self.filtros[c], c))[0])
+        elif agrupamento:
+            colunas += [c for c in agrupamento if c not in colunas]
+        for coluna in sorted(agregadas):
+            if coluna not in colunas and len(colunas) < self.max_colunas_indice:
+                colunas.append(coluna)
+        return tuple(colunas[:self.max_colunas_indice])
+
+    def propor(self, max_indices=3, min_ocorrencias=2):
+        """Retorna os índices propostos como tuplas de colunas, dos mais aos menos úteis."""
+        existentes = list(self._indices_existentes().values())
+        with self._lock:
+            candidatos = Counter()
+            for (igualdades, faixas, agrupamento, agregadas), ocorrencias in self._assinaturas.items():
+                colunas = self._colunas_para(igualdades, faixas, agrupamento, agregadas)
+                if colunas and colunas != ("id",):
+                    candidatos[colunas] += ocorrencias
+
+        # Um índice também atende as consultas cujas colunas formam um prefixo dele.
+        beneficio = {
+            colunas: sum(n for outras, n in candidatos.items() if colunas[:len(outras)] == outras)
+            for colunas in candidatos
+        }
+        propostas = []
+        for colunas in sorted(candidatos, key=lambda c: (-beneficio[c], -len(c), c)):
+            if beneficio[colunas] < min_ocorrencias:
+                break
+            # Um índice existente ou já proposto que comece com as mesmas colunas já atende.
+            if any(tuple(indice[:len(colunas)]) == colunas for indice in existentes + propostas):
+                continue
+            propostas = [p for p in propostas if tuple(colunas[:len(p)]) != p]
+            propostas.append(colunas)
+            if len(propostas) >= max_indices:
+                break
+        return [tuple(p) for p in propostas]
+
+    def _indices_existentes(self):
+        with self.gerenciador.db_conn.conexao() as conn:
+            if conn is None: return {}
+            cursor = conn.cursor()
+            try:
+                return self.gerenciador.db_conn.listar_indices(cursor)
+            except self.gerenciador.db_conn.Erro as err:
+                print(f"Erro ao listar os índices: {err}")
+                return {}
+            finally:
+                cursor.close()
+
+    def estimar(self, limite=10):
+        """Roda EXPLAIN nas consultas mais frequentes: [(sql, ocorrências, linhas estimadas, plano)]."""
+        with self._lock:
+            consultas = sorted(self._consultas.values(), key=lambda c: -c[2])[:limite]
+        resultado = []
+        with self.gerenciador.db_conn.conexao() as conn:
+            if conn is None: return []
+            cursor = conn.cursor()
+            try:
+                for sql, params, ocorrencias in consultas:
+                    try:
+                        estimadas, plano = self.gerenciador.db_conn.explicar(cursor, sql, params)
+                    except self.gerenciador.db_conn.Erro as err:
+                        estimadas, plano = None, f"erro: {err}"
+                    resultado.append((sql, ocorrencias, estimadas, plano))
+            finally:
+                cursor.close()
+        return resultado
+
+    def aplicar(self, propostas):
+        """Cria os índices propostos numa migração e compara as linhas examinadas antes e depois."""
+        if not propostas:
+            return []
+        antes = self.estimar()
+        comandos = [f"CREATE INDEX idx_clientes_{'_'.join(colunas)} ON clientes ({', '.join(colunas)})"
+                    for colunas in propostas]
+        descricao = "Índices sugeridos: " + "; ".join(", ".join(colunas) for colunas in propostas)
+        if self.gerenciador.aplicar_migracao(descricao, comandos) is None:
+            return []
+        depois = {sql: (estimadas, plano) for sql, _, estimadas, plano in self.estimar()}
+        return [
+            {"sql": sql, "ocorrencias": ocorrencias, "linhas_antes": estimadas, "plano_antes": plano,
+             "linhas_depois": depois.get(sql, (None, None))[0], "plano_depois": depois.get(sql, (None, None))[1]}
+            for sql, ocorrencias, estimadas, plano in antes
+        ]
+
+    def estatisticas(self):
+        """Uso agregado das colunas nas consultas registradas."""
+        with self._lock:
+            return {
+                "consultas_distintas": len(self._consultas),
+                "filtros": dict(self.filtros),
+                "combinacoes": {", ".join(c): n for c, n in self.combinacoes.most_common(10)},
+                "agrupamentos": {", ".join(c): n for c, n in self.agrupamentos.items()},
+                "agregacoes": dict(self.agregacoes),
+            }
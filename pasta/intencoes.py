@@ -0,0 +1,177 @@
+# intencoes.py
+
+import re
+import threading
+from cache import normalizar_pergunta
+
+# Nome entre aspas na pergunta original, ex.: 'João da Silva'.
+PADRAO_NOME = re.compile(r"['\"“‘]([^'\"”’]+)['\"”’]")
+# Números como 2000, 2.000, 2.000,50 ou 2500.75.
+PADRAO_NUMERO = re.compile(r"\d{1,3}(?:\.\d{3})+(?:,\d+)?|\d+(?:[.,]\d+)?")
+
+# Filtros reconhecidos: (regex sobre o texto normalizado, condição SQL, fábrica dos parâmetros).
+FILTROS = [
+    (re.compile(r"\b(?:com )?(?:o )?nome sujo\b|\bnegativad[oa]s?\b|\binadimplentes?\b"),
+     "status = %s", lambda m, nums: ("nome sujo",)),
+    (re.compile(r"\b(?:com status )?ativ[oa]s?\b"),
+     "status = %s", lambda m, nums: ("ativo",)),
+    (re.compile(r"\b(?:do )?(?:sexo|genero) masculino\b|\bmasculinos?\b|\bhomens?\b"),
+     "genero = %s", lambda m, nums: ("masculino",)),
+    (re.compile(r"\b(?:do )?(?:sexo|genero) feminino\b|\bfemininos?\b|\bmulher(?:es)?\b"),
+     "genero = %s", lambda m, nums: ("feminino",)),
+    (re.compile(r"\b(?:uma )?renda entre num(\d+) e num(\d+)\b"),
+     "renda BETWEEN %s AND %s", lambda m, nums: (nums[int(m.group(1))], nums[int(m.group(2))])),
+    (re.compile(r"\b(?:uma )?renda (?:maior|superior|acima) (?:que |de |a )?num(\d+)\b"
+                r"|\bganham? mais (?:que|de) num(\d+)\b"),
+     "renda > %s", lambda m, nums: (nums[int(m.group(1) or m.group(2))],)),
+    (re.compile(r"\b(?:uma )?renda (?:menor|inferior|abaixo) (?:que |de |a )?num(\d+)\b"
+                r"|\bganham? menos (?:que|de) num(\d+)\b"),
+     "renda < %s", lambda m, nums: (nums[int(m.group(1) or m.group(2))],)),
+    (re.compile(r"\b(?:de nome|com o nome|com nome|chamad[oa]|cliente) nomeq\b"),
+     "nome = %s", lambda m, nums: None),
+]
+
+# Agregações e projeções: (nome da intenção, regex, expressão do SELECT).
+SELECOES = [
+    ("media", re.compile(r"\b(?:a )?(?:renda media|media (?:de |da )?renda|media)\b"), "AVG(renda)"),
+    ("soma", re.compile(r"\b(?:a )?(?:(?:soma|total) (?:de |da |das )?rendas?|rendas? (?:total|somadas?))\b"),
+     "SUM(renda)"),
+    ("maximo", re.compile(r"\b(?:a )?(?:maior|maxima) renda\b"), "MAX(renda)"),
+    ("minimo", re.compile(r"\b(?:a )?(?:menor|minima) renda\b"), "MIN(renda)"),
+    ("contagem", re.compile(r"\b(?:qual (?:e )?(?:o |a )?)?(?:numero|quantidade|total) de\b|\bquant[oa]s\b"),
+     "COUNT(*)"),
+    ("renda", re.compile(r"\b(?:a )?renda\b"), "renda"),
+    ("nomes", re.compile(r"\b(?:o |os )?nomes? (?:dos |das |do |da )?\b|\bquais\b"), "nome"),
+]
+
+AGRUPAMENTO = re.compile(r"\bpor (status|genero|sexo)\b")
+
+# Palavras que podem sobrar sem mudar o sentido da pergunta.
+PALAVRAS_VAZIAS = set("""
+    a as o os e de do da dos das no na nos nas em um uma que qual quais me diga mostre liste informe
+    cliente clientes pessoa pessoas estao esta sao existem existe ha tem possuem possui
+    todos todas cadastrados cadastradas banco dados com cujo cuja por favor valor
+    """.split())
+
+class ConsultaIntencao:
+    """Resultado do interpretador: SQL parametrizado pronto para executar."""
+
+    def __init__(self, intencao, sql, parametros):
+        self.intencao = intencao
+        self.sql = sql
+        self.parametros = parametros
+
+    def __repr__(self):
+        return f"ConsultaIntencao({self.intencao!r}, {self.sql!r}, {self.parametros!r})"
+
+class InterpretadorIntencoes:
+    """Reconhece perguntas frequentes e gera o SQL sem chamar o modelo.
+
+    Palavras de agregação que sobram (como "total" ou "geral") mandam a pergunta ao modelo:
+
+    >>> interpretador = InterpretadorIntencoes()
+    >>> interpretador.interpretar("Qual a renda total?")
+    ConsultaIntencao('soma', 'SELECT SUM(renda) FROM clientes;', ())
+    >>> interpretador.interpretar("Qual o total da renda dos clientes ativos?")
+    ConsultaIntencao('soma', 'SELECT SUM(renda) FROM clientes WHERE status = %s;', ('ativo',))
+    >>> interpretador.interpretar("Qual a renda dos clientes com renda maior que 2.000,50?")
+    ConsultaIntencao('renda', 'SELECT renda FROM clientes WHERE renda > %s;', (2000.5,))
+    >>> interpretador.interpretar("Qual a renda geral?") is None
+    True
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.perguntas = 0
+        self.reconhecidas = 0
+        self.por_intencao = {}
+
+    def interpretar(self, pergunta):
+        """Retorna uma ConsultaIntencao, ou None quando não há um modelo de pergunta confiável."""
+        consulta = self._interpretar(pergunta)
+        with self._lock:
+            self.perguntas += 1
+            if consulta is not None:
+                self.reconhecidas += 1
+                self.por_intencao[consulta.intencao] = self.por_intencao.get(consulta.intencao, 0) + 1
+        return consulta
+
+    def _interpretar(self, pergunta):
+        nomes = PADRAO_NOME.findall(pergunta)
+        if len(nomes) > 1:
+            return None
+        texto = PADRAO_NOME.sub(" nomeq ", pergunta)
+
+        numeros = []
+        def trocar_numero(m):
+            bruto = m.group(0)
+            if "," in bruto:
+                bruto = bruto.replace(".", "").replace(",", ".")
+            elif re.fullmatch(r"\d{1,3}(?:\.\d{3})+", bruto):
+                bruto = bruto.replace(".", "")
+            numeros.append(float(bruto) if "." in bruto else int(bruto))
+            return f" num{len(numeros) - 1} "
+        texto = normalizar_pergunta(PADRAO_NUMERO.sub(trocar_numero, texto))
+
+        condicoes, parametros = [], []
+        colunas_filtradas = set()
+        for regex, condicao, fabrica in FILTROS:
+            m = regex.search(texto)
+            if m is None:
+                continue
+            coluna = condicao.split()[0]
+            # Dois filtros na mesma coluna (ex.: "ativos com nome sujo") são ambíguos demais.
+            if coluna in colunas_filtradas:
+                return None
+            colunas_filtradas.add(coluna)
+            valores = fabrica(m, numeros)
+            if valores is None:
+                if not nomes:
+                    return None
+                valores = (nomes[0],)
+            condicoes.append(condicao)
+            parametros.extend(valores)
+            texto = texto[:m.start()] + " " + texto[m.end():]
+            if regex.search(texto):
+                return None
+
+        agrupar = None
+        m = AGRUPAMENTO.search(texto)
+        if m:
+            agrupar = "genero" if m.group(1) == "sexo" else m.group(1)
+            texto = texto[:m.start()] + " " + texto[m.end():]
+
+        for intencao, regex, selecao in SELECOES:
+            m = regex.search(texto)
+            if m is not None:
+                texto = texto[:m.start()] + " " + texto[m.end():]
+                break
+        else:
+            return None
+        if intencao in ("renda", "nomes") and agrupar:
+            return None
+        # "Qual cliente tem a maior renda?" pede o cliente, não o valor agregado.
+        if intencao not in ("renda", "nomes") and re.search(r"\bqual (?:o )?cliente\b", texto):
+            return None
+
+        # Só é confiável se tudo o que sobrou da pergunta for palavra vazia.
+        if any(palavra not in PALAVRAS_VAZIAS for palavra in texto.split()):
+            return None
+
+        sql = f"SELECT {agrupar + ', ' if agrupar else ''}{selecao} FROM clientes"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        if agrupar:
+            sql += f" GROUP BY {agrupar}"
+        return ConsultaIntencao(intencao, sql + ";", tuple(parametros))
+
+    def estatisticas(self):
+        """Retorna quantas perguntas foram atendidas sem o modelo."""
+        with self._lock:
+            return {
+                "perguntas": self.perguntas,
+                "reconhecidas": self.reconhecidas,
+                "encaminhadas_ao_modelo": self.perguntas - self.reconhecidas,
+                "taxa_reconhecimento": self.reconhecidas / self.perguntas if self.perguntas else 0.0,
+                "por_intencao": dict(self.por_intencao),
+            }
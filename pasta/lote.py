@@ -0,0 +1,198 @@
+# lote.py
+
+import asyncio
+import csv
+import json
+import sys
+import time
+from assincrono import AgenteAssincrono, GerenciadorClientesAssincrono
+from cache import normalizar_pergunta
+
+COLUNAS_CSV = ["indice", "pergunta", "sql", "erro", "repetida", "quantidade_linhas", "linhas",
+               "segundos_traducao", "segundos_execucao", "segundos_total"]
+
+def ler_perguntas(origem):
+    """Lê as perguntas, uma por linha, de um arquivo ou da entrada padrão ('-').
+
+    Linhas vazias e comentários (começando com #) são ignorados.
+    """
+    arquivo = sys.stdin if origem == "-" else open(origem, encoding="utf-8")
+    try:
+        return [linha.strip() for linha in arquivo if linha.strip() and not linha.lstrip().startswith("#")]
+    finally:
+        if arquivo is not sys.stdin:
+            arquivo.close()
+
+class EscritorResultados:
+    """Grava os resultados em JSONL ou CSV, na ordem das perguntas de entrada."""
+
+    def __init__(self, arquivo, formato="jsonl"):
+        if formato not in ("jsonl", "csv"):
+            raise ValueError(f"Formato de saída desconhecido: {formato}")
+        self.arquivo = arquivo
+        self.formato = formato
+        self._csv = None
+        if formato == "csv":
+            self._csv = csv.DictWriter(arquivo, fieldnames=COLUNAS_CSV)
+            self._csv.writeheader()
+
+    def escrever(self, resultado):
+        if self._csv is None:
+            self.arquivo.write(json.dumps(resultado, ensure_ascii=False, default=str) + "\n")
+        else:
+            self._csv.writerow(dict(resultado, linhas=json.dumps(resultado["linhas"], ensure_ascii=False, default=str)))
+        self.arquivo.flush()
+
+class RespondedorLote:
+    """Responde uma lista de perguntas de uma vez, para relatórios offline.
+
+    Perguntas repetidas (mesma forma normalizada) são traduzidas e executadas uma só vez. As
+    traduções correm em paralelo pelo AgenteAssincrono (no máximo `traducoes_simultaneas`
+    chamadas ao modelo); com `pacote` > 1, cada chamada leva até `pacote` perguntas num único
+    prompt. O SQL passa pela `guarda` (sem confirmação interativa: acima do orçamento é recusado)
+    e roda pelo GerenciadorClientesAssincrono, no máximo `consultas_simultaneas` de cada vez
+    (padrão: o tamanho do pool de conexões). Cada resultado é gravado assim que ele e todos os
+    anteriores ficam prontos, mantendo a ordem de entrada.
+    """
+
+    def __init__(self, agente, gerenciador, guarda=None, traducoes_simultaneas=4, consultas_simultaneas=None,
+                 pacote=1, timeout=60.0):
+        self.agente = AgenteAssincrono(agente, traducoes_simultaneas, timeout)
+        self.banco = GerenciadorClientesAssincrono(gerenciador, consultas_simultaneas, timeout)
+        self.gerenciador = gerenciador
+        self.guarda = guarda
+        self.pacote = max(1, pacote)
+        self.timeout = timeout
+
+    def _executar(self, sql, params):
+        """Confere e executa o SQL no banco (roda numa thread do executor): (linhas, erro)."""
+        limite_segundos = None
+        if self.guarda is not None:
+            verificacao = self.guarda.verificar(sql, params)
+            if not verificacao.permitida:
+                return None, f"consulta recusada: {verificacao.motivo}"
+            sql, limite_segundos = verificacao.sql, self.guarda.timeout_segundos
+        linhas = self.gerenciador.executar_query(sql, params, limite_segundos=limite_segundos)
+        if linhas is None:
+            return None, "falha ao executar a consulta"
+        return [list(linha) for linha in linhas], None
+
+    async def _traduzir_pacotes(self, perguntas, traducoes):
+        """Traduz as perguntas em pacotes, resolvendo o futuro de cada uma com (sql, params, segundos)."""
+        def resolver(pergunta, resultado=None, erro=None):
+            # O futuro já pode ter sido cancelado junto com o _responder que o esperava.
+            futuro = traducoes[pergunta]
+            if not futuro.done():
+                futuro.set_result(resultado) if erro is None else futuro.set_exception(erro)
+
+        async def sozinha(pergunta, inicio):
+            try:
+                sql, params = await self.agente.traduzir(pergunta)
+            except Exception as err:
+                resolver(pergunta, erro=err)
+            else:
+                resolver(pergunta, (sql, params, time.perf_counter() - inicio))
+
+        async def traduzir(pacote):
+            inicio = time.perf_counter()
+            try:
+                resultados = await self.agente.traduzir_pacote(pacote)
+            except Exception as err:
+                print(f"Erro ao traduzir {len(pacote)} perguntas em pacote: {err}", file=sys.stderr)
+                resultados = None
+            if resultados is None:
+                # Tempo esgotado ou erro no pacote: cada pergunta é traduzida sozinha, como prometido
+                # por AgenteDeDados.traduzir_pacote para as que a resposta não traz.
+                await asyncio.gather(*(sozinha(pergunta, inicio) for pergunta in pacote))
+                return
+            segundos = time.perf_counter() - inicio
+            for pergunta, (sql, params) in zip(pacote, resultados):
+                resolver(pergunta, (sql, params, segundos))
+
+        try:
+            await asyncio.gather(*(traduzir(perguntas[inicio:inicio + self.pacote])
+                                   for inicio in range(0, len(perguntas), self.pacote)))
+        finally:
+            # Nenhum _responder pode ficar esperando por um futuro que ninguém mais vai resolver.
+            for pergunta in traducoes:
+                resolver(pergunta, erro=RuntimeError("a tradução em pacote foi interrompida"))
+
+    async def _responder(self, pergunta, traducao):
+        inicio = time.perf_counter()
+        if traducao is None:
+            sql, params = await self.agente.traduzir(pergunta)
+            segundos_traducao = time.perf_counter() - inicio
+        else:
+            sql, params, segundos_traducao = await traducao
+        linhas, erro, segundos_execucao = None, None, 0.0
+        if not sql:
+            erro = "o modelo não traduziu a pergunta"
+        else:
+            comeco = time.perf_counter()
+            executado = await self.banco.rodar(self._executar, sql, params)
+            linhas, erro = executado if executado is not None else (None, "tempo esgotado no banco")
+            segundos_execucao = time.perf_counter() - comeco
+        return {
+            "sql": sql,
+            "erro": erro,
+            "quantidade_linhas": None if linhas is None else len(linhas),
+            "linhas": linhas,
+            "segundos_traducao": segundos_traducao,
+            "segundos_execucao": segundos_execucao,
+            "segundos_total": time.perf_counter() - inicio,
+        }
+
+    async def responder_todas(self, perguntas, escritor):
+        """Responde as perguntas e grava os resultados em ordem; retorna um resumo do lote."""
+        inicio = time.perf_counter()
+        chamadas_antes = self._chamadas_ao_modelo()
+        # Repetidas são as que coincidem na chave do cache, que mantém operadores e sinais:
+        # "renda < 2000" e "renda > 2000" são perguntas distintas, "Renda > 2000?" repete a segunda.
+        chaves = [normalizar_pergunta(pergunta) for pergunta in perguntas]
+        unicas = {}
+        for pergunta, chave in zip(perguntas, chaves):
+            unicas.setdefault(chave, pergunta)
+
+        traducoes = {}
+        tarefa_pacotes = None
+        if self.pacote > 1:
+            loop = asyncio.get_running_loop()
+            traducoes = {pergunta: loop.create_future() for pergunta in unicas.values()}
+            tarefa_pacotes = asyncio.ensure_future(self._traduzir_pacotes(list(unicas.values()), traducoes))
+        tarefas = {chave: asyncio.ensure_future(self._responder(pergunta, traducoes.get(pergunta)))
+                   for chave, pergunta in unicas.items()}
+
+        vistas, erros = set(), 0
+        try:
+            for indice, (pergunta, chave) in enumerate(zip(perguntas, chaves), start=1):
+                resultado = await tarefas[chave]
+                erros += resultado["erro"] is not None
+                escritor.escrever(dict({"indice": indice, "pergunta": pergunta, "repetida": chave in vistas},
+                                       **resultado))
+                vistas.add(chave)
+            if tarefa_pacotes is not None:
+                await tarefa_pacotes
+        finally:
+            # Se uma resposta falhou, as demais tarefas (e os pacotes) são canceladas e recolhidas.
+            todas = list(tarefas.values()) + ([tarefa_pacotes] if tarefa_pacotes is not None else [])
+            for tarefa in todas:
+                tarefa.cancel()
+            await asyncio.gather(*todas, return_exceptions=True)
+
+        return {
+            "perguntas": len(perguntas),
+            "perguntas_distintas": len(unicas),
+            "com_erro": erros,
+            "chamadas_ao_modelo": self._chamadas_ao_modelo() - chamadas_antes,
+            "segundos": time.perf_counter() - inicio,
+        }
+
+    def _chamadas_ao_modelo(self):
+        return self.agente.agente.cliente.estatisticas().get("chamadas", 0)
+
+    def responder(self, perguntas, escritor):
+        try:
+            return asyncio.run(self.responder_todas(perguntas, escritor))
+        finally:
+            self.agente.fechar()
+            self.banco.fechar()
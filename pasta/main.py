@@ -1,9 +1,38 @@
 # chat_agente.py
 
-import mysql.connector
-import google.generativeai as genai
+import time
+
+# Início do processo, antes das demais importações, para o modo --medir-inicio.
+INICIO_PROCESSO = time.perf_counter()
+
+import argparse
+import contextlib
 import os
+import sys
+import threading
 from dotenv import load_dotenv
+from agente import AgenteDeDados
+from agregados import ResumoClientes
+from cache import CacheResultados, CacheTraducoes
+from database import ConexaoBancoDados, ConexaoSQLite, GerenciadorClientes
+from exemplos import BaseExemplos
+from guarda import GuardaConsultas
+from indices import AssessorIndices
+from intencoes import InterpretadorIntencoes
+from lote import EscritorResultados, RespondedorLote, ler_perguntas
+from metricas import METRICAS
+from nomes import IndiceNomes
+
+FIM_IMPORTACOES = time.perf_counter()
+
+# --- Backend de armazenamento: 'mysql' (padrão) ou 'sqlite' (embutido, sem rede) ---
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+SQLITE_CAMINHO = os.getenv("SQLITE_CAMINHO", "clientes.sqlite3")
+# Com DB_FRAGMENTOS=N (N > 1), a tabela clientes é distribuída por id entre N bancos: no SQLite,
+# arquivos derivados de SQLITE_CAMINHO (clientes.0.sqlite3, ...); no MySQL, bancos DB_DATABASE_0, ...
+DB_FRAGMENTOS = int(os.getenv("DB_FRAGMENTOS", "1"))
+# Com MOTOR_COLUNAR=1 (e o NumPy instalado), consultas analíticas são avaliadas em memória.
+MOTOR_COLUNAR = os.getenv("MOTOR_COLUNAR", "0") == "1"
 
 # --- Configurações do MySQL ---
 DB_HOST = "localhost"
@@ -11,6 +40,40 @@ DB_USER = "root"
 DB_PASSWORD = "1407"
 DB_DATABASE = "agente-ia"
 
+# Quantidade de linhas exibidas no chat antes de perguntar se deve mostrar mais.
+LINHAS_POR_PAGINA = 20
+
+# --- Guarda do SQL gerado: LIMIT padrão, orçamento de linhas examinadas e tempo máximo no banco ---
+GUARDA_LIMITE_LINHAS = int(os.getenv("GUARDA_LIMITE_LINHAS", "1000"))
+GUARDA_ORCAMENTO_LINHAS = int(os.getenv("GUARDA_ORCAMENTO_LINHAS", "1000000"))
+GUARDA_TIMEOUT_SEGUNDOS = float(os.getenv("GUARDA_TIMEOUT_SEGUNDOS", "10"))
+
+# --- Chamadas ao modelo: prazo total, tentativas em falhas passageiras, hedge e modelo reserva ---
+MODELO_PRINCIPAL = os.getenv("MODELO_PRINCIPAL", "gemini-1.5-flash")
+MODELO_RESERVA = os.getenv("MODELO_RESERVA", "gemini-1.5-flash-8b") or None
+MODELO_PRAZO_SEGUNDOS = float(os.getenv("MODELO_PRAZO_SEGUNDOS", "30"))
+MODELO_TENTATIVAS = int(os.getenv("MODELO_TENTATIVAS", "3"))
+# Com streaming, a leitura da resposta para no fim da primeira instrução SQL.
+MODELO_FLUXO = os.getenv("MODELO_FLUXO", "1") == "1"
+# Segundos sem resposta até disparar uma segunda chamada idêntica (vazio: sem hedge).
+MODELO_ATRASO_HEDGE = float(os.getenv("MODELO_ATRASO_HEDGE")) if os.getenv("MODELO_ATRASO_HEDGE") else None
+
+# Clientes inseridos na primeira execução, com a tabela vazia.
+DADOS_INICIAIS = [
+    (1, 'João da Silva', 5000.00, 'ativo', 'masculino'),
+    (2, 'Maria Souza', 1200.50, 'nome sujo', 'feminino'),
+    (3, 'Carlos Santos', 8500.75, 'ativo', 'masculino'),
+    (4, 'Ana Rodrigues', 2500.00, 'nome sujo', 'feminino'),
+    (5, 'Pedro Almeida', 3200.00, 'ativo', 'masculino'),
+    (6, 'Fernanda Lima', 900.00, 'nome sujo', 'feminino'),
+]
+
+# Arquivo SQLite onde as traduções pergunta -> SQL sobrevivem entre execuções.
+CAMINHO_CACHE_TRADUCOES = "cache_traducoes.db"
+
+# Arquivo JSONL com as traduções confirmadas pelo usuário, usadas como exemplos no prompt.
+CAMINHO_EXEMPLOS_VERIFICADOS = "exemplos_verificados.jsonl"
+
 # Carrega a chave de API do arquivo .env
 load_dotenv()
 API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -18,224 +81,288 @@ API_KEY = os.getenv("GOOGLE_API_KEY")
 if not API_KEY:
     raise ValueError("A chave de API do Google não foi encontrada. Verifique seu arquivo .env.")
 
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
+def criar_backend(fragmento=None):
+    """Backend do banco configurado; com `fragmento`, o banco daquele fragmento."""
+    if DB_BACKEND == "sqlite":
+        if fragmento is None:
+            return ConexaoSQLite(SQLITE_CAMINHO)
+        raiz, extensao = os.path.splitext(SQLITE_CAMINHO)
+        return ConexaoSQLite(f"{raiz}.{fragmento}{extensao}")
+    # Todas as operações usam o mesmo pool de conexões, em vez de uma conexão nova por chamada.
+    return ConexaoBancoDados(DB_HOST, DB_USER, DB_PASSWORD,
+                             DB_DATABASE if fragmento is None else f"{DB_DATABASE}_{fragmento}")
 
-def get_db_connection(database=None):
-    """Retorna uma nova conexão com o banco de dados MySQL."""
+if DB_FRAGMENTOS > 1:
+    # Importado só no modo fragmentado, como o motor colunar.
+    from fragmentos import BancoFragmentado
+    db = BancoFragmentado([criar_backend(i) for i in range(DB_FRAGMENTOS)])
+else:
+    db = criar_backend()
+# Leituras repetidas vêm do cache até que uma escrita do gerenciador altere a tabela.
+cache_resultados = CacheResultados()
+gerenciador = GerenciadorClientes(db, cache_resultados=cache_resultados)
+# Registra as consultas do agente para sugerir índices conforme a carga real.
+assessor_indices = AssessorIndices(gerenciador)
+# Contagens e somas de renda por status/gênero respondidas sem ler a tabela.
+resumo_clientes = ResumoClientes(gerenciador)
+# Buscas por nome (com erros de digitação) pelo índice de trigramas, resolvidas pela chave primária.
+indice_nomes = IndiceNomes(gerenciador)
+motor_colunar = None
+if MOTOR_COLUNAR:
     try:
-        conn = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=database
-        )
-        return conn
-    except mysql.connector.Error as err:
-        print(f"Erro de conexão com o MySQL: {err}")
-        return None
+        # Importado só quando ativado: o NumPy pesa no início do chat.
+        from motor_colunar import MotorColunar
+        motor_colunar = MotorColunar(gerenciador)
+    except ImportError as err:
+        print(f"Motor colunar desativado: {err}")
+
+def confirmar_consulta_cara(verificacao):
+    """Pergunta ao usuário se uma consulta acima do orçamento deve rodar mesmo assim."""
+    print(f"Agente: Esta consulta deve examinar cerca de {verificacao.linhas_estimadas} linhas"
+          f" (orçamento: {GUARDA_ORCAMENTO_LINHAS}).")
+    print(f"  SQL: {verificacao.sql}")
+    return input("Executar mesmo assim? (s/n): ").strip().lower() == 's'
+
+# O SQL gerado só roda se for um único SELECT dentro do orçamento (ou confirmado pelo usuário).
+guarda_consultas = GuardaConsultas(
+    gerenciador,
+    limite_linhas=GUARDA_LIMITE_LINHAS,
+    orcamento_linhas=GUARDA_ORCAMENTO_LINHAS,
+    timeout_segundos=GUARDA_TIMEOUT_SEGUNDOS,
+    confirmar=confirmar_consulta_cara,
+)
+
+# Perguntas repetidas são respondidas pelo cache (memória + disco) sem chamar o modelo.
+cache_traducoes = CacheTraducoes(CAMINHO_CACHE_TRADUCOES)
+# Perguntas em formatos conhecidos nem chegam ao modelo: o interpretador local gera o SQL.
+interpretador = InterpretadorIntencoes()
+# O prompt leva só os exemplos e as colunas mais relevantes para cada pergunta.
+base_exemplos = BaseExemplos(CAMINHO_EXEMPLOS_VERIFICADOS)
+agente = AgenteDeDados(API_KEY, MODELO_PRINCIPAL, cache=cache_traducoes, interpretador=interpretador,
+                       base_exemplos=base_exemplos, dialeto=db.dialeto, model_name_reserva=MODELO_RESERVA,
+                       opcoes_cliente={"prazo_segundos": MODELO_PRAZO_SEGUNDOS, "tentativas": MODELO_TENTATIVAS,
+                                       "atraso_hedge": MODELO_ATRASO_HEDGE},
+                       fluxo=MODELO_FLUXO, indice_nomes=indice_nomes)
+
+OBJETOS_PRONTOS = time.perf_counter()
+
+def get_db_connection(database=None):
+    """Retorna uma nova conexão (fora do pool) com o banco de dados."""
+    if database is None and DB_BACKEND != "sqlite":
+        return db.get_connection_no_db()
+    return db.get_connection()
 
 def configurar_banco_de_dados():
-    """Cria o banco de dados e a tabela de clientes no MySQL."""
-    conn = None
-    cursor = None
+    """Cria o banco de dados e a tabela de clientes e insere os dados iniciais (só na primeira execução)."""
+    gerenciador.configurar_tabela(dados_iniciais=DADOS_INICIAIS)
+
+def iniciar_aquecimento(tempos):
+    """Prepara o banco e o cliente do modelo em segundo plano enquanto o usuário digita.
+
+    Retorna as threads (banco, modelo). O chat espera a do banco antes do primeiro comando; a do
+    modelo não precisa de espera, pois a primeira chamada aguarda o carregamento em curso.
+    """
+    def preparar_banco():
+        inicio = time.perf_counter()
+        configurar_banco_de_dados()
+        db.aquecer()
+        tempos["banco"] = time.perf_counter() - inicio
+
+    def preparar_modelo():
+        inicio = time.perf_counter()
+        try:
+            agente.aquecer()
+        except Exception as err:
+            print(f"Aviso: não foi possível carregar o cliente do modelo: {err}", file=sys.stderr)
+        tempos["modelo"] = time.perf_counter() - inicio
+
+    banco = threading.Thread(target=preparar_banco, name="aquecer-banco", daemon=True)
+    modelo = threading.Thread(target=preparar_modelo, name="aquecer-modelo", daemon=True)
+    banco.start()
+    modelo.start()
+    return banco, modelo
+
+def medir_inicio(prompt_pronto, aquecimento, tempos):
+    """Modo --medir-inicio: espera o aquecimento e exibe quanto levou cada fase do início."""
+    for thread in aquecimento:
+        thread.join()
+    mostrar_estatisticas("Tempos do início em segundos", {
+        "importacoes": FIM_IMPORTACOES - INICIO_PROCESSO,
+        "objetos_do_chat": OBJETOS_PRONTOS - FIM_IMPORTACOES,
+        "ate_o_prompt": prompt_pronto - INICIO_PROCESSO,
+        "banco_em_segundo_plano": tempos.get("banco", 0.0),
+        "modelo_em_segundo_plano": tempos.get("modelo", 0.0),
+        "ate_tudo_pronto": time.perf_counter() - INICIO_PROCESSO,
+    })
+
+def responder_lote(origem, saida="-", formato=None, pacote=1, traducoes_simultaneas=4,
+                   consultas_simultaneas=None, resultados=None):
+    """Modo lote: responde as perguntas de um arquivo (ou da entrada padrão) e grava JSONL/CSV.
+
+    Com saida '-', os resultados vão para `resultados` (padrão: sys.stdout).
+    """
+    if formato is None:
+        formato = "csv" if saida.lower().endswith(".csv") else "jsonl"
     try:
-        conn = get_db_connection(database=None)
-        if conn is None: return
-        cursor = conn.cursor()
-        
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{DB_DATABASE}`")
-        cursor.execute(f"USE `{DB_DATABASE}`")
-
-        create_table_sql = """
-            CREATE TABLE IF NOT EXISTS clientes (
-                id INT PRIMARY KEY,
-                nome VARCHAR(255),
-                renda FLOAT,
-                status VARCHAR(50),
-                genero VARCHAR(50)
-            );
-        """
-        cursor.execute(create_table_sql)
-        conn.commit()
-    except mysql.connector.Error as err:
-        print(f"Erro ao configurar o banco de dados: {err}")
+        perguntas = ler_perguntas(origem)
+    except OSError as err:
+        print(f"Erro ao ler as perguntas: {err}", file=sys.stderr)
+        return None
+    # Sem ninguém para confirmar, consultas acima do orçamento são recusadas.
+    guarda = GuardaConsultas(gerenciador, limite_linhas=GUARDA_LIMITE_LINHAS,
+                             orcamento_linhas=GUARDA_ORCAMENTO_LINHAS, timeout_segundos=GUARDA_TIMEOUT_SEGUNDOS)
+    respondedor = RespondedorLote(agente, gerenciador, guarda, traducoes_simultaneas=traducoes_simultaneas,
+                                  consultas_simultaneas=consultas_simultaneas, pacote=pacote)
+    arquivo = (resultados or sys.stdout) if saida == "-" else open(saida, "w", encoding="utf-8", newline="")
+    try:
+        resumo = respondedor.responder(perguntas, EscritorResultados(arquivo, formato))
     finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+        if saida != "-":
+            arquivo.close()
+    print(f"{resumo['perguntas']} perguntas ({resumo['perguntas_distintas']} distintas) respondidas em "
+          f"{resumo['segundos']:.2f}s, {resumo['chamadas_ao_modelo']} chamadas ao modelo, "
+          f"{resumo['com_erro']} com erro.", file=sys.stderr)
+    return resumo
 
 def adicionar_cliente(id, nome, renda, status, genero):
     """Insere um novo cliente na tabela."""
-    conn = get_db_connection(database=DB_DATABASE)
-    if conn is None: return
-    cursor = conn.cursor()
-    try:
-        sql = "INSERT INTO clientes (id, nome, renda, status, genero) VALUES (%s, %s, %s, %s, %s)"
-        data = (id, nome, renda, status, genero)
-        cursor.execute(sql, data)
-        conn.commit()
-        print(f"Cliente '{nome}' adicionado com sucesso!")
-    except mysql.connector.Error as err:
-        print(f"Erro ao adicionar cliente: {err}")
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+    gerenciador.adicionar_cliente(id, nome, renda, status, genero)
 
 def atualizar_cliente(id, nome, renda, status, genero):
     """Atualiza os dados de um cliente existente de forma parcial."""
-    conn = get_db_connection(database=DB_DATABASE)
-    if conn is None: return
-    cursor = conn.cursor()
-    try:
-        updates = []
-        values = []
-        if nome:
-            updates.append("nome = %s")
-            values.append(nome)
-        if renda is not None:
-            updates.append("renda = %s")
-            values.append(renda)
-        if status:
-            updates.append("status = %s")
-            values.append(status)
-        if genero:
-            updates.append("genero = %s")
-            values.append(genero)
-
-        if not updates:
-            print("Nenhum campo para atualizar.")
-            return
-
-        sql = f"UPDATE clientes SET {', '.join(updates)} WHERE id = %s"
-        values.append(id)
-        cursor.execute(sql, tuple(values))
-        conn.commit()
-        print(f"Cliente de ID {id} atualizado com sucesso!")
-    except mysql.connector.Error as err:
-        print(f"Erro ao atualizar cliente: {err}")
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+    gerenciador.atualizar_cliente(id, nome, renda, status, genero)
 
 def deletar_cliente(id):
     """Deleta um cliente da tabela."""
-    conn = get_db_connection(database=DB_DATABASE)
-    if conn is None: return
-    cursor = conn.cursor()
-    try:
-        sql = "DELETE FROM clientes WHERE id = %s"
-        cursor.execute(sql, (id,))
-        conn.commit()
-        print(f"Cliente de ID {id} deletado com sucesso!")
-    except mysql.connector.Error as err:
-        print(f"Erro ao deletar cliente: {err}")
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+    gerenciador.deletar_cliente(id)
 
-def contar_clientes():
-    """Conta o número de clientes na tabela."""
-    conn = get_db_connection(database=DB_DATABASE)
-    if conn is None: return 0
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT COUNT(*) FROM clientes")
-        count = cursor.fetchone()[0]
-        return count
-    except mysql.connector.Error as err:
-        print(f"Erro ao contar clientes: {err}")
-        return 0
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+def atualizar_clientes(ids, nome, renda, status, genero):
+    """Aplica a mesma atualização parcial a vários clientes, numa única transação."""
+    return gerenciador.atualizar_clientes(ids, nome, renda, status, genero)
 
-def executar_query(query_sql):
-    """Executa uma consulta SQL no banco de dados e retorna o resultado."""
-    conn = get_db_connection(database=DB_DATABASE)
-    if conn is None: return None
-    cursor = conn.cursor()
-    try:
-        cursor.execute(query_sql)
-        return cursor.fetchall()
-    except mysql.connector.Error as err:
-        print(f"Erro ao executar a query: {err}")
-        return None
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+def deletar_clientes(ids):
+    """Deleta vários clientes numa única transação."""
+    return gerenciador.deletar_clientes(ids)
 
-def agente_gemma_com_rag(pergunta_usuario):
-    """Usa o Gemma para traduzir a pergunta para SQL com RAG."""
-    prompt = f"""
-    Você é um tradutor de perguntas em linguagem natural para consultas SQL. Sua única e estrita tarefa é converter a pergunta do usuário em uma consulta SQL válida, sem adicionar nenhum outro texto.
+def ler_ids(texto):
+    """Converte '1, 2, 5' na lista [1, 2, 5]; levanta ValueError se algum id não for inteiro."""
+    return [int(parte) for parte in texto.replace(';', ',').split(',') if parte.strip()]
 
-    Regras e Formato da Resposta:
-    1. A resposta deve conter SOMENTE a consulta SQL, sem aspas, blocos de código ou explicações.
-    2. A consulta deve ser completa e válida para o MySQL.
+def contar_clientes():
+    """Conta o número de clientes na tabela."""
+    return gerenciador.contar_clientes()
 
-    Instruções Detalhadas sobre o Banco de Dados:
-    A tabela principal que você deve usar é 'clientes'.
-    - colunas:
-      - id (INT): identificador único
-      - nome (VARCHAR(255)): nome completo do cliente
-      - renda (FLOAT): renda mensal em reais
-      - status (VARCHAR(50)): status do cliente. Os valores possíveis são 'ativo' ou 'nome sujo'.
-      - genero (VARCHAR(50)): o sexo do cliente. Os valores possíveis são 'masculino' ou 'feminino'.
+def executar_query(query_sql, params=None, usar_cache=True):
+    """Executa uma consulta SQL no banco de dados e retorna o resultado."""
+    return gerenciador.executar_query(query_sql, params, usar_cache=usar_cache)
 
-    Exemplos de Tradução:
-    - Pergunta: Qual o número de clientes com nome sujo?
-    - SQL: SELECT COUNT(*) FROM clientes WHERE status = 'nome sujo';
+def iterar_query(query_sql, params=None, usar_cache=True, limite_segundos=None):
+    """Executa uma consulta SQL e gera as linhas do resultado aos poucos."""
+    return gerenciador.iterar_query(query_sql, params, usar_cache=usar_cache, limite_segundos=limite_segundos)
 
-    - Pergunta: Qual a renda do cliente de nome 'João da Silva'?
-    - SQL: SELECT renda FROM clientes WHERE nome = 'João da Silva';
+def exibir_resultado(linhas, por_pagina=LINHAS_POR_PAGINA):
+    """Exibe as linhas à medida que chegam, pedindo confirmação a cada página."""
+    exibidas = 0
+    try:
+        for linha in linhas:
+            if exibidas == 0:
+                print("Agente: Aqui está o resultado da sua pergunta:")
+            elif exibidas % por_pagina == 0:
+                resposta = input(f"Agente: {exibidas} linhas exibidas. Mostrar mais? (s/n): ")
+                if resposta.strip().lower() != 's':
+                    break
+            print(f"    - {linha}")
+            exibidas += 1
+    finally:
+        linhas.close()
+    return exibidas
 
-    - Pergunta: Me diga o nome dos clientes que têm uma renda maior que 2000?
-    - SQL: SELECT nome FROM clientes WHERE renda > 2000;
+def importar_clientes(caminho, tamanho_lote=1000, upsert=False):
+    """Importa clientes de um arquivo CSV/JSONL e exibe o relatório da carga."""
+    relatorio = gerenciador.importar_clientes(caminho, tamanho_lote=tamanho_lote, upsert=upsert)
+    if relatorio is None:
+        return None
+    print(f"Importação concluída: {relatorio['gravadas']} gravadas, {relatorio['rejeitadas']} rejeitadas "
+          f"de {relatorio['lidas']} lidas em {relatorio['segundos']:.2f}s "
+          f"({relatorio['linhas_por_segundo']:.0f} linhas/s).")
+    for linha, motivo in relatorio["exemplos_rejeitados"]:
+        print(f"    - linha {linha}: {motivo}")
+    return relatorio
 
-    - Pergunta: Qual a média de renda de todos os clientes?
-    - SQL: SELECT AVG(renda) FROM clientes;
+def mostrar_estatisticas(titulo, stats):
+    """Exibe um dicionário de estatísticas no formato do chat."""
+    print(f"Agente: {titulo}:")
+    for chave, valor in stats.items():
+        if isinstance(valor, float):
+            valor = f"{valor:.4f}"
+        print(f"    - {chave}: {valor}")
 
-    - Pergunta: Quantos clientes do sexo masculino com nome sujo existem?
-    - SQL: SELECT COUNT(*) FROM clientes WHERE genero = 'masculino' AND status = 'nome sujo';
+def sugerir_indices():
+    """Exibe o uso das colunas nas consultas do agente e os índices propostos."""
+    mostrar_estatisticas("Uso das colunas nas consultas", assessor_indices.estatisticas())
+    propostas = assessor_indices.propor()
+    if not propostas:
+        print("Agente: Nenhum índice novo a sugerir por enquanto.")
+    for colunas in propostas:
+        print(f"    - índice sugerido: clientes ({', '.join(colunas)})")
+    return propostas
 
-    Pergunta do Usuário:
-    {pergunta_usuario}
+def aplicar_indices():
+    """Aplica os índices propostos como migração e mostra as linhas examinadas antes e depois."""
+    propostas = sugerir_indices()
+    for item in assessor_indices.aplicar(propostas):
+        print(f"    - {item['sql']}: {item['linhas_antes']} -> {item['linhas_depois']} linhas examinadas (estimativa)")
 
-    Sua Resposta (APENAS o código SQL):
-    """
-    
-    try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
-        print(f"Erro na API do Gemma: {e}")
-        return None
+def agente_gemma_com_rag(pergunta_usuario):
+    """Usa o Gemma para traduzir a pergunta para SQL com RAG."""
+    return agente.traduzir_para_sql(pergunta_usuario)
 
-def iniciar_chat():
+def iniciar_chat(aquecimento_banco=None):
     print("Olá! Sou um agente de IA para o banco de dados de clientes.")
     print("Você pode me fazer perguntas, como 'Quantos estão com o nome sujo?'.")
     print("Para adicionar um cliente, digite 'adicionar cliente'.")
     print("Para atualizar um cliente, digite 'atualizar cliente'.")
     print("Para deletar um cliente, digite 'deletar cliente'.")
+    print("Para alterar ou deletar vários clientes de uma vez, digite 'atualizar clientes' ou 'deletar clientes'.")
+    print("Para importar clientes de um arquivo CSV/JSONL, digite 'importar clientes'.")
+    print("Para ver o uso do pool de conexões, digite 'estatisticas pool'.")
+    if DB_FRAGMENTOS > 1:
+        print("Para ver o tempo de cada fragmento nas consultas, digite 'estatisticas fragmentos'.")
+    print("Para ver o uso do cache de traduções, digite 'estatisticas cache'.")
+    print("Para ver quantas perguntas dispensaram o modelo, digite 'estatisticas intencoes'.")
+    print("Para ver o uso do cache de resultados, digite 'estatisticas resultados'.")
+    print("Para ver a economia de tokens do prompt, digite 'estatisticas prompt'.")
+    print("Para ver as consultas respondidas pelo resumo de agregados, digite 'estatisticas resumo'.")
+    print("Para ver as buscas e correções do índice de nomes, digite 'estatisticas nomes'.")
+    if motor_colunar is not None:
+        print("Para ver a memória e a latência do motor colunar, digite 'estatisticas motor'.")
+    print("Para ver as consultas recusadas ou limitadas pela guarda, digite 'estatisticas guarda'.")
+    print("Para ver as falhas, novas tentativas e o circuito das chamadas ao modelo, digite 'estatisticas modelo'.")
+    print("Para medir o tempo de cada etapa, digite 'metricas ligar'; depois 'metricas' (JSON),")
+    print("'metricas prometheus' ou 'consultas lentas'.")
+    print("Para ver os índices sugeridos pela carga de perguntas, digite 'sugerir indices' (ou 'aplicar indices').")
+    print("Se a última resposta do modelo estiver correta, digite 'resposta correta' para guardá-la como exemplo.")
     print("Digite 'sair' para terminar.")
     print("-" * 50)
+
+    # Última tradução feita pelo modelo, que o usuário pode confirmar como exemplo.
+    ultima_traducao = None
     
     while True:
         pergunta = input("Você: ")
         comando = pergunta.lower().strip()
+        if aquecimento_banco is not None:
+            # Normalmente já terminou enquanto o usuário digitava.
+            aquecimento_banco.join()
+            aquecimento_banco = None
         
         # Lógica para orientar o usuário
         if comando.startswith('atualize') or comando.startswith('mude') or comando.startswith('altere'):
             print("Agente: Para atualizar um cliente, por favor, digite o comando 'atualizar cliente'.")
             print("-" * 50)
             continue
-        elif comando.startswith('deletar') or comando.startswith('remova') or comando.startswith('apague'):
+        elif ((comando.startswith('deletar') and comando not in ('deletar cliente', 'deletar clientes'))
+              or comando.startswith('remova') or comando.startswith('apague')):
             print("Agente: Para deletar um cliente, por favor, digite o comando 'deletar cliente'.")
             print("-" * 50)
             continue
@@ -248,6 +375,104 @@ def iniciar_chat():
         if comando == 'sair':
             print("Até a próxima!")
             break
+        elif comando == 'estatisticas pool':
+            mostrar_estatisticas("Estatísticas do pool de conexões", db.estatisticas_pool())
+            print("-" * 50)
+            continue
+        elif comando == 'estatisticas fragmentos' and DB_FRAGMENTOS > 1:
+            mostrar_estatisticas("Consultas por fragmento", db.estatisticas_fragmentos())
+            print("-" * 50)
+            continue
+        elif comando == 'estatisticas cache':
+            mostrar_estatisticas("Estatísticas do cache de traduções", cache_traducoes.estatisticas())
+            print("-" * 50)
+            continue
+        elif comando == 'estatisticas intencoes':
+            mostrar_estatisticas("Perguntas atendidas sem o modelo", interpretador.estatisticas())
+            print("-" * 50)
+            continue
+        elif comando == 'estatisticas resultados':
+            mostrar_estatisticas("Estatísticas do cache de resultados", cache_resultados.estatisticas())
+            print("-" * 50)
+            continue
+        elif comando == 'estatisticas prompt':
+            mostrar_estatisticas("Tokens estimados do prompt", agente.estatisticas_prompt())
+            print("-" * 50)
+            continue
+        elif comando == 'estatisticas resumo':
+            mostrar_estatisticas("Resumo de agregados por status e gênero", resumo_clientes.estatisticas())
+            print("-" * 50)
+            continue
+        elif comando == 'estatisticas nomes':
+            mostrar_estatisticas("Índice de nomes", indice_nomes.estatisticas())
+            print("-" * 50)
+            continue
+        elif comando == 'estatisticas motor' and motor_colunar is not None:
+            mostrar_estatisticas("Motor colunar em memória", motor_colunar.estatisticas())
+            print("-" * 50)
+            continue
+        elif comando in ('metricas ligar', 'metricas desligar'):
+            if comando == 'metricas ligar':
+                METRICAS.ligar()
+            else:
+                METRICAS.desligar()
+            print(f"Agente: Métricas {'ligadas' if METRICAS.habilitado else 'desligadas'}.")
+            print("-" * 50)
+            continue
+        elif comando == 'metricas':
+            print(METRICAS.exportar_json())
+            print("-" * 50)
+            continue
+        elif comando == 'metricas prometheus':
+            print(METRICAS.exportar_prometheus(), end="")
+            print("-" * 50)
+            continue
+        elif comando == 'consultas lentas':
+            lentas = METRICAS.consultas_lentas()
+            if not lentas:
+                print(f"Agente: Nenhuma consulta levou mais de {METRICAS.limite_lento}s"
+                      f"{'' if METRICAS.habilitado else ' (as métricas estão desligadas)'}.")
+            for consulta in lentas:
+                print(f"  [{consulta['quando']}] {consulta['segundos'] * 1000:.1f} ms: {consulta['sql']}"
+                      f"{' ' + str(consulta['params']) if consulta['params'] else ''}")
+            print("-" * 50)
+            continue
+        elif comando == 'estatisticas modelo':
+            mostrar_estatisticas("Chamadas ao modelo", agente.cliente.estatisticas())
+            print("-" * 50)
+            continue
+        elif comando == 'estatisticas guarda':
+            mostrar_estatisticas("Guarda do SQL gerado", guarda_consultas.estatisticas())
+            print("-" * 50)
+            continue
+        elif comando == 'resposta correta':
+            if ultima_traducao:
+                agente.registrar_resposta_verificada(*ultima_traducao)
+                print("Agente: Obrigado! A tradução foi guardada como exemplo.")
+                ultima_traducao = None
+            else:
+                print("Agente: Não há uma tradução recente do modelo para guardar.")
+            print("-" * 50)
+            continue
+        elif comando == 'sugerir indices':
+            sugerir_indices()
+            print("-" * 50)
+            continue
+        elif comando == 'aplicar indices':
+            aplicar_indices()
+            print("-" * 50)
+            continue
+        elif comando == 'importar clientes':
+            try:
+                caminho = input("Caminho do arquivo (.csv ou .jsonl): ").strip()
+                tamanho_lote_str = input("Linhas por transação (padrão 1000): ").strip()
+                tamanho_lote = int(tamanho_lote_str) if tamanho_lote_str else 1000
+                upsert = input("Atualizar clientes com ID já existente? (s/n): ").strip().lower() == 's'
+                importar_clientes(caminho, tamanho_lote=tamanho_lote, upsert=upsert)
+            except ValueError:
+                print("Entrada inválida. O tamanho do lote deve ser um número inteiro.")
+            print("-" * 50)
+            continue
         elif comando == 'adicionar cliente':
             try:
                 novo_id = int(input("Digite o ID: "))
@@ -283,31 +508,76 @@ def iniciar_chat():
             print("-" * 50)
             continue
 
+        elif comando == 'atualizar clientes':
+            try:
+                ids = ler_ids(input("Digite os IDs dos clientes, separados por vírgula: "))
+                print("Digite as novas informações (deixe em branco para campos que não irá mudar):")
+                novo_nome = input("Novo nome: ") or None
+                nova_renda_str = input("Nova renda: ") or None
+                novo_status = input("Novo status ('ativo' ou 'nome sujo'): ") or None
+                novo_genero = input("Novo gênero ('masculino' ou 'feminino'): ") or None
+                nova_renda = float(nova_renda_str.replace(',', '.')) if nova_renda_str else None
+                atualizar_clientes(ids, novo_nome, nova_renda, novo_status, novo_genero)
+            except ValueError:
+                print("Entrada inválida. Os IDs e a renda devem ser números.")
+            print("-" * 50)
+            continue
+        elif comando == 'deletar clientes':
+            try:
+                deletar_clientes(ler_ids(input("Digite os IDs dos clientes, separados por vírgula: ")))
+            except ValueError:
+                print("Entrada inválida. Os IDs devem ser números inteiros.")
+            print("-" * 50)
+            continue
+
         # Lógica para perguntas que usam o agente de IA
-        query_sql = agente_gemma_com_rag(pergunta)
+        with METRICAS.medir("chat.traduzir"):
+            query_sql, params = agente.traduzir(pergunta, resolver_nomes=False)
+        ultima_traducao = (pergunta, query_sql) if query_sql and params is None else None
+        # O exemplo guardado leva o filtro por nome; a consulta executada, os ids do índice de nomes.
+        query_sql, params = agente.resolver_nomes(query_sql, params)
         
-        if query_sql:
-            resultado = executar_query(query_sql)
-            if resultado:
-                print("Agente: Aqui está o resultado da sua pergunta:")
-                for linha in resultado:
-                    print(f"    - {linha}")
-            else:
+        verificacao = guarda_consultas.verificar(query_sql, params) if query_sql else None
+        if verificacao is not None and not verificacao.permitida:
+            print(f"Agente: Não executei a consulta: {verificacao.motivo}.")
+            print(f"  SQL: {query_sql}")
+        elif query_sql:
+            assessor_indices.registrar(verificacao.sql, params)
+            linhas = iterar_query(verificacao.sql, params, limite_segundos=guarda_consultas.timeout_segundos)
+            if not exibir_resultado(linhas):
                 print("Agente: Não foi possível obter os dados. Verifique a query ou o banco.")
         else:
             print("Agente: Desculpe, não entendi a pergunta ou houve um erro. Tente ser mais específico.")
 
 if __name__ == "__main__":
-    configurar_banco_de_dados()
-    if contar_clientes() == 0:
-        print("Tabela de clientes vazia. Adicionando dados iniciais...")
-        adicionar_cliente(1, 'João da Silva', 5000.00, 'ativo', 'masculino')
-        adicionar_cliente(2, 'Maria Souza', 1200.50, 'nome sujo', 'feminino')
-        adicionar_cliente(3, 'Carlos Santos', 8500.75, 'ativo', 'masculino')
-        adicionar_cliente(4, 'Ana Rodrigues', 2500.00, 'nome sujo', 'feminino')
-        adicionar_cliente(5, 'Pedro Almeida', 3200.00, 'ativo', 'masculino')
-        adicionar_cliente(6, 'Fernanda Lima', 900.00, 'nome sujo', 'feminino')
+    # O banco é preparado (DDL e dados iniciais só na primeira execução) e o cliente do modelo
+    # carregado em segundo plano; o prompt aparece sem esperar por eles.
+    parser = argparse.ArgumentParser(description="Agente de IA para o banco de dados de clientes.")
+    parser.add_argument("--medir-inicio", action="store_true", help="mede o tempo de cada fase do início e sai")
+    parser.add_argument("--lote", metavar="ARQUIVO",
+                        help="responde as perguntas do arquivo (uma por linha; '-' para a entrada padrão) e sai")
+    parser.add_argument("--saida", default="-", help="arquivo de resultados do modo lote (padrão: saída padrão)")
+    parser.add_argument("--formato", choices=("jsonl", "csv"), default=None,
+                        help="formato dos resultados (padrão: pela extensão da saída, senão jsonl)")
+    parser.add_argument("--pacote", type=int, default=1, help="perguntas por chamada ao modelo no modo lote")
+    parser.add_argument("--traducoes-simultaneas", type=int, default=4)
+    parser.add_argument("--consultas-simultaneas", type=int, default=None,
+                        help="padrão: o tamanho máximo do pool de conexões")
+    args = parser.parse_args()
+
+    tempos_aquecimento = {}
+    if args.lote:
+        # No modo lote a saída padrão é só dos resultados: do aquecimento ao fim do lote, as
+        # mensagens dos módulos (inclusive as das threads) vão para stderr.
+        resultados = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            aquecimento = iniciar_aquecimento(tempos_aquecimento)
+            aquecimento[0].join()
+            responder_lote(args.lote, args.saida, args.formato, args.pacote, args.traducoes_simultaneas,
+                           args.consultas_simultaneas, resultados=resultados)
     else:
-        print("Tabela de clientes já contém dados. Pulando a inserção inicial.")
-    
-    iniciar_chat()
\ No newline at end of file
+        aquecimento = iniciar_aquecimento(tempos_aquecimento)
+        if args.medir_inicio:
+            medir_inicio(time.perf_counter(), aquecimento, tempos_aquecimento)
+        else:
+            iniciar_chat(aquecimento_banco=aquecimento[0])
\ No newline at end of file
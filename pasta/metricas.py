@@ -0,0 +1,218 @@
+# metricas.py
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Limites (em segundos) das faixas dos histogramas exportados para o Prometheus.
+FAIXAS_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class GanchoSpans:
+    """Interface para rastrear as etapas medidas (ex.: um adaptador para OpenTelemetry).
+
+    `iniciar` é chamado ao entrar no span e `finalizar` ao sair, com a exceção que o encerrou
+    (ou None). O span traz nome, atributos, pai (o span externo da mesma thread), início e,
+    ao finalizar, a duração em segundos.
+    """
+
+    def iniciar(self, span):
+        pass
+
+    def finalizar(self, span, erro):
+        pass
+
+class _SemMedicao:
+    """Span nulo devolvido com as métricas desligadas: entrar e sair não custam nada."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, erro, rastreio):
+        return False
+
+    def anotar(self, **atributos):
+        pass
+
+SEM_MEDICAO = _SemMedicao()
+
+class Span:
+    """Uma etapa medida; use `with metricas.medir("nome") as span:`."""
+
+    __slots__ = ("metricas", "nome", "atributos", "pai", "inicio", "segundos")
+
+    def __init__(self, metricas, nome, atributos):
+        self.metricas = metricas
+        self.nome = nome
+        self.atributos = atributos
+        self.pai = None
+        self.inicio = None
+        self.segundos = None
+
+    def anotar(self, **atributos):
+        self.atributos.update(atributos)
+
+    def __enter__(self):
+        local = self.metricas._local
+        self.pai = getattr(local, "atual", None)
+        local.atual = self
+        self.inicio = time.perf_counter()
+        for gancho in self.metricas.ganchos:
+            gancho.iniciar(self)
+        return self
+
+    def __exit__(self, tipo, erro, rastreio):
+        self.segundos = time.perf_counter() - self.inicio
+        self.metricas._local.atual = self.pai
+        self.metricas.observar(self.nome, self.segundos, erro=tipo is not None)
+        for gancho in self.metricas.ganchos:
+            gancho.finalizar(self, erro)
+        return False
+
+class Metricas:
+    """Tempos por etapa, contadores e log de consultas lentas do caminho de uma pergunta.
+
+    Desligadas, `medir` devolve um span nulo e `contar`/`registrar_consulta` retornam de
+    imediato. Ligadas, cada etapa acumula contagem, soma, máximo, erros e um histograma,
+    exportáveis em JSON ou no formato texto do Prometheus.
+    """
+
+    def __init__(self, habilitado=False, limite_lento=0.5, max_lentas=100):
+        self.habilitado = habilitado
+        self.limite_lento = limite_lento
+        self.ganchos = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._etapas = {}       # nome -> [contagem, soma, máximo, erros, contagens por faixa]
+        self._contadores = {}
+        self._lentas = deque(maxlen=max_lentas)
+
+    def ligar(self):
+        self.habilitado = True
+
+    def desligar(self):
+        self.habilitado = False
+
+    def adicionar_gancho(self, gancho):
+        """Registra um GanchoSpans avisado de cada span medido."""
+        self.ganchos.append(gancho)
+
+    def medir(self, nome, **atributos):
+        """Span que mede o bloco `with`; nulo se as métricas estiverem desligadas."""
+        if not self.habilitado:
+            return SEM_MEDICAO
+        return Span(self, nome, atributos)
+
+    def observar(self, nome, segundos, erro=False):
+        """Acumula uma duração já medida para a etapa."""
+        if not self.habilitado:
+            return
+        with self._lock:
+            etapa = self._etapas.get(nome)
+            if etapa is None:
+                etapa = self._etapas[nome] = [0, 0.0, 0.0, 0, [0] * len(FAIXAS_SEGUNDOS)]
+            etapa[0] += 1
+            etapa[1] += segundos
+            etapa[2] = max(etapa[2], segundos)
+            if erro:
+                etapa[3] += 1
+            for i, limite in enumerate(FAIXAS_SEGUNDOS):
+                if segundos <= limite:
+                    etapa[4][i] += 1
+                    break
+
+    def contar(self, nome, quantidade=1):
+        if not self.habilitado:
+            return
+        with self._lock:
+            self._contadores[nome] = self._contadores.get(nome, 0) + quantidade
+
+    def registrar_consulta(self, sql, params, segundos):
+        """Guarda no log de consultas lentas as que levaram pelo menos `limite_lento` segundos."""
+        if not self.habilitado or segundos < self.limite_lento:
+            return
+        with self._lock:
+            self._lentas.append({
+                "quando": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "segundos": segundos,
+                "sql": " ".join(sql.split()),
+                "params": None if params is None else [str(p) for p in params],
+            })
+        self.contar("consultas_lentas")
+
+    def consultas_lentas(self):
+        with self._lock:
+            return list(self._lentas)
+
+    def zerar(self):
+        with self._lock:
+            self._etapas.clear()
+            self._contadores.clear()
+            self._lentas.clear()
+
+    def retrato(self):
+        """Estado atual das métricas em um dicionário serializável."""
+        with self._lock:
+            return {
+                "habilitado": self.habilitado,
+                "etapas": {
+                    nome: {
+                        "contagem": contagem,
+                        "total_s": soma,
+                        "media_ms": soma / contagem * 1000 if contagem else 0.0,
+                        "max_ms": maximo * 1000,
+                        "erros": erros,
+                    }
+                    for nome, (contagem, soma, maximo, erros, _) in sorted(self._etapas.items())
+                },
+                "contadores": dict(sorted(self._contadores.items())),
+                "consultas_lentas": list(self._lentas),
+            }
+
+    def exportar_json(self):
+        return json.dumps(self.retrato(), ensure_ascii=False, indent=2)
+
+    def exportar_prometheus(self):
+        """Métricas no formato texto de exposição do Prometheus."""
+        with self._lock:
+            etapas = {nome: (c, s, m, e, list(f)) for nome, (c, s, m, e, f) in sorted(self._etapas.items())}
+            contadores = dict(sorted(self._contadores.items()))
+        linhas = [
+            "# HELP agente_etapa_segundos Duração das etapas do caminho de uma pergunta.",
+            "# TYPE agente_etapa_segundos histogram",
+        ]
+        for nome, (contagem, soma, _, _, faixas) in etapas.items():
+            acumulado = 0
+            for limite, quantidade in zip(FAIXAS_SEGUNDOS, faixas):
+                acumulado += quantidade
+                linhas.append(f'agente_etapa_segundos_bucket{{etapa="{nome}",le="{limite}"}} {acumulado}')
+            linhas.append(f'agente_etapa_segundos_bucket{{etapa="{nome}",le="+Inf"}} {contagem}')
+            linhas.append(f'agente_etapa_segundos_sum{{etapa="{nome}"}} {soma}')
+            linhas.append(f'agente_etapa_segundos_count{{etapa="{nome}"}} {contagem}')
+        linhas += ["# HELP agente_etapa_erros_total Etapas encerradas por exceção.",
+                   "# TYPE agente_etapa_erros_total counter"]
+        linhas += [f'agente_etapa_erros_total{{etapa="{nome}"}} {erros}' for nome, (_, _, _, erros, _) in etapas.items()]
+        linhas += ["# HELP agente_eventos_total Contadores de eventos (acertos de cache, consultas lentas...).",
+                   "# TYPE agente_eventos_total counter"]
+        linhas += [f'agente_eventos_total{{evento="{nome}"}} {valor}' for nome, valor in contadores.items()]
+        return "\n".join(linhas) + "\n"
+
+# Instância usada pelos módulos do projeto; ligue com METRICAS=1 ou pelo comando 'metricas ligar'.
+METRICAS = Metricas(
+    habilitado=os.getenv("METRICAS", "0") == "1",
+    limite_lento=float(os.getenv("METRICAS_LIMITE_LENTO", "0.5")),
+)
+
+def cronometrado(nome):
+    """Decorador que mede cada chamada da função como um span `nome`."""
+    def decorar(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if not METRICAS.habilitado:
+                return funcao(*args, **kwargs)
+            with Span(METRICAS, nome, {}):
+                return funcao(*args, **kwargs)
+        return medida
+    return decorar
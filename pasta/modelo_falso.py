@@ -0,0 +1,122 @@
+# modelo_falso.py
+
+import random
+import re
+import threading
+import time
+from cache import normalizar_pergunta
+from cliente_modelo import ErroModelo
+
+# Regras do modelo falso: (trechos que a pergunta normalizada precisa conter, SQL respondido).
+RESPOSTAS_PADRAO = [
+    (("nome sujo", "masculino"),
+     "SELECT COUNT(*) FROM clientes WHERE genero = 'masculino' AND status = 'nome sujo';"),
+    (("nome sujo",), "SELECT COUNT(*) FROM clientes WHERE status = 'nome sujo';"),
+    (("media", "renda"), "SELECT AVG(renda) FROM clientes;"),
+    (("renda maior",), "SELECT nome FROM clientes WHERE renda > 2000;"),
+    (("renda", "nome"), "SELECT renda FROM clientes WHERE nome = 'João da Silva';"),
+]
+SQL_PADRAO = "SELECT COUNT(*) FROM clientes;"
+# Conversa que modelos reais costumam acrescentar depois do SQL.
+COMENTARIO_PADRAO = ("\n\nEssa consulta considera todos os clientes cadastrados na tabela. Se quiser, posso "
+                     "filtrar por status, gênero ou faixa de renda, ou ordenar o resultado de outra forma.")
+
+PADRAO_PERGUNTA = re.compile(r"Pergunta do Usuário:\s*(.*?)\s*Sua Resposta", re.S)
+# Prompt com várias perguntas numeradas (PROMPT_PACOTE do agente).
+PADRAO_PERGUNTAS = re.compile(r"Perguntas do Usuário:\s*(.*?)\s*Suas Respostas", re.S)
+
+class RespostaFalsa:
+    """Imita a resposta do genai: o texto gerado fica em `text`."""
+
+    def __init__(self, text):
+        self.text = text
+
+class ModeloFalso:
+    """Substituto local e determinístico do genai.GenerativeModel, para benchmarks sem rede.
+
+    Responde com o SQL da primeira regra cujos trechos aparecem na pergunta do prompt, depois
+    de esperar `latencia` segundos mais um acréscimo uniforme de até `variacao` segundos
+    (sorteado com a `semente`, para que duas execuções esperem o mesmo).
+
+    Para exercitar o ClienteModelo, o modelo também injeta falhas: as `falhas_iniciais`
+    primeiras chamadas e uma fração `taxa_erros` das demais levantam ErroModelo com um dos
+    `codigos_erro` (429, 503...); uma fração `taxa_travamentos` demora `travamento` segundos.
+
+    A resposta pode vir numa cerca de código (`cercas`) e seguida de um `comentario`, como a de
+    um modelo real. Com stream=True ela chega em pedaços (uma palavra cada), um a cada
+    `latencia_pedaco` segundos depois da `latencia` inicial; sem streaming, a chamada espera a
+    resposta inteira.
+    """
+
+    def __init__(self, latencia=0.0, variacao=0.0, respostas=RESPOSTAS_PADRAO, padrao=SQL_PADRAO, semente=0,
+                 taxa_erros=0.0, codigos_erro=(429, 503), falhas_iniciais=0, taxa_travamentos=0.0, travamento=5.0,
+                 latencia_pedaco=0.0, comentario="", cercas=False):
+        self.latencia = latencia
+        self.variacao = variacao
+        self.respostas = respostas
+        self.padrao = padrao
+        self.taxa_erros = taxa_erros
+        self.codigos_erro = codigos_erro
+        self.falhas_iniciais = falhas_iniciais
+        self.taxa_travamentos = taxa_travamentos
+        self.travamento = travamento
+        self.latencia_pedaco = latencia_pedaco
+        self.comentario = comentario
+        self.cercas = cercas
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+        self.chamadas = 0
+        self.erros = 0
+        self.travamentos = 0
+
+    def responder(self, prompt):
+        """SQL que o modelo falso dá para o prompt, sem esperar.
+
+        Para um prompt de perguntas numeradas, responde uma linha "N. SQL" por pergunta.
+        """
+        m = PADRAO_PERGUNTAS.search(prompt)
+        if m:
+            numeradas = re.findall(r"^\s*(\d+)\.\s*(.+?)\s*$", m.group(1), re.M)
+            return "\n".join(f"{numero}. {self._sql_da_pergunta(pergunta)}" for numero, pergunta in numeradas)
+        m = PADRAO_PERGUNTA.search(prompt)
+        return self._sql_da_pergunta(m.group(1) if m else prompt)
+
+    def _sql_da_pergunta(self, pergunta):
+        pergunta = normalizar_pergunta(pergunta)
+        for trechos, sql in self.respostas:
+            if all(trecho in pergunta for trecho in trechos):
+                return sql
+        return self.padrao
+
+    def texto_completo(self, prompt):
+        """Resposta inteira, com a cerca e o comentário configurados."""
+        sql = self.responder(prompt)
+        return (f"```sql\n{sql}\n```" if self.cercas else sql) + self.comentario
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.chamadas += 1
+            espera = self.latencia + (self._aleatorio.uniform(0, self.variacao) if self.variacao else 0.0)
+            codigo = None
+            if self.chamadas <= self.falhas_iniciais or (self.taxa_erros and self._aleatorio.random() < self.taxa_erros):
+                codigo = self._aleatorio.choice(self.codigos_erro)
+                self.erros += 1
+            elif self.taxa_travamentos and self._aleatorio.random() < self.taxa_travamentos:
+                espera += self.travamento
+                self.travamentos += 1
+        if espera > 0:
+            time.sleep(espera)
+        if codigo is not None:
+            raise ErroModelo(f"erro {codigo} simulado pelo modelo falso", codigo)
+        pedacos = re.findall(r"\s*\S+", self.texto_completo(prompt))
+        if stream:
+            return self._em_pedacos(pedacos)
+        if self.latencia_pedaco:
+            time.sleep(self.latencia_pedaco * len(pedacos))
+        return RespostaFalsa("".join(pedacos))
+
+    def _em_pedacos(self, pedacos):
+        for pedaco in pedacos:
+            if self.latencia_pedaco:
+                time.sleep(self.latencia_pedaco)
+            yield RespostaFalsa(pedaco)
@@ -0,0 +1,595 @@
+# motor_colunar.py
+
+import math
+import re
+import sys
+import threading
+import time
+from agregados import sem_caixa, separar_literais
+
+try:
+    import numpy as np
+except ImportError:
+    # O NumPy é opcional: sem ele o motor não é criado e as consultas vão todas para o banco.
+    np = None
+
+COLUNAS = ("id", "nome", "renda", "status", "genero")
+COLUNAS_TEXTO = ("nome", "status", "genero")
+
+PADRAO_CONSULTA = re.compile(
+    r"^select (?P<selecao>.+?) from clientes"
+    r"(?: where (?P<filtros>.+?))?"
+    r"(?: group by (?P<grupo>.+?))?"
+    r"(?: order by (?P<ordem>.+?))?"
+    r"(?: limit (?P<limite>\d+))?$"
+)
+VALOR = r"\x00\d+|-?\d+(?:\.\d+)?"
+PADRAO_COMPARACAO = re.compile(rf"^(\w+) (=|<>|!=|<=|>=|<|>) ({VALOR})$")
+PADRAO_ENTRE = re.compile(rf"^(\w+) between ({VALOR}) __e__ ({VALOR})$")
+PADRAO_EM = re.compile(rf"^(\w+) (not )?in \( ((?:{VALOR})(?: , (?:{VALOR}))*) \)$")
+PADRAO_NULO = re.compile(r"^(\w+) is (not )?null$")
+PADRAO_AGREGADO = re.compile(r"^(count|sum|avg|min|max) \( (\*|\w+) \)(?: as (\w+))?$")
+PADRAO_COLUNA = re.compile(r"^(\*|\w+)(?: as (\w+))?$")
+PADRAO_ORDEM = re.compile(r"^(.+?)(?: (asc|desc))?$")
+
+class ConsultaNaoSuportada(Exception):
+    """A consulta está fora do subconjunto que o motor avalia; ela segue para o banco."""
+
+def _crescer(array, capacidade, preenchimento):
+    novo = np.full(capacidade, preenchimento, dtype=array.dtype)
+    novo[:len(array)] = array
+    return novo
+
+def _ordenar_linhas(linhas, indice, decrescente):
+    # Como nos bancos: NULL primeiro na ordem crescente e por último na decrescente.
+    return sorted(linhas, key=lambda linha: (linha[indice] is not None, linha[indice] or 0), reverse=decrescente)
+
+class Colunas:
+    """Cópia colunar da tabela clientes: uma posição por linha, com as removidas marcadas.
+
+    renda fica em float64 (NaN para NULL); nome, status e genero viram códigos inteiros para
+    listas de valores distintos, com os textos internados.
+    """
+
+    def __init__(self, chave, capacidade=1024):
+        self.chave = chave
+        self.ids = np.zeros(capacidade, dtype=np.int64)
+        self.renda = np.full(capacidade, np.nan)
+        self.codigos = {
+            "nome": np.full(capacidade, -1, dtype=np.int32),
+            "status": np.full(capacidade, -1, dtype=np.int16),
+            "genero": np.full(capacidade, -1, dtype=np.int16),
+        }
+        self.vivas = np.zeros(capacidade, dtype=bool)
+        self.valores = {coluna: [] for coluna in COLUNAS_TEXTO}         # código -> valor
+        self.codigo_de = {coluna: {} for coluna in COLUNAS_TEXTO}       # valor -> código
+        self.por_chave = {coluna: {} for coluna in COLUNAS_TEXTO}       # chave de comparação -> códigos
+        self.representante = {coluna: [] for coluna in COLUNAS_TEXTO}   # código -> código do seu grupo
+        self.tamanho = 0
+        self.removidas = 0
+        self.posicao = {}
+        # Carregada em ordem de id e só com inserções de ids maiores, dispensa ordenar as projeções.
+        self.ordenada = True
+
+    def __len__(self):
+        return self.tamanho - self.removidas
+
+    def codificar(self, coluna, valor):
+        if valor is None:
+            return -1
+        codigo = self.codigo_de[coluna].get(valor)
+        if codigo is None:
+            codigo = len(self.valores[coluna])
+            self.valores[coluna].append(sys.intern(valor) if isinstance(valor, str) else valor)
+            self.codigo_de[coluna][valor] = codigo
+            iguais = self.por_chave[coluna].setdefault(self.chave(valor) if isinstance(valor, str) else valor, [])
+            self.representante[coluna].append(iguais[0] if iguais else codigo)
+            iguais.append(codigo)
+            if codigo > np.iinfo(self.codigos[coluna].dtype).max:
+                self.codigos[coluna] = self.codigos[coluna].astype(np.int32)
+        return codigo
+
+    def _garantir_capacidade(self, extra):
+        necessaria = self.tamanho + extra
+        if necessaria <= len(self.ids):
+            return
+        capacidade = max(necessaria, 2 * len(self.ids))
+        self.ids = _crescer(self.ids, capacidade, 0)
+        self.renda = _crescer(self.renda, capacidade, np.nan)
+        self.vivas = _crescer(self.vivas, capacidade, False)
+        for coluna in COLUNAS_TEXTO:
+            self.codigos[coluna] = _crescer(self.codigos[coluna], capacidade, -1)
+
+    def acrescentar(self, linhas):
+        """Acrescenta linhas (id, nome, renda, status, genero) de ids ainda ausentes."""
+        if not linhas:
+            return
+        self._garantir_capacidade(len(linhas))
+        inicio, fim = self.tamanho, self.tamanho + len(linhas)
+        ids = np.fromiter((linha[0] for linha in linhas), dtype=np.int64, count=len(linhas))
+        if self.ordenada and ((inicio and ids[0] <= self.ids[inicio - 1]) or np.any(np.diff(ids) <= 0)):
+            self.ordenada = False
+        self.ids[inicio:fim] = ids
+        self.renda[inicio:fim] = [math.nan if linha[2] is None else linha[2] for linha in linhas]
+        for indice, coluna in ((1, "nome"), (3, "status"), (4, "genero")):
+            self.codigos[coluna][inicio:fim] = [self.codificar(coluna, linha[indice]) for linha in linhas]
+        self.vivas[inicio:fim] = True
+        self.posicao.update(zip(ids.tolist(), range(inicio, fim)))
+        self.tamanho = fim
+
+    def alterar(self, linha):
+        posicao = self.posicao.get(linha[0])
+        if posicao is None:
+            self.acrescentar([linha])
+            return
+        self.renda[posicao] = math.nan if linha[2] is None else linha[2]
+        for indice, coluna in ((1, "nome"), (3, "status"), (4, "genero")):
+            self.codigos[coluna][posicao] = self.codificar(coluna, linha[indice])
+
+    def remover(self, id):
+        posicao = self.posicao.pop(id, None)
+        if posicao is None:
+            return
+        self.vivas[posicao] = False
+        self.removidas += 1
+        if self.removidas > 1024 and self.removidas > self.tamanho // 4:
+            self.compactar()
+
+    def compactar(self):
+        """Descarta as posições removidas (os textos distintos continuam no dicionário)."""
+        vivas = np.flatnonzero(self.vivas[:self.tamanho])
+        self.ids = self.ids[vivas]
+        self.renda = self.renda[vivas]
+        for coluna in COLUNAS_TEXTO:
+            self.codigos[coluna] = self.codigos[coluna][vivas]
+        self.vivas = np.ones(len(vivas), dtype=bool)
+        self.tamanho = len(vivas)
+        self.removidas = 0
+        self.posicao = dict(zip(self.ids.tolist(), range(self.tamanho)))
+
+    def bytes(self):
+        """Memória aproximada: arrays (com a capacidade reservada) mais os textos distintos."""
+        total = self.ids.nbytes + self.renda.nbytes + self.vivas.nbytes
+        total += sum(codigos.nbytes for codigos in self.codigos.values())
+        for coluna in COLUNAS_TEXTO:
+            total += sum(sys.getsizeof(valor) for valor in self.valores[coluna])
+            total += sys.getsizeof(self.codigo_de[coluna])
+        return total
+
+class MotorColunar:
+    """Responde SELECTs analíticos sobre uma cópia colunar da tabela clientes, com NumPy.
+
+    Registra-se como observador e respondedor do GerenciadorClientes: a cópia é carregada no
+    primeiro uso (ou em `carregar`), acompanha as escritas do gerenciador e avalia de forma
+    vetorizada SELECTs com projeções, COUNT/SUM/AVG/MIN/MAX, filtros com AND (comparações,
+    BETWEEN, IN, IS NULL), GROUP BY status/genero, ORDER BY de uma expressão e LIMIT. O resto
+    segue para o banco.
+    """
+
+    def __init__(self, gerenciador, tamanho_lote=10000, tentativas_carga=3):
+        if np is None:
+            raise ImportError("O MotorColunar precisa do NumPy (pip install numpy).")
+        self.gerenciador = gerenciador
+        self.tamanho_lote = tamanho_lote
+        self.tentativas_carga = tentativas_carga
+        self.mysql = gerenciador.db_conn.dialeto == "MySQL"
+        # No MySQL, textos são comparados e agrupados sem diferença de caixa e de acentos.
+        self._chave = sem_caixa if self.mysql else (lambda valor: valor)
+        self._lock = threading.Lock()
+        self._colunas = Colunas(self._chave)
+        self._versao = None
+        self.respondidas = 0
+        self.encaminhadas = 0
+        self.segundos_respondidas = 0.0
+        self.cargas = 0
+        self.segundos_carga = 0.0
+        gerenciador.adicionar_observador(self)
+        gerenciador.adicionar_respondedor(self)
+
+    # --- carga e atualização ----------------------------------------------------------------
+
+    def carregar(self):
+        """Carrega a tabela nas colunas. Retorna False se não conseguir uma leitura estável."""
+        db = self.gerenciador.db_conn
+        for _ in range(self.tentativas_carga):
+            inicio = time.perf_counter()
+            versao = self.gerenciador.versao_tabela
+            colunas = Colunas(self._chave, capacidade=1024)
+            with db.conexao() as conn:
+                if conn is None: return False
+                cursor = db.cursor_streaming(conn)
+                try:
+                    cursor.execute("SELECT id, nome, renda, status, genero FROM clientes ORDER BY id")
+                    while True:
+                        linhas = cursor.fetchmany(self.tamanho_lote)
+                        if not linhas:
+                            break
+                        colunas.acrescentar(linhas)
+                except db.Erro as err:
+                    print(f"Erro ao carregar o motor colunar: {err}")
+                    return False
+                finally:
+                    cursor.close()
+            with self._lock:
+                # Uma escrita confirmada durante a leitura pode ou não estar nela; lê de novo.
+                if self.gerenciador.versao_tabela != versao:
+                    continue
+                self._colunas = colunas
+                self._versao = versao
+                self.cargas += 1
+                self.segundos_carga += time.perf_counter() - inicio
+                return True
+        return False
+
+    def _aplicar(self, versao, funcao, argumento):
+        with self._lock:
+            if self._versao is None or versao <= self._versao:
+                return
+            funcao(argumento)
+
+    def ao_inserir(self, versao, linha):
+        self._aplicar(versao, self._colunas.alterar, linha)
+
+    def ao_atualizar(self, versao, antes, depois):
+        self._aplicar(versao, self._colunas.alterar, depois)
+
+    def ao_deletar(self, versao, antes):
+        self._aplicar(versao, self._colunas.remover, antes[0])
+
+    # --- interpretação ----------------------------------------------------------------------
+
+    def interpretar(self, sql, params=None):
+        """Reconhece um SELECT avaliável pelo motor e o decompõe; retorna None se não for."""
+        texto, valores = separar_literais(sql, params)
+        if texto is None:
+            return None
+        texto = texto.replace("< =", "<=").replace("> =", ">=").replace("! =", "!=").replace("< >", "<>")
+        m = PADRAO_CONSULTA.match(texto)
+        if m is None:
+            return None
+        try:
+            agrupamento = [coluna.strip() for coluna in m.group("grupo").split(",")] if m.group("grupo") else []
+            if any(coluna not in ("status", "genero") for coluna in agrupamento):
+                return None
+            selecao, apelidos = self._interpretar_selecao(m.group("selecao"), agrupamento)
+            filtros = self._interpretar_filtros(m.group("filtros"), valores) if m.group("filtros") else []
+            ordem = self._interpretar_ordem(m.group("ordem"), selecao, apelidos) if m.group("ordem") else None
+        except ConsultaNaoSuportada:
+            return None
+        return {
+            "selecao": selecao,
+            "filtros": filtros,
+            "agrupamento": agrupamento,
+            "ordem": ordem,
+            "limite": int(m.group("limite")) if m.group("limite") else None,
+        }
+
+    def _interpretar_selecao(self, texto, agrupamento):
+        selecao, apelidos = [], {}
+        for item in texto.split(" , "):
+            agregado = PADRAO_AGREGADO.match(item)
+            coluna = PADRAO_COLUNA.match(item)
+            if agregado:
+                funcao, alvo, apelido = agregado.groups()
+                if alvo == "*" and funcao != "count" or alvo not in COLUNAS + ("*",):
+                    raise ConsultaNaoSuportada(item)
+                # SUM/AVG de id vêm como DECIMAL no MySQL e MIN/MAX de texto dependem da collation.
+                if funcao in ("sum", "avg") and alvo != "renda" or funcao in ("min", "max") and alvo in COLUNAS_TEXTO:
+                    raise ConsultaNaoSuportada(item)
+                expressao = ("agregado", funcao, alvo)
+            elif coluna and coluna.group(1) == "*" and not coluna.group(2):
+                selecao += [("coluna", nome) for nome in COLUNAS]
+                continue
+            elif coluna and coluna.group(1) in COLUNAS:
+                _, apelido = coluna.groups()
+                expressao = ("coluna", coluna.group(1))
+            else:
+                raise ConsultaNaoSuportada(item)
+            apelidos[item.split(" as ")[0]] = len(selecao)
+            if apelido:
+                apelidos[apelido] = len(selecao)
+            selecao.append(expressao)
+
+        tem_agregado = any(tipo == "agregado" for tipo, *_ in selecao)
+        colunas_soltas = [alvo for tipo, alvo, *_ in selecao if tipo == "coluna"]
+        if agrupamento or tem_agregado:
+            # Fora do GROUP BY, uma coluna junto de agregados tem valor indefinido.
+            if any(coluna not in agrupamento for coluna in colunas_soltas):
+                raise ConsultaNaoSuportada("coluna fora do agrupamento")
+        return selecao, apelidos
+
+    def _valor(self, token, valores):
+        if token.startswith("\x00"):
+            return valores[int(token[1:])]
+        return float(token) if "." in token else int(token)
+
+    def _interpretar_filtros(self, texto, valores):
+        # O AND de um BETWEEN não separa predicados.
+        texto = re.sub(rf"\bbetween ({VALOR}) and ", r"between \1 __e__ ", texto)
+        if re.search(r"\bor\b|\bnot (?!in\b|null\b)|\blike\b", texto):
+            raise ConsultaNaoSuportada(texto)
+        filtros = []
+        for condicao in texto.split(" and "):
+            if m := PADRAO_COMPARACAO.match(condicao):
+                filtros.append((m.group(1), m.group(2).replace("!=", "<>"), [self._valor(m.group(3), valores)]))
+            elif m := PADRAO_ENTRE.match(condicao):
+                filtros.append((m.group(1), "between", [self._valor(m.group(2), valores), self._valor(m.group(3), valores)]))
+            elif m := PADRAO_EM.match(condicao):
+                filtros.append((m.group(1), "not in" if m.group(2) else "in",
+                                [self._valor(token, valores) for token in m.group(3).split(" , ")]))
+            elif m := PADRAO_NULO.match(condicao):
+                filtros.append((m.group(1), "is not null" if m.group(2) else "is null", []))
+            else:
+                raise ConsultaNaoSuportada(condicao)
+            coluna, operador, argumentos = filtros[-1]
+            if coluna not in COLUNAS:
+                raise ConsultaNaoSuportada(coluna)
+            if coluna in COLUNAS_TEXTO:
+                if operador not in ("=", "<>", "in", "not in", "is null", "is not null"):
+                    raise ConsultaNaoSuportada(condicao)
+                if not all(isinstance(argumento, str) for argumento in argumentos):
+                    raise ConsultaNaoSuportada(condicao)
+            else:
+                try:
+                    filtros[-1] = (coluna, operador, [float(argumento) for argumento in argumentos])
+                except (TypeError, ValueError):
+                    raise ConsultaNaoSuportada(condicao)
+                # No MySQL, renda FLOAT guarda uma aproximação: a igualdade com o literal pode falhar lá.
+                if self.mysql and coluna == "renda" and operador in ("=", "<>", "in", "not in"):
+                    raise ConsultaNaoSuportada(condicao)
+        return filtros
+
+    def _interpretar_ordem(self, texto, selecao, apelidos):
+        if " , " in texto:
+            raise ConsultaNaoSuportada(texto)
+        expressao, direcao = PADRAO_ORDEM.match(texto).groups()
+        decrescente = direcao == "desc"
+        if expressao in apelidos:
+            return ("selecao", apelidos[expressao], decrescente)
+        if expressao in COLUNAS and not any(tipo == "agregado" for tipo, *_ in selecao):
+            return ("coluna", expressao, decrescente)
+        raise ConsultaNaoSuportada(texto)
+
+    # --- avaliação --------------------------------------------------------------------------
+
+    def _mascara(self, colunas, filtros):
+        n = colunas.tamanho
+        mascara = colunas.vivas[:n].copy()
+        for coluna, operador, argumentos in filtros:
+            if coluna in COLUNAS_TEXTO:
+                codigos = colunas.codigos[coluna][:n]
+                if operador in ("is null", "is not null"):
+                    parte = codigos == -1
+                    mascara &= parte if operador == "is null" else ~parte
+                    continue
+                aceitos = [codigo for argumento in argumentos
+                           for codigo in colunas.por_chave[coluna].get(self._chave(argumento), [])]
+                parte = np.isin(codigos, aceitos)
+                mascara &= parte if operador in ("=", "in") else ~parte & (codigos != -1)
+                continue
+
+            valores = colunas.ids[:n] if coluna == "id" else colunas.renda[:n]
+            if operador in ("is null", "is not null"):
+                parte = np.isnan(valores) if coluna == "renda" else np.zeros(n, dtype=bool)
+                mascara &= parte if operador == "is null" else ~parte
+                continue
+            if operador == "between":
+                parte = (valores >= argumentos[0]) & (valores <= argumentos[1])
+            elif operador in ("in", "not in"):
+                parte = np.isin(valores, argumentos)
+                if operador == "not in":
+                    parte = ~parte
+            else:
+                parte = {"=": np.equal, "<>": np.not_equal, "<": np.less, "<=": np.less_equal,
+                         ">": np.greater, ">=": np.greater_equal}[operador](valores, argumentos[0])
+            if coluna == "renda":
+                # NaN <> x daria verdadeiro; em SQL, NULL não satisfaz nenhuma comparação.
+                parte &= ~np.isnan(valores)
+            mascara &= parte
+        return mascara
+
+    def _texto(self, colunas, coluna, codigos):
+        valores = colunas.valores[coluna]
+        return [valores[codigo] if codigo >= 0 else None for codigo in codigos.tolist()]
+
+    def _projetar(self, colunas, consulta, posicoes):
+        if consulta["ordem"] is not None:
+            tipo, alvo, decrescente = consulta["ordem"]
+            if tipo == "selecao":
+                alvo = consulta["selecao"][alvo][1]
+            if alvo in COLUNAS_TEXTO:
+                # Posto de cada texto distinto na ordem dos textos; NULL fica com -1.
+                valores = colunas.valores[alvo]
+                postos = np.zeros(len(valores) + 1, dtype=np.int64)
+                postos[sorted(range(len(valores)), key=lambda codigo: self._chave(valores[codigo]))] = np.arange(len(valores))
+                codigos = colunas.codigos[alvo][posicoes]
+                chave = np.where(codigos >= 0, postos[np.maximum(codigos, 0)], -1).astype(float)
+                nulos = codigos < 0
+            else:
+                chave = (colunas.ids if alvo == "id" else colunas.renda)[posicoes].astype(float)
+                nulos = np.isnan(chave)
+            chave = np.where(nulos, 0.0, chave)
+            if decrescente:
+                ordem = np.lexsort((-chave, nulos))
+            else:
+                ordem = np.lexsort((chave, ~nulos))
+            posicoes = posicoes[ordem]
+        if consulta["limite"] is not None:
+            posicoes = posicoes[:consulta["limite"]]
+
+        saida = []
+        for _, coluna in consulta["selecao"]:
+            if coluna == "id":
+                saida.append(colunas.ids[posicoes].tolist())
+            elif coluna == "renda":
+                saida.append([None if valor != valor else valor for valor in colunas.renda[posicoes].tolist()])
+            else:
+                saida.append(self._texto(colunas, coluna, colunas.codigos[coluna][posicoes]))
+        return list(zip(*saida))
+
+    def _agregar(self, colunas, funcao, alvo, posicoes, grupos, quantidade):
+        """Calcula um agregado para cada grupo (grupos[i] = grupo da posição i)."""
+        if funcao == "count":
+            if alvo == "renda":
+                posicoes_validas = ~np.isnan(colunas.renda[posicoes])
+            elif alvo in COLUNAS_TEXTO:
+                posicoes_validas = colunas.codigos[alvo][posicoes] >= 0
+            else:
+                posicoes_validas = np.ones(len(posicoes), dtype=bool)
+            return [int(n) for n in np.bincount(grupos, weights=posicoes_validas, minlength=quantidade)]
+
+        valores = (colunas.ids if alvo == "id" else colunas.renda)[posicoes].astype(float)
+        validos = ~np.isnan(valores)
+        contagens = np.bincount(grupos[validos], minlength=quantidade)
+        if funcao in ("sum", "avg"):
+            somas = np.bincount(grupos[validos], weights=valores[validos], minlength=quantidade)
+            resultado = somas if funcao == "sum" else somas / np.maximum(contagens, 1)
+        else:
+            ordem = np.argsort(grupos[validos], kind="stable")
+            ordenados = valores[validos][ordem]
+            inicios = np.searchsorted(grupos[validos][ordem], np.arange(quantidade))
+            resultado = np.zeros(quantidade)
+            com_valores = contagens > 0
+            if com_valores.any():
+                reduzir = np.minimum if funcao == "min" else np.maximum
+                resultado[com_valores] = reduzir.reduceat(ordenados, inicios[com_valores])
+        convertido = [None if contagens[i] == 0 else float(resultado[i]) for i in range(quantidade)]
+        if alvo == "id":
+            convertido = [None if valor is None else int(valor) for valor in convertido]
+        return convertido
+
+    def _agrupar(self, colunas, consulta, posicoes):
+        agrupamento = consulta["agrupamento"]
+        if agrupamento:
+            combinado = np.zeros(len(posicoes), dtype=np.int64)
+            for coluna in agrupamento:
+                # Códigos de textos iguais pela collation caem no mesmo grupo.
+                representante = np.asarray(colunas.representante[coluna] or [0], dtype=np.int64)
+                codigos = colunas.codigos[coluna][posicoes].astype(np.int64)
+                codigos = np.where(codigos >= 0, representante[np.maximum(codigos, 0)], -1)
+                combinado = combinado * (len(colunas.valores[coluna]) + 1) + codigos + 1
+            chaves, grupos = np.unique(combinado, return_inverse=True)
+            quantidade = len(chaves)
+            # Uma posição de exemplo por grupo fornece os valores das colunas agrupadas.
+            exemplos = posicoes[np.unique(grupos, return_index=True)[1]] if quantidade else posicoes[:0]
+        else:
+            grupos = np.zeros(len(posicoes), dtype=np.int64)
+            quantidade = 1
+            exemplos = None
+
+        colunas_saida = []
+        for tipo, *resto in consulta["selecao"]:
+            if tipo == "coluna":
+                colunas_saida.append(self._texto(colunas, resto[0], colunas.codigos[resto[0]][exemplos]))
+            else:
+                colunas_saida.append(self._agregar(colunas, resto[0], resto[1], posicoes, grupos, quantidade))
+        linhas = list(zip(*colunas_saida))
+
+        if consulta["ordem"] is not None:
+            _, indice, decrescente = consulta["ordem"]
+            linhas = _ordenar_linhas(linhas, indice, decrescente)
+        elif agrupamento:
+            # Sem ORDER BY, os bancos devolvem os grupos na ordem das colunas agrupadas.
+            chaves_grupo = [self._texto(colunas, coluna, colunas.codigos[coluna][exemplos]) for coluna in agrupamento]
+            ordem = sorted(range(quantidade), key=lambda i: [(valores[i] is not None, self._chave(valores[i]) or "")
+                                                               for valores in chaves_grupo])
+            linhas = [linhas[i] for i in ordem]
+        if consulta["limite"] is not None:
+            linhas = linhas[:consulta["limite"]]
+        return linhas
+
+    def _avaliar(self, consulta):
+        colunas = self._colunas
+        posicoes = np.flatnonzero(self._mascara(colunas, consulta["filtros"]))
+        if consulta["agrupamento"] or any(tipo == "agregado" for tipo, *_ in consulta["selecao"]):
+            return self._agrupar(colunas, consulta, posicoes)
+        if consulta["ordem"] is None and not colunas.ordenada:
+            posicoes = posicoes[np.argsort(colunas.ids[posicoes], kind="stable")]
+        return self._projetar(colunas, consulta, posicoes)
+
+    def responder(self, sql, params=None):
+        """Retorna as linhas da consulta avaliadas pelo motor, ou None para seguir ao banco."""
+        inicio = time.perf_counter()
+        consulta = self.interpretar(sql, params)
+        if consulta is None or (self._versao is None and not self.carregar()):
+            with self._lock:
+                self.encaminhadas += 1
+            return None
+        with self._lock:
+            try:
+                linhas = self._avaliar(consulta)
+            except ConsultaNaoSuportada:
+                self.encaminhadas += 1
+                return None
+            self.respondidas += 1
+            self.segundos_respondidas += time.perf_counter() - inicio
+        return linhas
+
+    def percentis(self, percentuais, filtros_sql=None, params=None):
+        """Percentis da renda, opcionalmente filtrada: percentis([50, 90], "status = %s", ("ativo",))."""
+        sql = "SELECT renda FROM clientes" + (f" WHERE {filtros_sql}" if filtros_sql else "")
+        consulta = self.interpretar(sql, params)
+        if consulta is None:
+            print(f"Filtro não suportado pelo motor colunar: {filtros_sql}")
+            return None
+        if self._versao is None and not self.carregar():
+            return None
+        with self._lock:
+            colunas = self._colunas
+            renda = colunas.renda[np.flatnonzero(self._mascara(colunas, consulta["filtros"]))]
+            renda = renda[~np.isnan(renda)]
+        if not len(renda):
+            return {p: None for p in percentuais}
+        return dict(zip(percentuais, (float(valor) for valor in np.percentile(renda, percentuais))))
+
+    def comparar(self, sql, params=None, repeticoes=5):
+        """Mede a mesma consulta no motor e no banco (sem cache): latências medianas e se os resultados batem."""
+        if self.interpretar(sql, params) is None:
+            return None
+        tempos_motor, tempos_banco = [], []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            do_motor = self.responder(sql, params)
+            tempos_motor.append(time.perf_counter() - inicio)
+            inicio = time.perf_counter()
+            do_banco = self.gerenciador.executar_query(sql, params, usar_cache=False)
+            tempos_banco.append(time.perf_counter() - inicio)
+        mediana = lambda tempos: sorted(tempos)[len(tempos) // 2] * 1000
+        return {
+            "motor_ms": mediana(tempos_motor),
+            "banco_ms": mediana(tempos_banco),
+            "aceleracao": mediana(tempos_banco) / mediana(tempos_motor) if mediana(tempos_motor) else None,
+            "resultados_iguais": self._iguais(do_motor, do_banco),
+        }
+
+    @staticmethod
+    def _iguais(a, b):
+        if a is None or b is None or len(a) != len(b):
+            return False
+        for linha_a, linha_b in zip(a, b):
+            for x, y in zip(linha_a, linha_b):
+                if isinstance(x, float) and isinstance(y, (int, float)):
+                    if not math.isclose(x, y, rel_tol=1e-6, abs_tol=1e-6):
+                        return False
+                elif x != y:
+                    return False
+        return True
+
+    def estatisticas(self):
+        with self._lock:
+            colunas = self._colunas
+            linhas = len(colunas)
+            memoria = colunas.bytes()
+            return {
+                "carregado": self._versao is not None,
+                "linhas": linhas,
+                "posicoes_removidas": colunas.removidas,
+                "bytes": memoria,
+                "bytes_por_linha": memoria / linhas if linhas else 0.0,
+                "nomes_distintos": len(colunas.valores["nome"]),
+                "cargas": self.cargas,
+                "segundos_carga": self.segundos_carga,
+                "respondidas": self.respondidas,
+                "encaminhadas_ao_banco": self.encaminhadas,
+                "latencia_media_ms": self.segundos_respondidas / self.respondidas * 1000 if self.respondidas else 0.0,
+            }
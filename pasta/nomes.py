@@ -0,0 +1,370 @@
+# nomes.py
+
+import math
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from agregados import sem_caixa
+from metricas import METRICAS
+
+# Filtro por nome no SQL gerado: nome = '...', nome = %s ou nome LIKE '...'. Os literais
+# entram na alternância para que um "nome = " dentro de uma string não seja confundido.
+PADRAO_FILTRO_NOME = re.compile(
+    r"'(?:[^']|'')*'|%s"
+    r"|\b(?P<tabela>\w+\.)?nome\s*(?P<operador>=|like)\s*(?P<valor>'(?:[^']|'')*'|%s)",
+    re.I,
+)
+
+def normalizar_nome(nome):
+    """Forma de comparação dos nomes: sem acentos, sem caixa e com pontuação e espaços colapsados."""
+    return re.sub(r"[^0-9a-z]+", " ", sem_caixa(nome) or "").strip()
+
+# As palavras se repetem muito entre os nomes; os trigramas de cada uma são calculados uma vez.
+@lru_cache(maxsize=65536)
+def trigramas(texto):
+    """Trigramas de um nome ou palavra normalizados, com espaços nas bordas para valorizar o início e o fim."""
+    return trigramas_internos(f"  {texto} ")
+
+def dice(a, b):
+    """Coeficiente de Dice entre dois conjuntos de trigramas."""
+    return 2 * len(a & b) / (len(a) + len(b))
+
+def similaridade(procurado, palavras, nome):
+    """Semelhança entre o nome procurado (já normalizado, com `palavras` = seus trigramas por palavra) e outro.
+
+    É o coeficiente de Dice entre os trigramas dos nomes inteiros; com o mesmo número de
+    palavras, fica na média com o Dice palavra a palavra, para que 'Santos Souza' fique mais
+    perto de 'Santos Sozua' do que de 'Souza Santos'.
+    """
+    if nome == procurado:
+        return 1.0
+    inteiro = dice(trigramas(procurado), trigramas(nome))
+    outras = nome.split()
+    if len(outras) != len(palavras):
+        return inteiro
+    por_palavra = sum(dice(proprios, trigramas(outra)) for proprios, outra in zip(palavras, outras)) / len(palavras)
+    return (inteiro + por_palavra) / 2
+
+def trigramas_internos(texto):
+    """Trigramas do texto sem as bordas: todos aparecem nos trigramas de um nome que o contém."""
+    return frozenset(texto[i:i + 3] for i in range(len(texto) - 2))
+
+class IndiceNomes:
+    """Índice de trigramas sobre clientes.nome, para buscas por nome sem ler a tabela.
+
+    Registra-se como observador do GerenciadorClientes e é montado da tabela no primeiro uso (ou
+    em `reconstruir`). Os trigramas indexam o vocabulário das palavras dos nomes, bem menor que
+    a tabela; cada palavra aponta para os nomes que a contêm. `buscar` corrige cada palavra da
+    busca pelo vocabulário, junta os nomes a partir da palavra mais rara e ordena os candidatos
+    pela semelhança com o nome inteiro, ignorando acentos e caixa. `reescrever` troca os filtros
+    por nome do SQL gerado pelo modelo por `id IN (...)`, que o banco resolve pela chave primária.
+    """
+
+    def __init__(self, gerenciador, similaridade_minima=0.5, similaridade_palavra=0.3, maximo_ids=100,
+                 tentativas_reconstrucao=3):
+        self.gerenciador = gerenciador
+        # Similaridade de Dice entre os trigramas abaixo da qual um nome não é sugerido.
+        self.similaridade_minima = similaridade_minima
+        # Limiar mais baixo para as palavras: um erro de digitação pesa mais numa palavra curta.
+        self.similaridade_palavra = similaridade_palavra
+        # Filtros que casam com mais ids do que isso ficam como estão: o IN não ajudaria o banco.
+        self.maximo_ids = maximo_ids
+        self.tentativas_reconstrucao = tentativas_reconstrucao
+        self._lock = threading.Lock()
+        self._nomes = {}                # id -> nome normalizado
+        self._ids = {}                  # nome normalizado -> ids
+        self._nomes_com_palavra = {}    # palavra -> nomes normalizados que a contêm
+        self._trigramas = {}            # trigrama -> palavras do vocabulário
+        self._tamanhos = {}             # palavra -> quantidade de trigramas
+        self._versao = None             # versão da tabela refletida no índice; None = ainda não montado
+        self.buscas = {"exatas": 0, "aproximadas": 0, "padroes": 0, "sem_resultado": 0}
+        self.reescritas = 0
+        self.reconstrucoes = 0
+        gerenciador.adicionar_observador(self)
+
+    # --- manutenção -------------------------------------------------------------------------
+
+    def reconstruir(self):
+        """Monta o índice a partir da tabela. Retorna False se não conseguir uma leitura estável."""
+        db = self.gerenciador.db_conn
+        for _ in range(self.tentativas_reconstrucao):
+            versao = self.gerenciador.versao_tabela
+            with db.conexao() as conn:
+                if conn is None: return False
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("SELECT id, nome FROM clientes")
+                    linhas = cursor.fetchall()
+                except db.Erro as err:
+                    print(f"Erro ao montar o índice de nomes: {err}")
+                    return False
+                finally:
+                    cursor.close()
+            with self._lock:
+                # Uma escrita confirmada durante a leitura pode ou não estar nela; lê de novo.
+                if self.gerenciador.versao_tabela != versao:
+                    continue
+                self._nomes, self._ids, self._nomes_com_palavra, self._trigramas, self._tamanhos = {}, {}, {}, {}, {}
+                for id, nome in linhas:
+                    self._incluir(id, nome)
+                self._versao = versao
+                self.reconstrucoes += 1
+                return True
+        return False
+
+    def _incluir(self, id, nome):
+        if nome is None:
+            return
+        normalizado = normalizar_nome(nome)
+        self._nomes[id] = normalizado
+        ids = self._ids.get(normalizado)
+        if ids is not None:
+            ids.add(id)
+            return
+        self._ids[normalizado] = {id}
+        for palavra in set(normalizado.split()):
+            nomes = self._nomes_com_palavra.get(palavra)
+            if nomes is None:
+                nomes = self._nomes_com_palavra[palavra] = set()
+                proprios = trigramas(palavra)
+                self._tamanhos[palavra] = len(proprios)
+                for trigrama in proprios:
+                    self._trigramas.setdefault(trigrama, set()).add(palavra)
+            nomes.add(normalizado)
+
+    def _retirar(self, id):
+        normalizado = self._nomes.pop(id, None)
+        if normalizado is None:
+            return
+        ids = self._ids[normalizado]
+        ids.discard(id)
+        if ids:
+            return
+        # Último cliente com esse nome: o nome sai das palavras, e as palavras sem nomes, do vocabulário.
+        del self._ids[normalizado]
+        for palavra in set(normalizado.split()):
+            nomes = self._nomes_com_palavra[palavra]
+            nomes.discard(normalizado)
+            if nomes:
+                continue
+            del self._nomes_com_palavra[palavra], self._tamanhos[palavra]
+            for trigrama in trigramas(palavra):
+                palavras = self._trigramas[trigrama]
+                palavras.discard(palavra)
+                if not palavras:
+                    del self._trigramas[trigrama]
+
+    def _aplicar(self, versao, antes, depois):
+        with self._lock:
+            # Antes de montado não há o que atualizar; escritas já lidas na montagem são ignoradas.
+            if self._versao is None or versao <= self._versao:
+                return
+            if antes is not None:
+                self._retirar(antes[0])
+            if depois is not None:
+                self._incluir(depois[0], depois[1])
+
+    def ao_inserir(self, versao, linha):
+        self._aplicar(versao, None, linha)
+
+    def ao_atualizar(self, versao, antes, depois):
+        if antes[1] != depois[1]:
+            self._aplicar(versao, antes, depois)
+
+    def ao_deletar(self, versao, antes):
+        self._aplicar(versao, antes, None)
+
+    def _montado(self):
+        return self._versao is not None or self.reconstruir()
+
+    # --- buscas -----------------------------------------------------------------------------
+
+    def ids_com_nome(self, nome):
+        """Ids cujo nome é igual ao dado, sem acentos e sem caixa (None se o índice não montar)."""
+        if not self._montado():
+            return None
+        with self._lock:
+            return sorted(self._ids.get(normalizar_nome(nome), ()))
+
+    def _palavras_parecidas(self, palavra):
+        """Palavras do vocabulário que podem ser a dada: ela mesma, se existir, ou as parecidas."""
+        if palavra in self._nomes_com_palavra:
+            return {palavra}
+        consulta = trigramas(palavra)
+        tamanho = len(consulta)
+        minimo = self.similaridade_palavra
+        # Dice = 2c / (n + m) >= s exige ao menos ceil(s * n / (2 - s)) trigramas em comum.
+        comuns_minimos = max(1, math.ceil(minimo * tamanho / (2 - minimo)))
+        comuns = Counter()
+        for trigrama in consulta:
+            comuns.update(self._trigramas.get(trigrama, ()))
+        return {outra for outra, quantidade in comuns.items()
+                if quantidade >= comuns_minimos and 2 * quantidade / (tamanho + self._tamanhos[outra]) >= minimo}
+
+    def buscar(self, nome, limite=10, similaridade_minima=None):
+        """Retorna [(id, similaridade)] dos nomes mais parecidos, do mais ao menos parecido.
+
+        Nomes iguais ao procurado (sem acentos e sem caixa) têm similaridade 1.0 e vêm primeiro
+        (ver `similaridade`). Retorna None se o índice não puder ser montado.
+        """
+        if similaridade_minima is None:
+            similaridade_minima = self.similaridade_minima
+        if not self._montado():
+            return None
+        inicio = time.perf_counter()
+        procurado = normalizar_nome(nome)
+        palavras = [trigramas(palavra) for palavra in procurado.split()]
+        with self._lock:
+            grupos = []
+            for palavra in dict.fromkeys(procurado.split()):
+                parecidas = self._palavras_parecidas(palavra)
+                if parecidas:
+                    grupos.append((sum(len(self._nomes_com_palavra[outra]) for outra in parecidas), parecidas))
+            candidatos = ()
+            if grupos:
+                # Parte da palavra mais rara e exige das demais ao menos uma forma parecida no nome;
+                # se nenhum nome tiver todas, fica com os da palavra mais rara.
+                grupos.sort(key=lambda grupo: grupo[0])
+                candidatos = set().union(*(self._nomes_com_palavra[outra] for outra in grupos[0][1]))
+                completos = candidatos
+                for _, parecidas in grupos[1:]:
+                    # A interseção percorre o menor conjunto: custa o tamanho dos candidatos, não o da palavra.
+                    completos = set().union(*(completos & self._nomes_com_palavra[outra] for outra in parecidas))
+                candidatos = completos or candidatos
+            pontuados = []
+            for candidato in candidatos:
+                semelhanca = similaridade(procurado, palavras, candidato)
+                if semelhanca >= similaridade_minima:
+                    pontuados.append((semelhanca, candidato))
+            pontuados.sort(key=lambda item: (-item[0], item[1]))
+            resultado = []
+            for semelhanca, candidato in pontuados:
+                resultado.extend((id, semelhanca) for id in sorted(self._ids[candidato]))
+                if len(resultado) >= limite:
+                    break
+        resultado = resultado[:limite]
+        METRICAS.observar("nomes.buscar", time.perf_counter() - inicio)
+        self._contar("sem_resultado" if not resultado else "exatas" if resultado[0][1] == 1.0 else "aproximadas")
+        return resultado
+
+    def buscar_padrao(self, padrao):
+        """Ids cujo nome casa com um padrão do LIKE feito só de texto e '%' (ex.: '%silva%').
+
+        Retorna None quando o padrão não dá para resolver pelo índice (tem '_', escapes ou
+        nenhum trecho de palavra com três letras) ou o índice não pôde ser montado.
+        """
+        if "_" in padrao or "\\" in padrao:
+            return None
+        trechos = [normalizar_nome(trecho) for trecho in padrao.split("%")]
+        pedacos = {pedaco for trecho in trechos for pedaco in trecho.split() if len(pedaco) >= 3}
+        if not pedacos or not self._montado():
+            return None
+        # O padrão inteiro vira uma expressão regular sobre o nome normalizado.
+        regex = re.compile(".*".join(re.escape(trecho) for trecho in trechos) + r"\Z")
+        with self._lock:
+            # Cada pedaço está dentro de uma palavra do nome; basta partir do pedaço mais raro.
+            menor = None
+            for pedaco in pedacos:
+                listas = [self._trigramas.get(trigrama, set()) for trigrama in trigramas_internos(pedaco)]
+                palavras = [palavra for palavra in set.intersection(*listas) if pedaco in palavra]
+                tamanho = sum(len(self._nomes_com_palavra[palavra]) for palavra in palavras)
+                if menor is None or tamanho < menor[0]:
+                    menor = (tamanho, palavras)
+            candidatos = set().union(*(self._nomes_com_palavra[palavra] for palavra in menor[1]))
+            resultado = sorted(id for candidato in candidatos if regex.match(candidato)
+                               for id in self._ids[candidato])
+        self._contar("padroes" if resultado else "sem_resultado")
+        return resultado
+
+    def _contar(self, tipo):
+        with self._lock:
+            self.buscas[tipo] += 1
+
+    # --- reescrita do SQL -------------------------------------------------------------------
+
+    def resolver(self, operador, valor):
+        """Ids que um filtro `nome = valor` ou `nome LIKE valor` deve selecionar: (ids, aproximado).
+
+        Na igualdade valem os nomes iguais (sem acentos e sem caixa); sem nenhum, os mais
+        parecidos, para corrigir erros de digitação. Retorna (None, False) para deixar o filtro
+        como está.
+        """
+        if not isinstance(valor, str):
+            return None, False
+        aproximado = False
+        if operador == "like":
+            ids = self.buscar_padrao(valor)
+        else:
+            ids = self.ids_com_nome(valor)
+            if ids == []:
+                encontrados = self.buscar(valor, limite=self.maximo_ids + 1)
+                melhor = encontrados[0][1] if encontrados else None
+                ids = sorted(id for id, similaridade in encontrados or () if similaridade == melhor)
+                aproximado = True
+            else:
+                self._contar("exatas" if ids else "sem_resultado")
+        if not ids or len(ids) > self.maximo_ids:
+            return None, False
+        return ids, aproximado
+
+    def reescrever(self, sql, params=None):
+        """Troca os filtros por nome do SQL por `id IN (...)`.
+
+        Retorna (sql, params, correcoes), com correcoes = [(nome procurado, ids)] dos filtros
+        de igualdade resolvidos por aproximação. Filtros que o índice não resolve ficam como
+        estão.
+        """
+        valores = list(params) if params is not None else None
+        pedacos, restantes, correcoes = [], [], []
+        posicao, marcador = 0, 0
+        for m in PADRAO_FILTRO_NOME.finditer(sql):
+            if m.group("operador") is None:
+                if m.group(0) == "%s":
+                    if valores is None or marcador >= len(valores):
+                        return sql, params, []
+                    restantes.append(valores[marcador])
+                    marcador += 1
+                continue
+            bruto = m.group("valor")
+            if bruto == "%s":
+                if valores is None or marcador >= len(valores):
+                    return sql, params, []
+                valor = valores[marcador]
+                marcador += 1
+            else:
+                valor = bruto[1:-1].replace("''", "'")
+                if valores is not None:
+                    # Com parâmetros, o driver lê '%%' como '%'.
+                    valor = valor.replace("%%", "%")
+            ids, aproximado = self.resolver(m.group("operador").lower(), valor)
+            if ids is None:
+                if bruto == "%s":
+                    restantes.append(valor)
+                continue
+            pedacos.append(sql[posicao:m.start()])
+            pedacos.append(f"{m.group('tabela') or ''}id IN ({', '.join(str(int(id)) for id in ids)})")
+            posicao = m.end()
+            if aproximado:
+                correcoes.append((valor, ids))
+        if not pedacos:
+            return sql, params, []
+        pedacos.append(sql[posicao:])
+        with self._lock:
+            self.reescritas += 1
+        METRICAS.contar("filtros_por_nome_reescritos")
+        return "".join(pedacos), (tuple(restantes) if params is not None else None), correcoes
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "montado": self._versao is not None,
+                "nomes": len(self._nomes),
+                "nomes_distintos": len(self._ids),
+                "palavras": len(self._nomes_com_palavra),
+                "trigramas": len(self._trigramas),
+                "buscas": dict(self.buscas),
+                "consultas_reescritas": self.reescritas,
+                "reconstrucoes": self.reconstrucoes,
+            }
@@ -0,0 +1,184 @@
+# sessao.py
+
+import time
+from importacao import validar_cliente
+from metricas import METRICAS
+
+# Ids por instrução nas operações em massa (WHERE id IN (...)), abaixo dos limites de parâmetros dos drivers.
+IDS_POR_INSTRUCAO = 500
+
+COLUNAS_EDITAVEIS = ("nome", "renda", "status", "genero")
+
+def campos_preenchidos(nome, renda, status, genero):
+    """Pares (coluna, valor) que uma atualização parcial altera, com a mesma regra de atualizar_cliente."""
+    valores = {"nome": nome, "renda": renda, "status": status, "genero": genero}
+    return tuple((coluna, valores[coluna]) for coluna in COLUNAS_EDITAVEIS
+                 if (valores[coluna] is not None if coluna == "renda" else valores[coluna]))
+
+class SessaoClientes:
+    """Unidade de trabalho: acumula escritas e as grava numa única transação.
+
+    Inserções, atualizações parciais e exclusões ficam na fila até `confirmar()` (ou até o fim
+    do bloco `with gerenciador.sessao() as sessao:`). Na confirmação, as operações de mesmo
+    formato viram um executemany (ou um `WHERE id IN (...)` nas operações em massa), executados
+    com um único commit; se algo falhar, tudo é desfeito. Operações sobre o mesmo id mantêm a
+    ordem em que foram pedidas: uma operação só entra num lote anterior de mesmo formato se
+    nenhum lote posterior a ele tocar nos mesmos ids.
+    """
+
+    def __init__(self, gerenciador):
+        self.gerenciador = gerenciador
+        self._lotes = []                # [tipo, sql, lista de parâmetros ou de ids, valores fixos]
+        self._lote_por_formato = {}     # formato -> índice do lote mais recente com esse formato
+        self._ultimo_lote_do_id = {}    # id -> índice do último lote que o altera
+        self._operacoes = []            # (evento, id, dados) na ordem pedida, para avisar os observadores
+        self.relatorio = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, erro, rastreio):
+        if tipo is None:
+            self.confirmar()
+        else:
+            self.descartar()
+        return False
+
+    def __len__(self):
+        return len(self._operacoes)
+
+    def _enfileirar(self, formato, tipo, sql, ids, item, fixos=None):
+        indice = self._lote_por_formato.get(formato)
+        if indice is None or any(self._ultimo_lote_do_id.get(id, -1) > indice for id in ids):
+            indice = len(self._lotes)
+            self._lotes.append([tipo, sql, [], fixos])
+            self._lote_por_formato[formato] = indice
+        self._lotes[indice][2].extend(item)
+        for id in ids:
+            self._ultimo_lote_do_id[id] = indice
+
+    def adicionar(self, id, nome, renda, status, genero):
+        """Enfileira a inserção de um cliente; levanta ValueError se os dados forem inválidos."""
+        linha = validar_cliente((id, nome, renda, status, genero))
+        self._enfileirar(("inserir",), "varias",
+                         "INSERT INTO clientes (id, nome, renda, status, genero) VALUES (%s, %s, %s, %s, %s)",
+                         [linha[0]], [linha])
+        self._operacoes.append(("ao_inserir", linha[0], linha))
+
+    def atualizar(self, id, nome=None, renda=None, status=None, genero=None):
+        """Enfileira uma atualização parcial (campos vazios ou None ficam como estão)."""
+        campos = campos_preenchidos(nome, renda, status, genero)
+        if not campos:
+            return
+        colunas = tuple(coluna for coluna, _ in campos)
+        sql = f"UPDATE clientes SET {', '.join(f'{coluna} = %s' for coluna in colunas)} WHERE id = %s"
+        self._enfileirar(("atualizar", colunas), "varias", sql, [id], [tuple(valor for _, valor in campos) + (id,)])
+        self._operacoes.append(("ao_atualizar", id, dict(campos)))
+
+    def deletar(self, id):
+        """Enfileira a exclusão de um cliente."""
+        self.deletar_varios([id])
+
+    def atualizar_varios(self, ids, nome=None, renda=None, status=None, genero=None):
+        """Enfileira a mesma atualização parcial para uma lista de ids."""
+        campos = campos_preenchidos(nome, renda, status, genero)
+        ids = list(dict.fromkeys(ids))
+        if not campos or not ids:
+            return
+        colunas = tuple(coluna for coluna, _ in campos)
+        valores = tuple(valor for _, valor in campos)
+        sql = f"UPDATE clientes SET {', '.join(f'{coluna} = %s' for coluna in colunas)} WHERE id IN"
+        self._enfileirar(("atualizar_varios", colunas, valores), "em_massa", sql, ids, ids, valores)
+        self._operacoes.extend(("ao_atualizar", id, dict(campos)) for id in ids)
+
+    def deletar_varios(self, ids):
+        """Enfileira a exclusão de uma lista de ids."""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return
+        self._enfileirar(("deletar",), "em_massa", "DELETE FROM clientes WHERE id IN", ids, ids, ())
+        self._operacoes.extend(("ao_deletar", id, None) for id in ids)
+
+    def descartar(self):
+        """Esvazia a fila sem gravar nada."""
+        self._lotes.clear()
+        self._lote_por_formato.clear()
+        self._ultimo_lote_do_id.clear()
+        self._operacoes.clear()
+
+    def confirmar(self):
+        """Grava as operações da fila numa transação e retorna um relatório (None se falhar).
+
+        O relatório traz as operações, as instruções enviadas ao banco, as linhas afetadas e o
+        tempo da transação. A fila é esvaziada em ambos os casos.
+        """
+        if not self._operacoes:
+            return {"operacoes": 0, "instrucoes": 0, "linhas_afetadas": 0, "segundos": 0.0}
+        gerenciador = self.gerenciador
+        db = gerenciador.db_conn
+        operacoes, lotes = list(self._operacoes), list(self._lotes)
+        self.descartar()
+
+        inicio = time.perf_counter()
+        with db.conexao() as conn:
+            if conn is None: return None
+            cursor = conn.cursor()
+            try:
+                # Com observadores, as linhas alteradas ou apagadas são lidas (e bloqueadas) antes.
+                alterados = {id for evento, id, _ in operacoes if evento != "ao_inserir"}
+                if gerenciador.observadores and alterados:
+                    atuais = gerenciador._ler_para_escrita(cursor, alterados)
+                else:
+                    db.iniciar_escrita(cursor)
+                    atuais = {}
+                instrucoes, afetadas = 0, 0
+                for tipo, sql, itens, fixos in lotes:
+                    if tipo == "varias":
+                        cursor.executemany(db.adaptar_sql(sql), itens)
+                        instrucoes += 1
+                        afetadas += max(cursor.rowcount, 0)
+                        continue
+                    for comeco in range(0, len(itens), IDS_POR_INSTRUCAO):
+                        parte = itens[comeco:comeco + IDS_POR_INSTRUCAO]
+                        cursor.execute(db.adaptar_sql(f"{sql} ({', '.join(['%s'] * len(parte))})"),
+                                       fixos + tuple(parte))
+                        instrucoes += 1
+                        afetadas += max(cursor.rowcount, 0)
+                conn.commit()
+            except db.Erro as err:
+                conn.rollback()
+                print(f"Erro ao gravar a sessão ({len(operacoes)} operações desfeitas): {err}")
+                return None
+            finally:
+                cursor.close()
+
+        versao = gerenciador._registrar_escrita()
+        if gerenciador.observadores:
+            self._notificar(versao, atuais, operacoes)
+        segundos = time.perf_counter() - inicio
+        METRICAS.observar("sessao.confirmar", segundos)
+        self.relatorio = {
+            "operacoes": len(operacoes),
+            "instrucoes": instrucoes,
+            "linhas_afetadas": afetadas,
+            "segundos": segundos,
+        }
+        return self.relatorio
+
+    def _notificar(self, versao, atuais, operacoes):
+        """Repete as operações sobre as linhas lidas antes, na ordem pedida, avisando os observadores."""
+        for evento, id, dados in operacoes:
+            antes = atuais.get(id)
+            if evento == "ao_inserir":
+                atuais[id] = dados
+                self.gerenciador._notificar(evento, versao, dados)
+            elif antes is None:
+                continue        # atualização ou exclusão de um id que não existe: nada mudou
+            elif evento == "ao_atualizar":
+                depois = tuple(dados.get(coluna, valor) for coluna, valor
+                               in zip(("id",) + COLUNAS_EDITAVEIS, antes))
+                atuais[id] = depois
+                self.gerenciador._notificar(evento, versao, antes, depois)
+            else:
+                del atuais[id]
+                self.gerenciador._notificar(evento, versao, antes)
@@ -0,0 +1,251 @@
+# verificar_fragmentos.py
+#
+# Confere o modo fragmentado contra um banco único com os mesmos clientes: roda escritas
+# (comparando as linhas afetadas e a tabela resultante), leituras com agregações, ordenação,
+# LIMIT/OFFSET e NULLs, o roteamento por id e as consultas que devem ser recusadas. Imprime
+# uma linha por verificação e sai com código 1 se alguma divergir.
+#
+#   python verificar_fragmentos.py
+#   python verificar_fragmentos.py --fragmentos 4 --linhas 20000
+#   python verificar_fragmentos.py --backend mysql
+
+import argparse
+import contextlib
+import io
+import math
+import os
+import sys
+import tempfile
+from decimal import Decimal
+from benchmark import criar_backend, gerar_clientes, recriar_tabela
+from database import GerenciadorClientes
+from fragmentos import BancoFragmentado, ErroFragmentos
+
+INSERCAO = "INSERT INTO clientes (id, nome, renda, status, genero) VALUES (%s, %s, %s, %s, %s)"
+
+def escritas(linhas):
+    """Escritas aplicadas em sequência aos dois bancos: (descrição, sql, params, várias)."""
+    novo = linhas + 1
+    return [
+        ("INSERT com executemany e NULLs", INSERCAO, [
+            (novo, "Sem Renda", None, "ativo", "feminino"),
+            (novo + 1, None, 1500.0, "nome sujo", "masculino"),
+            (novo + 2, "Sem Status", 800.0, None, "feminino"),
+            (novo + 3, "Outro Sem Renda", None, "nome sujo", "masculino"),
+            (novo + 4, "Renda Zero", 0.0, "ativo", None),
+        ], True),
+        ("INSERT com id literal",
+         f"INSERT INTO clientes (id, nome, renda, status, genero) VALUES ({novo + 5}, 'Literal', 10.5, 'ativo', 'feminino')",
+         None, False),
+        ("UPDATE por id = %s", "UPDATE clientes SET renda = renda + 1 WHERE id = %s", (17,), False),
+        ("UPDATE por id IN com parâmetros em vários fragmentos",
+         "UPDATE clientes SET renda = renda + 1 WHERE id IN (%s, %s, %s, %s)", (1, 2, 3, 4), False),
+        ("UPDATE com parâmetros antes e dentro do IN",
+         "UPDATE clientes SET status = %s WHERE genero = %s AND id IN (5, %s, %s, 8) AND renda >= %s",
+         ("ativo", "feminino", 6, 7, 0), False),
+        ("UPDATE sem filtro por id", "UPDATE clientes SET renda = renda * 2 WHERE renda < %s", (300,), False),
+        ("DELETE por id IN", "DELETE FROM clientes WHERE id IN (%s, %s, %s)", (10, 11, 12), False),
+        ("DELETE por id literal", "DELETE FROM clientes WHERE id = 13", None, False),
+        ("DELETE sem linhas", "DELETE FROM clientes WHERE id = %s", (linhas * 10,), False),
+    ]
+
+# Leituras feitas depois das escritas: (descrição, sql, params). As ordenadas desempatam por id,
+# para que a ordem entre empates não dependa do banco; as demais são comparadas sem ordem.
+LEITURAS = [
+    ("COUNT", "SELECT COUNT(*) FROM clientes", None),
+    ("COUNT de colunas com NULL", "SELECT COUNT(*), COUNT(renda), COUNT(nome), COUNT(status) FROM clientes", None),
+    ("SUM, AVG, MIN e MAX", "SELECT SUM(renda), AVG(renda), MIN(renda), MAX(renda) FROM clientes WHERE status = %s",
+     ("ativo",)),
+    ("MIN/MAX de texto e expressão sobre agregados",
+     "SELECT MIN(nome), MAX(nome), MAX(renda) - MIN(renda) AS amplitude FROM clientes", None),
+    ("agregados sem linhas", "SELECT COUNT(*), SUM(renda), AVG(renda), MIN(renda) FROM clientes WHERE renda > 1e12",
+     None),
+    ("GROUP BY com todos os agregados",
+     "SELECT status, genero, COUNT(*), SUM(renda), AVG(renda), MIN(renda), MAX(renda) FROM clientes "
+     "GROUP BY status, genero", None),
+    ("GROUP BY sem linhas", "SELECT genero, COUNT(*) FROM clientes WHERE renda > 1e12 GROUP BY genero", None),
+    ("HAVING com apelido e ORDER BY do agregado",
+     "SELECT status, COUNT(*) AS n FROM clientes GROUP BY status HAVING COUNT(*) > 1 ORDER BY n DESC, status", None),
+    ("HAVING com AVG", "SELECT genero, AVG(renda) AS media FROM clientes GROUP BY genero HAVING AVG(renda) > 100 "
+     "ORDER BY media DESC", None),
+    ("ORDER BY de agregado fora da seleção", "SELECT status FROM clientes GROUP BY status ORDER BY COUNT(*) DESC",
+     None),
+    ("ORDER BY de colunas fora da seleção", "SELECT nome FROM clientes ORDER BY renda DESC, id LIMIT 10", None),
+    ("ORDER BY de apelido de expressão", "SELECT nome, renda * 2 AS dobro FROM clientes ORDER BY dobro DESC, id LIMIT 3",
+     None),
+    ("ORDER BY com prefixo da tabela", "SELECT c.nome FROM clientes c WHERE c.renda < 500 ORDER BY c.renda, c.id LIMIT 5",
+     None),
+    ("LIMIT com OFFSET", "SELECT nome, renda FROM clientes WHERE genero = %s ORDER BY renda, id LIMIT 10 OFFSET 15",
+     ("feminino",)),
+    ("LIMIT deslocamento, quantidade", "SELECT nome FROM clientes ORDER BY renda, id LIMIT 5, 10", None),
+    ("OFFSET além do fim", "SELECT id FROM clientes ORDER BY id LIMIT 10 OFFSET 100000000", None),
+    ("NULL primeiro em ordem crescente", "SELECT id, renda FROM clientes ORDER BY renda, id LIMIT 8", None),
+    ("NULL por último em ordem decrescente", "SELECT id, renda FROM clientes ORDER BY renda DESC, id", None),
+    ("NULL em texto", "SELECT id, nome FROM clientes ORDER BY nome, id LIMIT 5", None),
+    ("DISTINCT ordenado com NULL", "SELECT DISTINCT status FROM clientes ORDER BY status", None),
+    ("DISTINCT sem ordem", "SELECT DISTINCT genero FROM clientes", None),
+    ("id = %s", "SELECT nome, renda FROM clientes WHERE id = %s", (17,)),
+    ("id IN com parâmetros e literal", "SELECT id, nome FROM clientes WHERE id IN (%s, %s, %s, 4) ORDER BY id",
+     (1, 2, 3)),
+    ("parâmetros antes e dentro do IN",
+     "SELECT id FROM clientes WHERE status = %s AND id IN (%s, %s, 7, %s) ORDER BY id", ("ativo", 1, 2, 14)),
+    ("agregados com id IN", "SELECT COUNT(*), SUM(renda) FROM clientes WHERE id IN (%s, %s, %s)", (1, 2, 3)),
+    ("LIKE", "SELECT COUNT(*) FROM clientes WHERE nome LIKE '%Silva%'", None),
+]
+
+# Consultas que o modo fragmentado deve recusar com ErroFragmentos.
+RECUSADAS = [
+    ("COUNT(DISTINCT)", "SELECT COUNT(DISTINCT status) FROM clientes"),
+    ("GROUP_CONCAT", "SELECT GROUP_CONCAT(nome) FROM clientes"),
+    ("GROUP_CONCAT agrupado", "SELECT status, GROUP_CONCAT(nome) FROM clientes GROUP BY status"),
+    ("SUM(DISTINCT)", "SELECT SUM(DISTINCT renda) FROM clientes"),
+    ("subconsulta", "SELECT nome FROM clientes WHERE renda > (SELECT AVG(renda) FROM clientes)"),
+]
+
+def executar(db, sql, params=None, varias=False):
+    """Executa no backend e retorna (linhas, linhas afetadas); escritas são confirmadas."""
+    with db.conexao() as conn:
+        if conn is None:
+            raise SystemExit("Não foi possível conectar ao banco da verificação.")
+        cursor = conn.cursor()
+        try:
+            if varias:
+                cursor.executemany(db.adaptar_sql(sql), params)
+            elif params is None:
+                cursor.execute(sql)
+            else:
+                cursor.execute(db.adaptar_sql(sql), params)
+            if sql.lstrip().lower().startswith("select"):
+                return cursor.fetchall(), None
+            conn.commit()
+            return None, cursor.rowcount
+        finally:
+            cursor.close()
+
+def _valor(valor):
+    return float(valor) if isinstance(valor, Decimal) else valor
+
+def iguais(a, b, ordenadas):
+    """Compara dois resultados; floats com tolerância (somas em outra ordem) e, sem ORDER BY, sem ordem."""
+    a = [tuple(_valor(v) for v in linha) for linha in a]
+    b = [tuple(_valor(v) for v in linha) for linha in b]
+    if not ordenadas:
+        chave = lambda linha: repr(tuple(round(v, 2) if isinstance(v, float) else v for v in linha))
+        a, b = sorted(a, key=chave), sorted(b, key=chave)
+    return len(a) == len(b) and all(
+        len(x) == len(y) and all(math.isclose(u, v, rel_tol=1e-9, abs_tol=1e-6)
+                                 if isinstance(u, float) and isinstance(v, (int, float)) else u == v
+                                 for u, v in zip(x, y))
+        for x, y in zip(a, b))
+
+class Verificacao:
+    def __init__(self):
+        self.total = 0
+        self.falhas = 0
+
+    def conferir(self, descricao, ok, detalhe=""):
+        self.total += 1
+        self.falhas += not ok
+        print(f"{'ok' if ok else 'DIVERGE'}  {descricao}" + ("" if ok else f": {detalhe}"))
+
+def verificar_escritas(verificacao, unico, fragmentado, linhas):
+    for descricao, sql, params, varias in escritas(linhas):
+        _, afetadas_unico = executar(unico, sql, params, varias)
+        _, afetadas_fragmentado = executar(fragmentado, sql, params, varias)
+        verificacao.conferir(f"{descricao} (linhas afetadas: {afetadas_unico})", afetadas_unico == afetadas_fragmentado,
+                             f"banco único {afetadas_unico}, fragmentado {afetadas_fragmentado}")
+    sql = "SELECT id, nome, renda, status, genero FROM clientes ORDER BY id"
+    a, b = executar(unico, sql)[0], executar(fragmentado, sql)[0]
+    verificacao.conferir("tabela depois das escritas", iguais(a, b, True), f"{len(a)} contra {len(b)} linhas")
+
+def verificar_leituras(verificacao, unico, fragmentado):
+    for descricao, sql, params in LEITURAS:
+        a, b = executar(unico, sql, params)[0], executar(fragmentado, sql, params)[0]
+        verificacao.conferir(descricao, iguais(a, b, "order by" in sql.lower()), f"{a[:5]} contra {b[:5]}")
+
+def verificar_roteamento(verificacao, fragmentado):
+    """Confere quais fragmentos cada SELECT consultou, pelas contagens de estatisticas_fragmentos."""
+    n = len(fragmentado.fragmentos)
+    casos = [
+        ("id = %s", "SELECT nome FROM clientes WHERE id = %s", (7,), {7 % n}),
+        ("id IN no mesmo fragmento", "SELECT nome FROM clientes WHERE id IN (%s, %s)", (3, 3 + n), {3 % n}),
+        ("id IN literal em dois fragmentos", "SELECT nome FROM clientes WHERE id IN (1, 2)", None, {1 % n, 2 % n}),
+        ("parâmetros antes do IN", "SELECT nome FROM clientes WHERE status = %s AND id IN (%s)", ("ativo", 5),
+         {5 % n}),
+        ("sem filtro por id", "SELECT COUNT(*) FROM clientes WHERE renda > %s", (0,), set(range(n))),
+    ]
+    for descricao, sql, params, esperados in casos:
+        antes = fragmentado.estatisticas_fragmentos()
+        executar(fragmentado, sql, params)
+        depois = fragmentado.estatisticas_fragmentos()
+        consultados = {i for i in range(n)
+                       if depois[f"fragmento_{i}_consultas"] > antes[f"fragmento_{i}_consultas"]}
+        verificacao.conferir(f"roteamento: {descricao}", consultados == esperados,
+                             f"esperados {sorted(esperados)}, consultados {sorted(consultados)}")
+
+def verificar_recusas(verificacao, fragmentado):
+    for descricao, sql in RECUSADAS:
+        try:
+            executar(fragmentado, sql)
+        except ErroFragmentos:
+            verificacao.conferir(f"recusa: {descricao}", True)
+        else:
+            verificacao.conferir(f"recusa: {descricao}", False, "a consulta foi executada")
+
+def executar_verificacao(args):
+    unico = criar_backend(args)
+    fragmentado = BancoFragmentado([criar_backend(args, i) for i in range(args.fragmentos)])
+    for db in [unico] + fragmentado.fragmentos:
+        recriar_tabela(db)
+    for db in (unico, fragmentado):
+        gerenciador = GerenciadorClientes(db)
+        with contextlib.redirect_stdout(io.StringIO()):
+            gerenciador.configurar_tabela()
+        gerenciador.inserir_clientes(enumerate(gerar_clientes(args.linhas, args.semente), start=1))
+
+    verificacao = Verificacao()
+    try:
+        verificar_escritas(verificacao, unico, fragmentado, args.linhas)
+        verificar_leituras(verificacao, unico, fragmentado)
+        verificar_roteamento(verificacao, fragmentado)
+        verificar_recusas(verificacao, fragmentado)
+    finally:
+        unico.fechar()
+        fragmentado.fechar()
+    print(f"{verificacao.total} verificações, {verificacao.falhas} divergências "
+          f"({args.fragmentos} fragmentos, {args.linhas} linhas).")
+    return verificacao.falhas == 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o modo fragmentado com um banco único.")
+    parser.add_argument("--backend", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--sqlite-caminho", default=None, help="arquivo SQLite (padrão: temporário)")
+    parser.add_argument("--mysql-host", default=os.getenv("DB_HOST", "localhost"))
+    parser.add_argument("--mysql-usuario", default=os.getenv("DB_USER", "root"))
+    parser.add_argument("--mysql-senha", default=os.getenv("DB_PASSWORD", ""))
+    # Bancos separados: as tabelas são apagadas e recriadas a cada rodada.
+    parser.add_argument("--mysql-banco", default=os.getenv("DB_VERIFICACAO", "agente-ia-verificacao"))
+    parser.add_argument("--fragmentos", type=int, default=3)
+    parser.add_argument("--linhas", type=int, default=5000)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+    if args.fragmentos < 2:
+        parser.error("--fragmentos precisa ser pelo menos 2.")
+    if args.linhas < 20:
+        parser.error("--linhas precisa ser pelo menos 20 (as verificações usam os ids de 1 a 17).")
+
+    temporario = None
+    if args.backend == "sqlite" and args.sqlite_caminho is None:
+        temporario = tempfile.mkdtemp(prefix="verificar-fragmentos-")
+        args.sqlite_caminho = os.path.join(temporario, "clientes.sqlite3")
+    try:
+        ok = executar_verificacao(args)
+    finally:
+        if temporario:
+            for nome in os.listdir(temporario):
+                os.remove(os.path.join(temporario, nome))
+            os.rmdir(temporario)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()